@@ -1,4 +1,4 @@
 #!/usr/bin/env bash
 
-python src/main.py
-cd public && python -m http.server 8888
+python src/main.py --precompress "$@"
+python src/main.py serve --port 8888
@@ -0,0 +1,161 @@
+import json
+import os
+import re
+from typing import Iterable
+
+import htmlnode as hn
+import outputs
+import walk
+
+
+MANIFEST_FILENAME = "asset-manifest.json"
+HASH_LENGTH = 10
+# attributes in template markup that point at assets
+ATTR_RE = re.compile(r'\b(href|src)="([^"]*)"')
+URL_PROPS = ("href", "src")
+
+
+def content_hash(path: str) -> str:
+    return walk.file_hash(path)[:HASH_LENGTH]
+
+
+def fingerprinted_name(basename: str, digest: str) -> str:
+    """index.css -> index.<digest>.css
+    """
+    stem, ext = os.path.splitext(basename)
+    return f"{stem}.{digest}{ext}"
+
+
+class HashCache:
+    """Content hashes of files keyed by path, trusted for as long as the
+    file's size and mtime stay the same
+    """
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self.entries: dict[str, list] = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                try:
+                    self.entries = json.load(f)
+                except json.JSONDecodeError:
+                    self.entries = {}
+
+    def hash(self, path: str, stamp: tuple[int, int] | None = None) -> str:
+        """path's content hash. stamp is its (size, mtime_ns), if it's
+        already been stat'ed.
+        """
+        if stamp is None:
+            stat = os.stat(path)
+            stamp = (stat.st_size, stat.st_mtime_ns)
+        entry = self.entries.get(path)
+        if entry and entry[:2] == list(stamp):
+            return entry[2]
+        digest = content_hash(path)
+        self.entries[path] = [*stamp, digest]
+        return digest
+
+    def save(self, paths: Iterable[str] | None = None):
+        """Write the cache out, dropping the entries of files that aren't in
+        paths, if it's given
+        """
+        if paths is not None:
+            paths = set(paths)
+            self.entries = {path: entry for path, entry
+                            in self.entries.items() if path in paths}
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(self.entries, f, sort_keys=True, indent=1)
+
+
+def fingerprint_assets(static_dir: str, public_dir: str,
+                       hashes: HashCache | None = None,
+                       plan: walk.BuildPlan | None = None,
+                       output: outputs.Output | None = None) -> dict[str, str]:
+    """Publish a content-hashed copy of every file under static_dir next to
+    its plain copy in public_dir, through output if it's given, and return a
+    manifest mapping each site URL to its fingerprinted URL. The manifest is
+    also written to public_dir.
+    """
+    hashes = hashes or HashCache()
+    output = output or outputs.DirectoryOutput(public_dir)
+    if plan is None:
+        plan = walk.scan_static(static_dir, public_dir)
+    manifest = {}
+    files = plan.files(walk.ASSET)
+    for entry in files:
+        src_path = entry.src_path
+        rel_path = os.path.relpath(src_path, static_dir)
+        rel_dir, filename = os.path.split(rel_path)
+        stamp = None
+        if entry.mtime_ns is not None:
+            stamp = (entry.size, entry.mtime_ns)
+        name = fingerprinted_name(filename, hashes.hash(src_path, stamp))
+
+        dest_path = os.path.join(public_dir, rel_dir, name)
+        if not output.exists(dest_path):
+            output.mkdir(os.path.dirname(dest_path))
+            output.copy(src_path, dest_path, link=True)
+
+        url = "/" + rel_path.replace(os.sep, "/")
+        manifest[url] = url.rsplit("/", 1)[0] + "/" + name
+    hashes.save(entry.src_path for entry in files)
+
+    output.write(os.path.join(public_dir, MANIFEST_FILENAME),
+                 json.dumps(manifest, sort_keys=True, indent=1))
+    return manifest
+
+
+def load_manifest(public_dir: str, output: outputs.Output | None = None
+                  ) -> dict[str, str] | None:
+    """The manifest fingerprint_assets last wrote to public_dir, if there is
+    one to read back
+    """
+    output = output or outputs.DirectoryOutput(public_dir)
+    data = output.read(os.path.join(public_dir, MANIFEST_FILENAME))
+    if data is None:
+        return None
+    try:
+        return json.loads(data)
+    except json.JSONDecodeError:
+        return None
+
+
+def rewrite_url(url: str, manifest: dict[str, str]) -> str:
+    # keep any query string or fragment on the rewritten URL
+    for i, char in enumerate(url):
+        if char in "?#":
+            return manifest.get(url[:i], url[:i]) + url[i:]
+    return manifest.get(url, url)
+
+
+def rewrite_template(template: str, manifest: dict[str, str]) -> str:
+    """Point href and src attributes in template markup at fingerprinted
+    assets
+    """
+    def replace(match: re.Match) -> str:
+        return f'{match[1]}="{rewrite_url(match[2], manifest)}"'
+    return ATTR_RE.sub(replace, template)
+
+
+def rewrite_tree(node: hn.HTMLNode, manifest: dict[str, str]):
+    """Point href, src and srcset props in an HTMLNode tree at fingerprinted
+    assets
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.props:
+            for key in URL_PROPS:
+                if key in node.props:
+                    node.props[key] = rewrite_url(node.props[key], manifest)
+            if "srcset" in node.props:
+                candidates = []
+                for candidate in node.props["srcset"].split(", "):
+                    url, _, descriptor = candidate.partition(" ")
+                    url = rewrite_url(url, manifest)
+                    candidates.append(f"{url} {descriptor}".rstrip())
+                node.props["srcset"] = ", ".join(candidates)
+        if node.children:
+            stack.extend(node.children)
@@ -0,0 +1,146 @@
+import hashlib
+import marshal
+import os
+import sys
+
+import blocks
+import htmlnode as hn
+
+
+# bump whenever blocks, textnode or highlight start producing different trees
+# for the same markdown, so trees parsed by an older parser are never loaded
+PARSER_VERSION = 5
+MARSHAL_VERSION = 4
+CACHE_SUFFIX = ".ast"
+DEFAULT_MAX_BYTES = 256 << 20
+
+
+def encode(node: hn.HTMLNode) -> tuple:
+    """Flatten an HTMLNode tree into nested (tag, value, props, children)
+    tuples, with children None for leaves and False for raw markup
+    """
+    if isinstance(node, hn.RawNode):
+        return (None, node.value, None, False)
+    if node.children is None:
+        return (node.tag, node.value, node.props, None)
+    return (node.tag, node.value, node.props,
+            [encode(child) for child in node.children])
+
+
+def decode(data: tuple) -> hn.HTMLNode:
+    tag, value, props, children = data
+    if children is False:
+        return hn.RawNode(value)
+    if children is None:
+        return hn.LeafNode(tag, value, props)
+    return hn.ParentNode(tag, [decode(child) for child in children], props)
+
+
+class ASTCache:
+    """Parsed markdown on disk, so pages whose markdown hasn't changed skip
+    parsing when they're rendered again (say, after a template change).
+
+    Each tree is stored marshalled along with the document's outline, under
+    the hash of its markdown, the
+    parser version and the Python version (marshal's format is only stable
+    within one), and is touched whenever it's used. trim() deletes the
+    least recently used trees until the cache fits in max_bytes.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.salt = (f"{PARSER_VERSION}:{sys.version_info[:2]}:"
+                     f"{MARSHAL_VERSION}\0").encode()
+
+    def path(self, markdown: str) -> str:
+        digest = hashlib.sha256(self.salt + markdown.encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2],
+                            digest[2:] + CACHE_SUFFIX)
+
+    def load(self, markdown: str, outline: blocks.Outline | None = None
+             ) -> hn.HTMLNode | None:
+        path = self.path(markdown)
+        try:
+            # one read and loads() is several times faster than load(),
+            # which reads the file piecemeal
+            with open(path, 'rb') as f:
+                data, headings = marshal.loads(f.read())
+            node = decode(data)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if outline is not None:
+            for level, slug, text in headings:
+                outline.headings.append((level, slug, text))
+                outline.used.add(slug)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return node
+
+    def store(self, markdown: str, node: hn.HTMLNode,
+              outline: blocks.Outline):
+        try:
+            data = marshal.dumps((encode(node), outline.headings),
+                                 MARSHAL_VERSION)
+        except (RecursionError, ValueError):
+            # too deeply nested to marshal; it's rare enough to just parse
+            # such pages every time
+            return
+        path = self.path(markdown)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename, so concurrent builds never see half a tree
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def parse(self, markdown: str, deadline: float | None = None,
+              outline: blocks.Outline | None = None) -> hn.HTMLNode:
+        """markdown_to_html_node, served from the cache when possible
+        """
+        if outline is None:
+            outline = blocks.Outline()
+        node = self.load(markdown, outline)
+        if node is not None:
+            self.hits += 1
+            return node
+        self.misses += 1
+        node = blocks.markdown_to_html_node(markdown, deadline, outline)
+        self.store(markdown, node, outline)
+        return node
+
+    def trim(self) -> int:
+        """Delete the least recently used trees until the cache fits in
+        max_bytes, returning the number deleted
+        """
+        entries = []
+        total = 0
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        with os.scandir(self.cache_dir) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as it:
+                    for entry in it:
+                        if not entry.name.endswith(CACHE_SUFFIX):
+                            continue
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size,
+                                        entry.path))
+                        total += stat.st_size
+        entries.sort()
+        deleted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            deleted += 1
+        return deleted
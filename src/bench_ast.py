@@ -0,0 +1,95 @@
+"""Parsed markdown cache benchmark.
+
+Simulates a template-only change on a synthetic site made of copies of the
+content/ pages: every page has to be rendered again, but none of the
+markdown changed. Times the rebuild parsing every page from scratch against
+loading the parsed trees from a warm ASTCache, and the parse step alone.
+
+    python src/bench_ast.py [--pages 2000] [--repeat 3]
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import tempfile
+import time
+
+import astcache
+import blocks
+import generate
+
+
+def make_site(root: str, pages: int) -> tuple[str, str, str]:
+    sources = []
+    content_root = os.path.join(os.path.dirname(__file__), "..", "content")
+    for path in sorted(glob.glob(os.path.join(content_root, "**", "*.md"),
+                                 recursive=True)):
+        with open(path) as f:
+            sources.append(f.read())
+
+    content_dir = os.path.join(root, "content")
+    for i in range(pages):
+        page_dir = os.path.join(content_dir, f"section-{i // 100}")
+        os.makedirs(page_dir, exist_ok=True)
+        with open(os.path.join(page_dir, f"page-{i}.md"), 'w') as f:
+            # keep every page's markdown distinct, as on a real site
+            f.write(f"{sources[i % len(sources)]}\n\nPage number {i}.\n")
+    return (content_dir, os.path.join(root, "public"),
+            os.path.join(root, "template.html"))
+
+
+def rebuild(content_dir: str, public_dir: str, template_path: str,
+            revision: int, ast_cache: astcache.ASTCache | None) -> float:
+    with open(template_path, 'w') as f:
+        f.write(f"<!-- revision {revision} --><title>{{{{ Title }}}}</title>"
+                "<main>{{ Content }}</main>")
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate.generate_pages(content_dir, public_dir, template_path,
+                                ast_cache=ast_cache)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        content_dir, public_dir, template_path = make_site(root, args.pages)
+        cache = astcache.ASTCache(os.path.join(root, "cache"))
+
+        markdowns = []
+        for path in glob.glob(os.path.join(content_dir, "**", "*.md"),
+                              recursive=True):
+            with open(path) as f:
+                markdowns.append(generate.split_front_matter(f.read())[1])
+        start = time.perf_counter()
+        for markdown in markdowns:
+            blocks.markdown_to_html_node(markdown)
+        parse = time.perf_counter() - start
+        for markdown in markdowns:
+            cache.parse(markdown)
+        start = time.perf_counter()
+        for markdown in markdowns:
+            cache.load(markdown)
+        load = time.perf_counter() - start
+        print(f"{len(markdowns)} pages: parse {parse * 1e3:.0f} ms,"
+              f" cache load {load * 1e3:.0f} ms ({parse / load:.1f}x)")
+
+        uncached = []
+        cached = []
+        for revision in range(args.repeat):
+            uncached.append(rebuild(content_dir, public_dir, template_path,
+                                    revision, None))
+            cached.append(rebuild(content_dir, public_dir, template_path,
+                                  revision, cache))
+        print(f"template-only rebuild: {min(uncached) * 1e3:.0f} ms"
+              f" without the cache, {min(cached) * 1e3:.0f} ms with it"
+              f" ({min(uncached) / min(cached):.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""HTML escaping benchmark.
+
+Compares the escaping used while rendering (an `in` check for special
+characters, then chained str.replace only when one is found) with
+html.escape, a translate table and an unconditional replace chain, on
+typical page text and on text full of markup. Also reports what escaping
+costs as a share of rendering the content/ pages.
+
+    python src/bench_escape.py [--repeat 200]
+"""
+import argparse
+import glob
+import html
+import os
+import time
+
+import blocks
+import generate
+import htmlnode as hn
+
+
+TRANSLATE_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+def replace_chain(text: str) -> str:
+    return (text.replace("&", "&amp;").replace("<", "&lt;")
+            .replace(">", "&gt;"))
+
+
+def translate(text: str) -> str:
+    return text.translate(TRANSLATE_TABLE)
+
+
+def leaf_values(node: hn.HTMLNode) -> list[str]:
+    values = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.value:
+            values.append(node.value)
+        if node.children:
+            stack.extend(node.children)
+    return values
+
+
+def timed(func, items: list[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    root = os.path.join(os.path.dirname(__file__), "..", "content")
+    sources = []
+    for path in glob.glob(os.path.join(root, "**", "*.md"), recursive=True):
+        with open(path) as f:
+            sources.append(generate.split_front_matter(f.read())[1])
+    typical = []
+    for source in sources:
+        typical.extend(leaf_values(blocks.markdown_to_html_node(source)))
+    markup = [value.replace(" ", " <&> ") for value in typical]
+
+    chars = sum(map(len, typical))
+    print(f"{len(typical)} text values, {chars} chars,"
+          f" x{args.repeat} repeats")
+    print(f"{'escaper':<16} {'typical MB/s':>13} {'markup MB/s':>12}")
+    for name, func in (("fast path", hn.escape_text),
+                       ("html.escape", html.escape),
+                       ("translate", translate),
+                       ("replace chain", replace_chain)):
+        plain = timed(func, typical, args.repeat)
+        heavy = timed(func, markup, args.repeat)
+        print(f"{name:<16} {chars * args.repeat / plain / 1e6:>13.1f}"
+              f" {sum(map(len, markup)) * args.repeat / heavy / 1e6:>12.1f}")
+
+    nodes = [blocks.markdown_to_html_node(source) for source in sources]
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for node in nodes:
+            node.to_html()
+    render = time.perf_counter() - start
+    escape = timed(hn.escape_text, typical, args.repeat)
+    print(f"escaping is {escape / render:.1%} of to_html() on content/")
+
+
+if __name__ == "__main__":
+    main()
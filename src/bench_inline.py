@@ -0,0 +1,66 @@
+"""Adversarial inline parsing benchmark.
+
+Times text_to_textnodes against the original regex-driven implementation on
+inputs built to hurt it: thousands of links in one paragraph, and runs of
+unbalanced brackets that make the non-greedy patterns backtrack. Time per KB
+should stay flat as inputs grow; for the regex version it climbs.
+
+    python src/bench_inline.py [--max-kb 64] [--regex-max-kb 4]
+"""
+import argparse
+import time
+
+import fuzz
+import textnode as tn
+
+
+CORPUS = {
+    "many links": "see [link](/recipes/stir-fry-day.html) and ",
+    "many images": "![pic](/images/rivendell.png) ",
+    "open brackets": "[",
+    "open images": "![",
+    "unclosed links": "[a](",
+    "closed brackets": "[a] ",
+}
+
+
+def build(unit: str, size: int) -> str:
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def timed(func, text: str) -> float:
+    start = time.perf_counter()
+    try:
+        func(text)
+    except ValueError:
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-kb", type=int, default=64)
+    parser.add_argument("--regex-max-kb", type=int, default=4,
+                        help="largest input to give the quadratic version")
+    args = parser.parse_args()
+
+    sizes = []
+    kb = 1
+    while kb <= args.max_kb:
+        sizes.append(kb)
+        kb *= 2
+
+    print(f"{'corpus':<16} {'KB':>5} {'linear us/KB':>13} {'regex us/KB':>12}")
+    for name, unit in CORPUS.items():
+        for kb in sizes:
+            text = build(unit, kb * 1024)
+            linear = timed(tn.text_to_textnodes, text) / kb * 1e6
+            regex = ""
+            if kb <= args.regex_max_kb:
+                seconds = timed(fuzz.regex_text_to_textnodes, text)
+                regex = f"{seconds / kb * 1e6:.0f}"
+            print(f"{name:<16} {kb:>5} {linear:>13.0f} {regex:>12}")
+
+
+if __name__ == "__main__":
+    main()
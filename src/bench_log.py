@@ -0,0 +1,99 @@
+"""Build logging benchmark.
+
+Replays what a build of a large synthetic tree logs per file (copying its
+static files and generating its pages) into a pipe that's drained on
+another thread, as a CI log is. Rendering is left out, so the numbers are
+the cost of the logging alone. Compares the print() per file that builds
+used to do, to a terminal (line buffered) and to a pipe, against the
+default quiet log and logging every file as text or as JSON lines.
+
+    python src/bench_log.py [--pages 100000] [--repeat 3]
+"""
+import argparse
+import os
+import threading
+import time
+
+import log
+
+
+def make_tree(pages: int) -> tuple[list[tuple[str, str]],
+                                   list[tuple[str, str]]]:
+    assets = [(f"/site/static/images/photo-{i}.png",
+               f"/site/public/images/photo-{i}.png")
+              for i in range(pages // 10)]
+    page_paths = [(f"/site/content/section-{i // 1000}/page-{i}.md",
+                   f"/site/public/section-{i // 1000}/page-{i}.html")
+                  for i in range(pages)]
+    return assets, page_paths
+
+
+def with_print(assets, pages, stream) -> float:
+    start = time.perf_counter()
+    for src, dest in assets:
+        print(f"Copying {src} to {dest}", file=stream)
+    for src, dest in pages:
+        print(f"Generating page from {src} to {dest}"
+              " using /site/template.html", file=stream)
+    stream.flush()
+    return time.perf_counter() - start
+
+
+def with_log(assets, pages, stream, level: int,
+             format: str = log.TEXT) -> float:
+    log.configure(level, format, stream)
+    start = time.perf_counter()
+    for src, dest in assets:
+        log.debug("copy", "Copying {src} to {dest}", src=src, dest=dest)
+    for src, dest in pages:
+        log.debug("page", "Generated page {dest} from {src}", src=src,
+                  dest=dest)
+    log.flush()
+    return time.perf_counter() - start
+
+
+def drain(fd: int):
+    while os.read(fd, 1 << 16):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    assets, pages = make_tree(args.pages)
+    read_fd, write_fd = os.pipe()
+    drainer = threading.Thread(target=drain, args=(read_fd,))
+    drainer.start()
+    with open(write_fd, 'w') as pipe, \
+            open(os.dup(write_fd), 'w', buffering=1) as terminal:
+        modes = {
+            "print, terminal": lambda: with_print(assets, pages, terminal),
+            "print, pipe": lambda: with_print(assets, pages, pipe),
+            "quiet (default)": lambda: with_log(assets, pages, pipe,
+                                                log.INFO),
+            "verbose text": lambda: with_log(assets, pages, pipe, log.DEBUG),
+            "verbose json": lambda: with_log(assets, pages, pipe, log.DEBUG,
+                                             log.JSON),
+        }
+        times = {name: [] for name in modes}
+        for _ in range(args.repeat):
+            for name, run in modes.items():
+                times[name].append(run())
+    drainer.join()
+    os.close(read_fd)
+    log.configure()
+
+    files = len(assets) + len(pages)
+    baseline = min(times["print, terminal"])
+    print(f"{files} files ({len(pages)} pages), best of {args.repeat}:")
+    for name, results in times.items():
+        best = min(results)
+        print(f"{name:<16} {best * 1e3:8.1f} ms {best / files * 1e6:6.2f}"
+              f" us/file ({baseline / best:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
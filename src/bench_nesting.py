@@ -0,0 +1,72 @@
+"""Nested list and blockquote benchmark.
+
+Parses and renders lists and blockquotes nested ever more deeply, well past
+Python's recursion limit, plus long documents that keep stepping in and out
+of a few levels. Each line is read once, so time per KB of input should
+stay flat however deep or long the nesting gets.
+
+    python src/bench_nesting.py [--max-depth 4096]
+"""
+import argparse
+import sys
+import time
+
+import blocks
+
+
+def staircase_list(depth: int) -> str:
+    return "\n".join(" " * i + "- item" for i in range(depth))
+
+
+def staircase_quote(depth: int) -> str:
+    return "\n".join(">" * (i + 1) + " quoted" for i in range(depth))
+
+
+def sawtooth_list(lines: int, depth: int = 8) -> str:
+    return "\n".join(" " * (i % depth) + "- item" for i in range(lines))
+
+
+def sawtooth_quote(lines: int, depth: int = 8) -> str:
+    return "\n".join(">" * (i % depth + 1) + " quoted" for i in range(lines))
+
+
+CORPUS = {
+    "deep list": staircase_list,
+    "deep quote": staircase_quote,
+    "long list": sawtooth_list,
+    "long quote": sawtooth_quote,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-depth", type=int, default=4096,
+                        help="deepest nesting (and, for the long documents,"
+                             " the most lines) to try")
+    args = parser.parse_args()
+
+    sizes = []
+    size = 128
+    while size <= args.max_depth:
+        sizes.append(size)
+        size *= 2
+
+    print(f"recursion limit is {sys.getrecursionlimit()}")
+    print(f"{'corpus':<12} {'lines':>7} {'KB':>8} {'parse us/KB':>12}"
+          f" {'render us/KB':>13}")
+    for name, build in CORPUS.items():
+        for size in sizes:
+            markdown = build(size)
+            kb = len(markdown) / 1024
+            start = time.perf_counter()
+            node = blocks.markdown_to_html_node(markdown)
+            parsed = time.perf_counter()
+            node.to_html()
+            rendered = time.perf_counter()
+            print(f"{name:<12} {size:>7} {kb:>8.1f}"
+                  f" {(parsed - start) / kb * 1e6:>12.0f}"
+                  f" {(rendered - parsed) / kb * 1e6:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
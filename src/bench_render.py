@@ -0,0 +1,94 @@
+"""Batch rendering benchmark.
+
+Renders batches of markdown snippets, made from the blocks of the content/
+pages the way a service rendering user submissions would see them, and
+reports items per second at each batch size. Compares calling
+markdown_to_html_node().to_html() per item against Renderer.render_many on
+a cold cache, with a share of the items repeated (as submissions often are),
+and fanned out to a process pool.
+
+    python src/bench_render.py [--sizes 1 10 100 1000 10000] [--repeat 3]
+"""
+import argparse
+import concurrent.futures
+import glob
+import os
+import random
+import time
+
+import blocks
+import render
+
+
+def make_snippets(count: int, repeated: float, seed: int = 0) -> list[str]:
+    """count snippets, about repeated of them copies of others
+    """
+    content_root = os.path.join(os.path.dirname(__file__), "..", "content")
+    parts = []
+    for path in sorted(glob.glob(os.path.join(content_root, "**", "*.md"),
+                                 recursive=True)):
+        with open(path) as f:
+            parts.extend(block for block in f.read().split("\n\n")
+                         if block.strip())
+    rng = random.Random(seed)
+    snippets = []
+    for i in range(count):
+        if snippets and rng.random() < repeated:
+            snippets.append(rng.choice(snippets))
+            continue
+        picked = rng.sample(parts, min(3, len(parts)))
+        snippets.append("\n\n".join(picked) + f"\n\nSubmission {i}.")
+    return snippets
+
+
+def one_at_a_time(snippets: list[str]) -> float:
+    start = time.perf_counter()
+    for snippet in snippets:
+        blocks.markdown_to_html_node(snippet).to_html()
+    return time.perf_counter() - start
+
+
+def batched(snippets: list[str],
+            executor: concurrent.futures.Executor | None = None) -> float:
+    renderer = render.Renderer()
+    start = time.perf_counter()
+    renderer.render_many(snippets, executor)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--repeated", type=float, default=0.3,
+                        help="share of repeated items (default: 0.3)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with concurrent.futures.ProcessPoolExecutor(args.jobs) as pool:
+        # start the workers before anything is timed
+        list(pool.map(render.render_one, ["warm up"] * args.jobs))
+        print(f"items/s, best of {args.repeat}, {args.repeated:.0%} repeated,"
+              f" {args.jobs} processes:")
+        print(f"{'batch':>7} {'one at a time':>14} {'unique':>10}"
+              f" {'repeated':>10} {'pool':>10}")
+        for size in args.sizes:
+            unique = make_snippets(size, 0.0)
+            repeated = make_snippets(size, args.repeated)
+            modes = [
+                lambda: one_at_a_time(repeated),
+                lambda: batched(unique),
+                lambda: batched(repeated),
+                lambda: batched(repeated, pool),
+            ]
+            rates = []
+            for run in modes:
+                best = min(run() for _ in range(args.repeat))
+                rates.append(size / best)
+            print(f"{size:>7} {rates[0]:>14.0f} {rates[1]:>10.0f}"
+                  f" {rates[2]:>10.0f} {rates[3]:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Local load test for the static file server.
+
+Serves a synthetic site with serve.StaticServer and with the stock
+http.server handler that `python -m http.server` uses, hammers each with
+concurrent keep-alive clients and reports requests per second.
+
+    python src/bench_serve.py [--clients 8] [--seconds 3]
+"""
+import argparse
+import functools
+import http.client
+import http.server
+import os
+import tempfile
+import threading
+import time
+
+import outputs
+import serve
+
+
+def make_site(root: str, pages: int, page_size: int) -> list[str]:
+    paths = []
+    body = (b"<p>" + b"lorem ipsum dolor sit amet " * 10 + b"</p>\n")
+    body = body * (page_size // len(body) + 1)
+    output = serve.PrecompressedOutput(outputs.DirectoryOutput(root))
+    for i in range(pages):
+        output.write(os.path.join(root, f"page-{i}.html"), body[:page_size])
+        paths.append(f"/page-{i}.html")
+    output.close()
+    return paths
+
+
+def client(address: tuple[str, int], paths: list[str], headers: dict,
+           deadline: float, counts: list[int], index: int):
+    conn = http.client.HTTPConnection(*address, timeout=10)
+    done = 0
+    try:
+        while time.perf_counter() < deadline:
+            conn.request("GET", paths[done % len(paths)], headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.getheader("Connection", "").lower() == "close" or \
+                    response.version == 10:
+                conn.close()
+            done += 1
+    finally:
+        conn.close()
+    counts[index] = done
+
+
+def run(server: http.server.HTTPServer, paths: list[str], headers: dict,
+        clients: int, seconds: float) -> float:
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        counts = [0] * clients
+        deadline = time.perf_counter() + seconds
+        workers = [threading.Thread(target=client, args=(
+            server.server_address[:2], paths, headers, deadline, counts, i))
+            for i in range(clients)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    return sum(counts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=32 * 1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        paths = make_site(root, args.pages, args.page_size)
+        address = ("localhost", 0)
+
+        class QuietHandler(http.server.SimpleHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        cases = [
+            ("http.server", {}, lambda: http.server.ThreadingHTTPServer(
+                address, functools.partial(QuietHandler, directory=root))),
+            ("serve", {}, lambda: serve.StaticServer(address, root)),
+            ("serve gzip", {"Accept-Encoding": "gzip"},
+             lambda: serve.StaticServer(address, root)),
+        ]
+        print(f"{args.clients} clients, {args.seconds}s each,"
+              f" {args.pages} pages of {args.page_size} bytes")
+        for name, headers, factory in cases:
+            rate = run(factory(), paths, headers, args.clients, args.seconds)
+            print(f"{name:<12} {rate:>10.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
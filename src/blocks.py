@@ -1,20 +1,112 @@
 import abc
 import enum
 import re
+import time
+from typing import Callable
 
+import highlight
 import htmlnode as hn
 import textnode as tn
 
 
 BACKTICKS = "```"
+LIST_ITEM_RE = re.compile(r'([ \t]*)(?:([*-])|\d+\.) ')
+BLOCK_SEPARATOR_RE = re.compile(r'(?:\r?\n){2}')
+FOOTNOTE_BACKLINK = "\u21a9"
+# what block text is parsed into inline nodes with: tn.text_to_textnodes,
+# unless something like the fuzzer's reference swaps in another
+InlineParser = Callable[[str, "tn.Definitions | None"], list[tn.TextNode]]
+
+
+class MarkdownError(ValueError):
+    """A ValueError raised while parsing, with the 1-based line and column of
+    the document it was found at
+    """
+    def __init__(self, message: str, line: int, column: int):
+        super().__init__(message, line, column)
+        self.message = message
+        self.line = line
+        self.column = column
+
+    def __str__(self) -> str:
+        return f"{self.line}:{self.column}: {self.message}"
+
+
+class BudgetExceeded(ValueError):
+    """Raised when a page takes more time or space than it's allowed
+    """
+
+
+def slugify(text: str) -> str:
+    """Lowercase text and collapse anything that isn't a letter or digit into
+    single dashes, suitable for use in a URL path
+    """
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+class Outline:
+    """Every heading of a document in order, as (level, id, text), with ids
+    that are unique within the document
+    """
+    def __init__(self):
+        self.headings: list[tuple[int, str, str]] = []
+        self.used: set[str] = set()
+        # next suffix to try for each slug, so a page full of identical
+        # headings doesn't rescan every suffix already handed out
+        self.next_suffix: dict[str, int] = {}
+
+    def add(self, level: int, text: str) -> str:
+        """Record a heading and return its id: its slug, with -1, -2... on
+        the end for repeats
+        """
+        base = slugify(text) or "section"
+        slug = base
+        if slug in self.used:
+            suffix = self.next_suffix.get(base, 1)
+            while f"{base}-{suffix}" in self.used:
+                suffix += 1
+            self.next_suffix[base] = suffix + 1
+            slug = f"{base}-{suffix}"
+        self.used.add(slug)
+        self.headings.append((level, slug, text))
+        return slug
+
+    def to_html_node(self, min_level: int = 2) -> hn.HTMLNode | None:
+        """Nested lists of links to every heading from min_level down, or
+        None if there aren't any
+        """
+        root = hn.ParentNode('ul', children=[])
+        stack: list[tuple[int, hn.ParentNode]] = [(0, root)]
+        for level, slug, text in self.headings:
+            if level < min_level:
+                continue
+            while stack[-1][0] >= level:
+                stack.pop()
+            parent = stack[-1][1]
+            if parent.tag == 'li':
+                if parent.children[-1].tag != 'ul':
+                    parent.children.append(hn.ParentNode('ul', children=[]))
+                parent = parent.children[-1]
+            link = hn.LeafNode('a', text, {"href": f"#{slug}"})
+            item = hn.ParentNode('li', children=[link])
+            parent.children.append(item)
+            stack.append((level, item))
+        if not root.children:
+            return None
+        return root
 
 
 class Block(abc.ABC):
-    def __init__(self, text: str, strict: bool = True):
+    def __init__(self, text: str, strict: bool = True,
+                 definitions: tn.Definitions | None = None,
+                 inline: InlineParser = tn.text_to_textnodes):
         if strict and not self.matches(text):
             err = f"unexpected value for {type(self).__name__} block"
             raise ValueError(err)
         self.raw = text
+        # what references in the block's text resolve against
+        self.definitions = definitions
+        self.inline = inline
 
     @staticmethod
     @abc.abstractmethod
@@ -33,7 +125,9 @@ class Paragraph(Block):
         return True
 
     def to_html_node(self) -> hn.HTMLNode:
-        return hn.ParentNode('p', children=text_to_children(self.raw.strip()))
+        return hn.ParentNode('p', children=text_to_children(
+            self.raw.strip(), definitions=self.definitions,
+            inline=self.inline))
 
 
 class Heading(Block):
@@ -42,7 +136,10 @@ class Heading(Block):
         # starts with 1-6 '#' characters, followed by a space
         return re.match(r'^#{1,6}\ ', text) is not None
 
-    def to_html_node(self) -> hn.HTMLNode:
+    def to_html_node(self, outline: Outline | None = None) -> hn.HTMLNode:
+        """An h1-h6 with an id made from its text, unique within outline if
+        one is given, which the heading is also added to
+        """
         # not likely we'd get this far without it at least being an h1
         level = 1
         # calculate level by finding when the '# character stops showing up
@@ -50,8 +147,15 @@ class Heading(Block):
             if self.raw[i] != '#':
                 break
             level = i + 1
-        children = text_to_children(self.raw[level:].strip())
-        return hn.ParentNode(f'h{level}', children=children)
+        text_nodes = self.inline(self.raw[level:].strip(), self.definitions)
+        text = "".join(node.text for node in text_nodes)
+        if outline is None:
+            slug = slugify(text) or "section"
+        else:
+            slug = outline.add(level, text)
+        children = [node.to_html_node() for node in text_nodes]
+        return hn.ParentNode(f'h{level}', children=children,
+                             props={"id": slug})
 
 
 class Code(Block):
@@ -65,7 +169,15 @@ class Code(Block):
         # trim backticks on either side and remove any whitespace to get
         # a clean block, and we aren't parsing any further because it should
         # be pre-formatted, hence the <pre> tag
-        code = hn.LeafNode('code', self.raw[trim:-trim].strip())
+        body = self.raw[trim:-trim]
+        language = None
+        info, newline, rest = body.partition("\n")
+        if newline:
+            # anything on the line with the opening backticks is the info
+            # string, naming the language
+            language = highlight.fence_language(info)
+            body = rest
+        code = highlight.DEFAULT.to_html_node(body.strip(), language)
         return hn.ParentNode('pre', children=[code])
 
 
@@ -82,103 +194,292 @@ class Quote(Block):
         return True
 
     def to_html_node(self) -> hn.HTMLNode:
-        children = []
-        stripped_lines = []
-        for line in self.raw.splitlines():
-            stripped_lines.append(line[1:].strip())
-        content = " ".join(stripped_lines)
-        return hn.ParentNode('blockquote', children=text_to_children(content))
+        """A blockquote, with a nested blockquote wherever lines start with
+        more '>' markers than the ones before them. Each line is read once,
+        keeping a stack of the quotes that are open.
+        """
+        root = hn.ParentNode('blockquote', children=[])
+        stack = [root]
+        # consecutive lines at the same depth are joined into one run of
+        # text, remembering where in the block each line's text starts
+        run: list[str] = []
+        starts: list[int] = []
+        line_start = 0
+        for line in self.raw.splitlines(keepends=True):
+            line_offset = line_start
+            line_start += len(line)
+            line = line.rstrip("\r\n")
+            depth = 0
+            i = end = 0
+            while i < len(line) and line[i] in "> ":
+                if line[i] == '>':
+                    depth += 1
+                    end = i + 1
+                i += 1
+            rest = line[end:]
+            text = rest.strip()
+            if depth != len(stack):
+                if run:
+                    stack[-1].children.extend(self.run_to_children(run,
+                                                                   starts))
+                    run = []
+                    starts = []
+                del stack[depth:]
+                while len(stack) < depth:
+                    quote = hn.ParentNode('blockquote', children=[])
+                    stack[-1].children.append(quote)
+                    stack.append(quote)
+            run.append(text)
+            starts.append(line_offset + end + len(rest) - len(rest.lstrip()))
+        stack[-1].children.extend(self.run_to_children(run, starts))
+        return root
+
+    def run_to_children(self, run: list[str], starts: list[int]
+                        ) -> list[hn.HTMLNode]:
+        """The nodes for a run of lines, joined with spaces. An unclosed
+        delimiter is reported at the offset into the block it's at, as the
+        joined text isn't in the document to be found.
+        """
+        text = " ".join(run)
+        try:
+            return text_to_children(text, definitions=self.definitions,
+                                    inline=self.inline)
+        except tn.UnclosedDelimiterError as e:
+            i = text.find(e.text)
+            if e.offset is not None or i == -1:
+                raise
+            i += e.text.rfind(e.delimiter)
+            for line_text, start in zip(run, starts):
+                if i < len(line_text):
+                    raise tn.UnclosedDelimiterError(e.delimiter, e.text,
+                                                    start + i) from e
+                i -= len(line_text) + 1
+            raise
+
+
+def list_items_match(lines: list[str]) -> bool:
+    """Every line after the first is a list item, indented or not, bulleted
+    or numbered
+    """
+    for line in lines[1:]:
+        if not LIST_ITEM_RE.match(line):
+            return False
+    return True
+
+
+def list_to_html_node(text: str,
+                      definitions: tn.Definitions | None = None,
+                      inline: InlineParser = tn.text_to_textnodes
+                      ) -> hn.HTMLNode:
+    """Build a list, with a nested list wherever items are indented further
+    than the ones before them. Each line is read once, keeping a stack of
+    the lists that are open and how far their items are indented.
+    """
+    root = None
+    stack: list[tuple[int, hn.ParentNode]] = []
+    for line in text.splitlines():
+        match = LIST_ITEM_RE.match(line)
+        indent = len(match[1].expandtabs(4))
+        tag = 'ul' if match[2] else 'ol'
+        # an item only leaves a nested list once it's back out as far as the
+        # list that one is nested in; anything between stays where it is
+        while len(stack) > 1 and indent <= stack[-2][0]:
+            stack.pop()
+        if root is None:
+            root = hn.ParentNode(tag, children=[])
+            stack.append((indent, root))
+        elif indent > stack[-1][0]:
+            items = stack[-1][1].children
+            nested = hn.ParentNode(tag, children=[])
+            items[-1].children.append(nested)
+            stack.append((indent, nested))
+        item = text_to_children(line[match.end():].strip(), 'li',
+                                definitions, inline)[0]
+        stack[-1][1].children.append(item)
+    return root
 
 
 class UnorderedList(Block):
     @staticmethod
     def matches(text: str) -> bool:
-        # all lines must start with a '*' or '-' and a space
+        # all lines must start with a '*' or '-' and a space, unless they're
+        # list items indented to nest them
         lines = text.splitlines()
         if len(lines) < 1:
             return False
         for line in lines:
-            if not (line.startswith('* ') or line.startswith('- ')):
+            if line[:1] not in " \t" and \
+                    not (line.startswith('* ') or line.startswith('- ')):
                 return False
-        return True
+        return list_items_match(lines)
 
     def to_html_node(self) -> hn.HTMLNode:
-        children = []
-        for line in self.raw.splitlines():
-            # trim '*' or '-' and extra space
-            children.extend(text_to_children(line[1:].strip(), 'li'))
-        return hn.ParentNode('ul', children=children)
+        return list_to_html_node(self.raw, self.definitions, self.inline)
 
 
 class OrderedList(Block):
     @staticmethod
     def matches(text: str) -> bool:
-        # first line must start with '1. ' and all lines after must be a
-        # number with a period and a space
+        # first line must start with '1. ' and all lines after must be list
+        # items, numbered unless they're indented to nest them
         lines = text.splitlines()
         if len(lines) < 1 or not lines[0].startswith('1. '):
             return False
         startswith_re = re.compile(r'^\d+\. ')
         for line in lines:
-            if not startswith_re.match(line):
+            if line[:1] not in " \t" and not startswith_re.match(line):
                 return False
-        return True
+        return list_items_match(lines)
 
     def to_html_node(self) -> hn.HTMLNode:
-        children = []
-        for line in self.raw.splitlines():
-            trim = 0
-            for i in range(len(line)):
-                if line[i] == '.':
-                    trim = i + 1
-                    break
-            # trim everything up to the first period and extra space
-            children.extend(text_to_children(line[trim:].strip(), 'li'))
-        return hn.ParentNode('ol', children=children)
-
-
-def text_to_children(text: str, tag: str | None = None) -> list[hn.HTMLNode]:
+        return list_to_html_node(self.raw, self.definitions, self.inline)
+
+
+def text_to_children(text: str, tag: str | None = None,
+                     definitions: tn.Definitions | None = None,
+                     inline: InlineParser = tn.text_to_textnodes
+                     ) -> list[hn.HTMLNode]:
     """Convert text to TextNodes and then child HTMLNodes
     """
     children = []
-    for node in tn.text_to_textnodes(text):
+    for node in inline(text, definitions):
         children.append(node.to_html_node())
     if tag:
         return [hn.ParentNode(tag, children=children)]
     return children
 
 
-def block_to_block_type(text: str) -> Block:
+def block_to_block_type(text: str,
+                        definitions: tn.Definitions | None = None,
+                        inline: InlineParser = tn.text_to_textnodes
+                        ) -> Block:
     """Find appropriate Block class and initialize for each block
     """
     for block_type in (Heading, Code, Quote, UnorderedList, OrderedList):
         if block_type.matches(text):
             # we can skip the constructor check since we already checked
-            return block_type(text, strict=False)
-    return Paragraph(text)
+            return block_type(text, strict=False, definitions=definitions,
+                              inline=inline)
+    return Paragraph(text, definitions=definitions, inline=inline)
 
 
-def markdown_to_block_strings(markdown: str) -> list[str]:
-    """Split full markdown document into block strings to be evaluated later
+def markdown_to_block_spans(markdown: str) -> list[tuple[int, str]]:
+    """Split full markdown document into block strings, each paired with the
+    offset in the document that it starts at
     """
     # Not critical, but trying to be kind to other OS' representation of
     # newlines. This method is also fairly naive and disallows things like
     # extra newlines in codeblocks as it would split up the block erroneously
-    parts = re.split(r'(?:\r?\n){2}', markdown)
-    blocks = []
-    for i in range(len(parts)):
-        if parts[i] == "":
-            continue
-        blocks.append(parts[i].strip())
-    return blocks
+    spans = []
+    start = 0
+    ends = [m.span() for m in BLOCK_SEPARATOR_RE.finditer(markdown)]
+    ends.append((len(markdown), len(markdown)))
+    for end, next_start in ends:
+        part = markdown[start:end]
+        if part != "":
+            stripped = part.lstrip()
+            offset = start + len(part) - len(stripped)
+            spans.append((offset, stripped.rstrip()))
+        start = next_start
+    return spans
+
+
+def markdown_to_block_strings(markdown: str) -> list[str]:
+    """Split full markdown document into block strings to be evaluated later
+    """
+    return [block for _, block in markdown_to_block_spans(markdown)]
+
+
+def position(text: str, offset: int) -> tuple[int, int]:
+    """1-based line and column of an offset into text
+    """
+    line = text.count("\n", 0, offset) + 1
+    column = offset - (text.rfind("\n", 0, offset) + 1) + 1
+    return line, column
 
 
-def markdown_to_html_node(markdown: str) -> hn.HTMLNode:
+def locate_error(error: ValueError, block: str, offset: int) -> int:
+    """Best guess at the document offset a ValueError raised while parsing
+    the block starting at offset was caused by
+    """
+    if isinstance(error, tn.UnclosedDelimiterError):
+        if error.offset is not None:
+            return offset + error.offset
+        i = block.find(error.text)
+        if i != -1:
+            # with an odd number of delimiters, the last one is left open
+            return offset + i + error.text.rfind(error.delimiter)
+    return offset
+
+
+def markdown_to_html_node(markdown: str, deadline: float | None = None,
+                          outline: Outline | None = None,
+                          inline: InlineParser = tn.text_to_textnodes
+                          ) -> hn.HTMLNode:
     """Take full markdown document and make necessary calls to assemble an
-    HTMLNode tree, then return the Parent div that wraps all of it
+    HTMLNode tree, then return the Parent div that wraps all of it. If a
+    time.monotonic() deadline is given, BudgetExceeded is raised as soon as
+    it passes. Parse errors are raised as MarkdownError, pointing at where in
+    the document they were found. Headings are collected into outline as
+    they're parsed, if it's given.
+
+    Reference links and footnotes are resolved against the definitions
+    found in a pass over the blocks before any are rendered, and the
+    footnotes that were referenced are listed at the end. Text is parsed
+    into inline nodes with inline.
     """
-    block_strings = markdown_to_block_strings(markdown)
+    if outline is None:
+        outline = Outline()
+    definitions = tn.Definitions()
+    spans = [(offset, block_string) for offset, block_string
+             in markdown_to_block_spans(markdown)
+             if not definitions.add_block(block_string, offset)]
     children = []
-    for block_string in block_strings:
-        children.append(block_to_block_type(block_string).to_html_node())
+    for offset, block_string in spans:
+        if deadline is not None and time.monotonic() > deadline:
+            raise BudgetExceeded("ran out of time rendering markdown")
+        try:
+            block = block_to_block_type(block_string, definitions or None,
+                                        inline)
+            if isinstance(block, Heading):
+                children.append(block.to_html_node(outline))
+            else:
+                children.append(block.to_html_node())
+        except MarkdownError:
+            raise
+        except ValueError as e:
+            line, column = position(
+                markdown, locate_error(e, block_string, offset))
+            raise MarkdownError(str(e), line, column) from e
+    footnotes = footnotes_to_html_node(markdown, definitions, inline)
+    if footnotes is not None:
+        children.append(footnotes)
     return hn.ParentNode('div', children=children)
+
+
+def footnotes_to_html_node(markdown: str, definitions: tn.Definitions,
+                           inline: InlineParser = tn.text_to_textnodes
+                           ) -> hn.HTMLNode | None:
+    """The footnotes referenced so far, in order, each linking back to where
+    it was first referenced, or None if none were
+    """
+    items = []
+    # footnotes can reference footnotes, which are numbered and added to the
+    # end of cited as they're found
+    for number, key in enumerate(definitions.cited, 1):
+        text, offset = definitions.footnotes[key]
+        try:
+            children = text_to_children(text, definitions=definitions,
+                                        inline=inline)
+        except ValueError as e:
+            line, column = position(markdown, locate_error(e, text, offset))
+            raise MarkdownError(str(e), line, column) from e
+        children.append(hn.LeafNode(None, " "))
+        children.append(hn.LeafNode('a', FOOTNOTE_BACKLINK,
+                                    {"href": f"#fnref-{number}"}))
+        items.append(hn.ParentNode('li', children=children,
+                                   props={"id": f"fn-{number}"}))
+    if not items:
+        return None
+    return hn.ParentNode('section', props={"class": "footnotes"},
+                         children=[hn.ParentNode('ol', children=items)])
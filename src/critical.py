@@ -0,0 +1,251 @@
+import os
+import re
+from typing import Iterable
+
+import htmlnode as hn
+
+
+# parts of a selector that don't narrow down which pages it can apply to:
+# pseudo-classes and elements, with any arguments, and attribute selectors
+IGNORED_RE = re.compile(r'::?[\w-]+(?:\([^)]*\))?|\[[^\]]*\]')
+# type, class and id selectors, as the features a page needs to have
+SIMPLE_RE = re.compile(r'([.#]?)(-?[A-Za-z_][\w-]*)')
+LINK_RE = re.compile(r'<link\b[^>]*>')
+LINK_ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+MARKUP_TAG_RE = re.compile(r'<([A-Za-z][\w-]*)([^>]*)>')
+# at-rules whose rules only apply some of the time, so they're kept around
+# the rules in them that a page needs
+CONDITIONAL_RULES = ("@media", "@supports")
+# the template slot a page's critical CSS is filled into
+SLOT = "{{ Critical }}"
+DEFER_ONLOAD = "this.onload=null;this.rel='stylesheet'"
+
+
+def strip_comments(css: str) -> str:
+    return re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+
+
+def split_rules(css: str) -> list[tuple[str, str]]:
+    """The top level rules in css, as (prelude, body) pairs. Statements
+    without a body, like @import, are left out.
+    """
+    rules = []
+    depth = 0
+    start = 0
+    prelude = ""
+    quote = None
+    for i, char in enumerate(css):
+        if quote:
+            if char == quote and css[i - 1] != "\\":
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "{":
+            if depth == 0:
+                prelude = css[start:i].strip()
+                start = i + 1
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                rules.append((prelude, css[start:i]))
+                start = i + 1
+        elif char == ";" and depth == 0:
+            start = i + 1
+    return rules
+
+
+def split_selectors(prelude: str) -> list[str]:
+    selectors = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(prelude):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return [selector for selector in selectors if selector]
+
+
+def requirements(selector: str) -> frozenset[str]:
+    """The tags (pre), classes (.hl-keyword) and ids (#title) a page has to
+    have for selector to match anything on it. Combinators are ignored, so
+    a page having them all doesn't mean it does match, only that it might.
+    """
+    return frozenset(kind + (name.lower() if not kind else name)
+                     for kind, name in SIMPLE_RE.findall(
+                         IGNORED_RE.sub(' ', selector)))
+
+
+class Rule:
+    """A style rule, or a conditional group rule holding others in rules
+    """
+    def __init__(self, prelude: str, body: str = "",
+                 rules: list["Rule"] | None = None):
+        self.prelude = prelude
+        self.body = " ".join(body.split())
+        self.rules = rules
+        self.selectors = []
+        if rules is None:
+            self.selectors = [(selector, requirements(selector))
+                              for selector in split_selectors(prelude)]
+
+
+def parse(css: str) -> list[Rule]:
+    """Style rules and the conditional group rules around them. Other
+    at-rules, like @font-face and @keyframes, only come with the full
+    stylesheet.
+    """
+    rules = []
+    for prelude, body in split_rules(css):
+        if prelude.startswith(CONDITIONAL_RULES):
+            rules.append(Rule(prelude, rules=parse(body)))
+        elif not prelude.startswith("@"):
+            rules.append(Rule(prelude, body))
+    return rules
+
+
+class Stylesheet:
+    """A stylesheet's rules, ready to be narrowed down to the ones a page
+    can use. Which rules those are only depends on which of the features
+    the stylesheet's selectors mention the page has, so the CSS for each
+    set of them is worked out once and reused by every page that has the
+    same set.
+    """
+    def __init__(self, css: str):
+        self.source = css
+        self.rules = parse(strip_comments(css))
+        vocabulary = set()
+        for rule in self.walk(self.rules):
+            for _, needs in rule.selectors:
+                vocabulary.update(needs)
+        self.vocabulary = frozenset(vocabulary)
+        self.cache: dict[frozenset[str], str] = {}
+
+    @staticmethod
+    def walk(rules: list[Rule]):
+        for rule in rules:
+            if rule.rules is None:
+                yield rule
+            else:
+                yield from Stylesheet.walk(rule.rules)
+
+    def critical(self, features: set[str] | frozenset[str]) -> str:
+        """The CSS a page with features needs to render, leaving out
+        any rule none of whose selectors could match on it
+        """
+        key = self.vocabulary.intersection(features)
+        css = self.cache.get(key)
+        if css is None:
+            css = "".join(self.select(self.rules, key))
+            self.cache[key] = css
+        return css
+
+    def select(self, rules: list[Rule], features: frozenset[str]
+               ) -> list[str]:
+        selected = []
+        for rule in rules:
+            if rule.rules is not None:
+                inner = self.select(rule.rules, features)
+                if inner:
+                    selected.append(f"{rule.prelude}{{{''.join(inner)}}}")
+                continue
+            selectors = [selector for selector, needs in rule.selectors
+                         if needs <= features]
+            if selectors:
+                selected.append(f"{','.join(selectors)}{{{rule.body}}}")
+        return selected
+
+
+def features(nodes: Iterable[hn.HTMLNode | None]) -> set[str]:
+    """Every tag, class and id in the trees of nodes, which may be None
+    """
+    found = set()
+    stack = [node for node in nodes if node is not None]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, hn.RawNode):
+            found.update(markup_features(node.value))
+            continue
+        if node.tag:
+            found.add(node.tag)
+        if node.props:
+            for name in node.props.get("class", "").split():
+                found.add("." + name)
+            if "id" in node.props:
+                found.add("#" + node.props["id"])
+        if node.children:
+            stack.extend(node.children)
+    return found
+
+
+def markup_features(markup: str) -> set[str]:
+    """Every tag, class and id in raw markup, such as a template
+    """
+    found = set()
+    for tag, attrs in MARKUP_TAG_RE.findall(markup):
+        found.add(tag.lower())
+        for name, value in LINK_ATTR_RE.findall(attrs):
+            if name == "class":
+                found.update("." + part for part in value.split())
+            elif name == "id":
+                found.add("#" + value)
+    return found
+
+
+class CriticalCSS:
+    """Inlines the part of each stylesheet under static_dir that a page
+    needs into the page, and loads the rest without blocking rendering.
+    Stylesheets are looked up by the root-relative URL templates link to
+    them by, and parsed once.
+    """
+    def __init__(self, static_dir: str):
+        self.static_dir = os.path.abspath(static_dir)
+        self.sheets: dict[str, Stylesheet | None] = {}
+
+    def stylesheet(self, url: str) -> Stylesheet | None:
+        if url in self.sheets:
+            return self.sheets[url]
+        sheet = None
+        path = os.path.normpath(os.path.join(self.static_dir,
+                                             url.lstrip("/")))
+        if url.startswith("/") and not url.startswith("//") and \
+                os.path.commonpath([self.static_dir, path]) == \
+                self.static_dir and os.path.isfile(path):
+            with open(path) as f:
+                sheet = Stylesheet(f.read())
+        self.sheets[url] = sheet
+        return sheet
+
+    def defer(self, markup: str) -> tuple[str, list[Stylesheet]]:
+        """markup with its links to stylesheets under static_dir loaded
+        without blocking rendering, after a {{ Critical }} slot for the
+        part of them a page needs, and those stylesheets. Stylesheets
+        limited to some media are left alone.
+        """
+        sheets = []
+
+        def replace(match: re.Match) -> str:
+            tag = match[0]
+            attrs = dict(LINK_ATTR_RE.findall(tag))
+            if attrs.get("rel") != "stylesheet" or "media" in attrs:
+                return tag
+            sheet = self.stylesheet(attrs.get("href", ""))
+            if sheet is None:
+                return tag
+            slot = "" if sheets else SLOT
+            sheets.append(sheet)
+            preload = tag.replace(
+                'rel="stylesheet"',
+                f'rel="preload" as="style" onload="{DEFER_ONLOAD}"')
+            return f"{slot}{preload}<noscript>{tag}</noscript>"
+
+        return LINK_RE.sub(replace, markup), sheets
+
+
+def inline(css: str) -> str:
+    return f"<style>{css}</style>" if css else ""
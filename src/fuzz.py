@@ -0,0 +1,313 @@
+"""Differential fuzzing of the markdown parsing entry points.
+
+Random markdown is run through the reference implementation and every other
+registered engine. Any disagreement, whether in output or in the exception
+raised, is minimized to a small reproducing input. Every engine is timed on
+the same inputs, so a speedup that breaks semantics can't go unnoticed, and
+neither can a "fast path" that isn't.
+
+    python src/fuzz.py [--iterations 1000] [--seed 0]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from typing import Any, Callable
+
+import blocks
+import htmlnode as hn
+import textnode as tn
+
+
+TARGETS = ("text_to_textnodes", "markdown_to_block_strings",
+           "markdown_to_html_node")
+
+
+class Engine:
+    def __init__(self, name: str,
+                 text_to_textnodes: Callable[[str], Any],
+                 markdown_to_block_strings: Callable[[str], Any],
+                 markdown_to_html_node: Callable[[str], Any]):
+        self.name = name
+        self.text_to_textnodes = text_to_textnodes
+        self.markdown_to_block_strings = markdown_to_block_strings
+        self.markdown_to_html_node = markdown_to_html_node
+
+
+def regex_split_nodes_extractor(old_nodes: list[tn.TextNode],
+                                extractor: tn.Extractor) -> list[tn.TextNode]:
+    """The original regex-driven split_nodes_extractor, kept as the reference
+    for the linear-time scanner that replaced it. Quadratic on hostile input.
+    """
+    new_nodes = []
+    for node in old_nodes:
+        if node.text_type != tn.TextType.Text:
+            new_nodes.append(node)
+            continue
+        extracts = re.findall(extractor.re_mask, node.text)
+        if not extracts:
+            new_nodes.append(node)
+            continue
+        leftover = node.text
+        for extract in extracts:
+            split_str = extractor.string_from_extract(extract)
+            new_node = tn.TextNode(extract[0], extractor.text_type(),
+                                   extract[1])
+            parts = leftover.split(split_str, 1)
+            if parts[0] == "":
+                new_nodes.append(new_node)
+            else:
+                new_nodes.extend([tn.TextNode(parts[0]), new_node])
+            leftover = parts[1]
+        if leftover:
+            new_nodes.append(tn.TextNode(leftover))
+    return new_nodes
+
+
+def regex_text_to_textnodes(text: str,
+                            definitions: tn.Definitions | None = None
+                            ) -> list[tn.TextNode]:
+    nodes = [tn.TextNode(text)]
+    for extractor in (tn.ImageExtractor(), tn.LinkExtractor()):
+        nodes = regex_split_nodes_extractor(nodes, extractor)
+    if definitions:
+        nodes = tn.split_nodes_references(nodes, definitions)
+    nodes = tn.split_nodes_delimiter(nodes, "**", tn.TextType.Bold)
+    nodes = tn.split_nodes_delimiter(nodes, "*", tn.TextType.Italic)
+    return tn.split_nodes_delimiter(nodes, "`", tn.TextType.Code)
+
+
+def regex_markdown_to_block_strings(markdown: str) -> list[str]:
+    """The original re.split based block splitter, kept as the reference for
+    the offset-tracking one that replaced it
+    """
+    parts = re.split(r'(?:\r?\n){2}', markdown)
+    return [part.strip() for part in parts if part != ""]
+
+
+def regex_markdown_to_html_node(markdown: str) -> hn.HTMLNode:
+    """The block parser with the regex inline parsing above in place of the
+    scanner, so whole documents are checked against the reference too
+    """
+    return blocks.markdown_to_html_node(markdown,
+                                        inline=regex_text_to_textnodes)
+
+
+REFERENCE = Engine("reference", regex_text_to_textnodes,
+                   regex_markdown_to_block_strings,
+                   regex_markdown_to_html_node)
+ENGINES: list[Engine] = []
+
+
+def register(engine: Engine):
+    """Make an alternative engine part of every fuzz run
+    """
+    ENGINES.append(engine)
+
+
+register(Engine("linear", tn.text_to_textnodes,
+                blocks.markdown_to_block_strings,
+                blocks.markdown_to_html_node))
+
+
+WORDS = ("elf", "ring", "Gandalf", "mithril", "x", "1.", "-", ">", "#",
+         "a_b", "ünïcode", "&", "<b>", '"q"')
+URLS = ("/recipes", "https://lotr.fandom.com/wiki/Main_Page", "", "a b",
+        "/images/rivendell.png")
+
+
+class MarkdownGenerator:
+    """Produces random, mostly well-formed markdown from a seeded RNG, with
+    the occasional stray delimiter or bracket to exercise error paths
+    """
+    def __init__(self, seed: int = 0):
+        self.rng = random.Random(seed)
+
+    def words(self, low: int = 1, high: int = 6) -> str:
+        count = self.rng.randint(low, high)
+        return " ".join(self.rng.choice(WORDS) for _ in range(count))
+
+    def inline(self) -> str:
+        parts = []
+        for _ in range(self.rng.randint(1, 6)):
+            kind = self.rng.randrange(11)
+            text = self.words(1, 3)
+            if kind == 0:
+                parts.append(f"**{text}**")
+            elif kind == 1:
+                parts.append(f"*{text}*")
+            elif kind == 2:
+                parts.append(f"`{text}`")
+            elif kind == 3:
+                parts.append(f"[{text}]({self.rng.choice(URLS)})")
+            elif kind == 4:
+                parts.append(f"![{text}]({self.rng.choice(URLS)})")
+            elif kind == 5:
+                # the kind of thing authors get wrong
+                parts.append(self.rng.choice(("*", "**", "`", "[", "](",
+                                              "![", ")", "!", "]")) + text)
+            elif kind == 6:
+                # brackets nested in, or spread across, link syntax
+                parts.append(self.rng.choice((
+                    f"[[{text}]({self.rng.choice(URLS)})",
+                    f"[{text}] ]({self.rng.choice(URLS)}))",
+                    f"![{text}](![{text}]({self.rng.choice(URLS)})",
+                    f"[{text}\n]({self.rng.choice(URLS)})",
+                )))
+            else:
+                parts.append(text)
+        return " ".join(parts)
+
+    def block(self) -> str:
+        kind = self.rng.randrange(7)
+        lines = range(self.rng.randint(1, 4))
+        if kind == 0:
+            return "#" * self.rng.randint(1, 7) + " " + self.inline()
+        if kind == 1:
+            return "```\n" + "\n".join(self.words() for _ in lines) + "\n```"
+        if kind == 2:
+            return "\n".join("> " + self.inline() for _ in lines)
+        if kind == 3:
+            return "\n".join(self.rng.choice("*-") + " " + self.inline()
+                             for _ in lines)
+        if kind == 4:
+            return "\n".join(f"{i + 1}. {self.inline()}" for i in lines)
+        return "\n".join(self.inline() for _ in lines)
+
+    def document(self) -> str:
+        count = self.rng.randint(1, 8)
+        separator = self.rng.choice(("\n\n", "\n\n", "\r\n\r\n", "\n\n\n"))
+        return separator.join(self.block() for _ in range(count))
+
+
+def outcome(func: Callable[[str], Any], text: str) -> tuple:
+    """The result of a call, or the exception it raised, in a form that can be
+    compared across engines
+    """
+    try:
+        return ("ok", func(text))
+    except Exception as e:
+        return ("error", type(e).__name__, str(e))
+
+
+def minimize(text: str, fails: Callable[[str], bool]) -> str:
+    """Shrink text while fails(text) holds, first dropping whole lines and
+    then single characters, in ever smaller chunks (a simple ddmin)
+    """
+    for split in (lambda s: s.splitlines(keepends=True), list):
+        units = split(text)
+        chunk = max(len(units) // 2, 1)
+        while units:
+            i = 0
+            shrunk = False
+            while i < len(units):
+                candidate = units[:i] + units[i + chunk:]
+                if fails("".join(candidate)):
+                    units = candidate
+                    shrunk = True
+                else:
+                    i += chunk
+            if chunk == 1 and not shrunk:
+                break
+            chunk = max(chunk // 2, 1)
+        text = "".join(units)
+    return text
+
+
+class Stats:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.chars = 0
+
+    def rate(self) -> float:
+        """Characters per second
+        """
+        return self.chars / self.seconds if self.seconds else 0.0
+
+
+class Mismatch:
+    def __init__(self, engine: str, target: str, text: str,
+                 expected: tuple, actual: tuple):
+        self.engine = engine
+        self.target = target
+        self.text = text
+        self.expected = expected
+        self.actual = actual
+
+    def __repr__(self) -> str:
+        return (f"Mismatch({self.engine}, {self.target}, {self.text!r}, "
+                f"expected={self.expected!r}, actual={self.actual!r})")
+
+
+class Fuzzer:
+    def __init__(self, engines: list[Engine], seed: int = 0,
+                 reference: Engine = REFERENCE):
+        self.reference = reference
+        self.engines = engines
+        self.generator = MarkdownGenerator(seed)
+        self.stats: dict[tuple[str, str], Stats] = {}
+        self.mismatches: list[Mismatch] = []
+
+    def timed(self, engine: Engine, target: str, text: str) -> tuple:
+        stats = self.stats.setdefault((engine.name, target), Stats())
+        func = getattr(engine, target)
+        start = time.perf_counter()
+        result = outcome(func, text)
+        stats.seconds += time.perf_counter() - start
+        stats.calls += 1
+        stats.chars += len(text)
+        return result
+
+    def check(self, target: str, text: str):
+        expected = self.timed(self.reference, target, text)
+        for engine in self.engines:
+            actual = self.timed(engine, target, text)
+            if actual == expected:
+                continue
+
+            def fails(candidate: str) -> bool:
+                ref = outcome(getattr(self.reference, target), candidate)
+                return outcome(getattr(engine, target), candidate) != ref
+
+            small = minimize(text, fails)
+            self.mismatches.append(Mismatch(
+                engine.name, target, small,
+                outcome(getattr(self.reference, target), small),
+                outcome(getattr(engine, target), small)))
+
+    def run(self, iterations: int) -> list[Mismatch]:
+        for _ in range(iterations):
+            document = self.generator.document()
+            self.check("markdown_to_block_strings", document)
+            self.check("markdown_to_html_node", document)
+            self.check("text_to_textnodes", self.generator.inline())
+        return self.mismatches
+
+    def report(self) -> str:
+        lines = [f"{'engine':<16} {'target':<28} {'calls':>7} {'chars/s':>12}"]
+        for (engine, target), stats in sorted(self.stats.items()):
+            lines.append(f"{engine:<16} {target:<28} {stats.calls:>7}"
+                         f" {stats.rate():>12.0f}")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fuzzer = Fuzzer(ENGINES, args.seed)
+    mismatches = fuzzer.run(args.iterations)
+    print(fuzzer.report())
+    if not ENGINES:
+        print("no alternative engines registered, only timed the reference")
+    for mismatch in mismatches:
+        print(mismatch)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
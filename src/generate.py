@@ -1,8 +1,25 @@
-import shutil
-import pathlib
+import concurrent.futures
+import copy
+import json
 import os
+import time
 
+import assets
+import astcache
 import blocks
+import critical
+import htmlnode as hn
+import images
+import links
+import listing
+import log
+import metrics
+import outputs
+import templates
+import walk
+
+
+FRONT_MATTER_FENCE = "---"
 
 
 def extract_title(markdown: str) -> str:
@@ -18,38 +35,478 @@ def extract_title(markdown: str) -> str:
     return title_line.lstrip("#").strip()
 
 
-def generate_page(from_path: str, dest_path: str, template_path: str):
-    print(f"Generating page from {from_path} to {dest_path}"
-          f" using {template_path}")
+def split_front_matter(markdown: str) -> tuple[dict[str, str], str]:
+    """Split an optional `key: value` front matter block, fenced by `---`
+    lines at the very top of the document, from the markdown that follows it
+    """
+    lines = markdown.splitlines(keepends=True)
+    if not lines or lines[0].strip() != FRONT_MATTER_FENCE:
+        return {}, markdown
+
+    metadata = {}
+    for i in range(1, len(lines)):
+        line = lines[i].strip()
+        if line == FRONT_MATTER_FENCE:
+            return metadata, "".join(lines[i + 1:])
+        key, sep, value = line.partition(":")
+        if sep:
+            metadata[key.strip().lower()] = value.strip()
+    # never closed, so it wasn't front matter after all
+    return {}, markdown
+
+
+def extract_tags(metadata: dict[str, str]) -> list[str]:
+    tags = []
+    for tag in metadata.get("tags", "").split(","):
+        tag = tag.strip()
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+class PageBudget:
+    """Limits on what a single page may cost to render, so one hostile page
+    fails on its own instead of stalling the build
+    """
+    def __init__(self, max_bytes: int | None = None,
+                 max_seconds: float | None = None):
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+
+    def check_size(self, path: str):
+        if self.max_bytes is None:
+            return
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            raise blocks.BudgetExceeded(
+                f"{path} is {size} bytes, over the {self.max_bytes} byte"
+                " page budget")
+
+    def deadline(self) -> float | None:
+        if self.max_seconds is None:
+            return None
+        return time.monotonic() + self.max_seconds
+
+
+class PageError(ValueError):
+    """A page that failed to render, and where. It's made of plain values so
+    it can be raised, collected into a report or returned from a worker
+    process alike.
+    """
+    def __init__(self, path: str, line: int, column: int, kind: str,
+                 message: str):
+        super().__init__(path, line, column, kind, message)
+        self.path = path
+        self.line = line
+        self.column = column
+        self.kind = kind
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line}:{self.column}: {self.message}"
 
-    source = ""
-    with open(from_path) as f:
-        source = f.read()
+    def to_dict(self) -> dict[str, str | int]:
+        return {
+            "path": self.path,
+            "line": self.line,
+            "column": self.column,
+            "kind": self.kind,
+            "message": self.message,
+        }
 
-    template = ""
-    with open(template_path) as f:
-        template = f.read()
 
-    title = extract_title(source)
-    source_node = blocks.markdown_to_html_node(source)
+class PageOptions:
+    """Everything that goes into rendering a page besides its own paths,
+    shared by every page of a build
+    """
+    def __init__(self, templates: templates.TemplateSet,
+                 image_manifest: dict[str, images.ImageInfo] | None = None,
+                 asset_manifest: dict[str, str] | None = None,
+                 minify: bool = False, budget: PageBudget | None = None,
+                 ast_cache: astcache.ASTCache | None = None,
+                 links_root: str | None = None,
+                 output: outputs.Output | None = None):
+        self.templates = templates
+        self.image_manifest = image_manifest
+        self.asset_manifest = asset_manifest
+        self.minify = minify
+        self.budget = budget
+        self.ast_cache = ast_cache
+        # links are only collected when there's somewhere to resolve them
+        # against
+        self.links_root = links_root
+        # pages are handed back to be written by the caller when there's no
+        # output to write them to
+        self.output = output
 
-    template = template.replace("{{ Title }}", title)
-    template = template.replace("{{ Content }}", source_node.to_html())
 
-    with open(dest_path, 'w') as f:
-        f.write(template)
+class BuildResult:
+    def __init__(self):
+        self.pages = 0
+        self.bytes_saved = 0
+        self.errors: list[PageError] = []
+        self.link_report: links.LinkReport | None = None
 
+    def write_error_report(self, path: str):
+        report = {
+            "pages": self.pages,
+            "error_count": len(self.errors),
+            "errors": [error.to_dict() for error in self.errors],
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1)
 
-def generate_pages(src_dir: str, dest_dir: str, template_path: str):
-    if not os.path.exists(dest_dir):
-        os.mkdir(dest_dir)
 
-    for basename in os.listdir(src_dir):
-        src_path = os.path.join(src_dir, basename)
-        if os.path.isdir(src_path):
-            dest_path = os.path.join(dest_dir, basename)
-            generate_pages(src_path, dest_path, template_path)
+def render_html(from_path: str, template: str | templates.Template,
+                image_manifest: dict[str, images.ImageInfo] | None = None,
+                asset_manifest: dict[str, str] | None = None,
+                minifier: hn.Minifier | None = None,
+                budget: PageBudget | None = None,
+                ast_cache: astcache.ASTCache | None = None,
+                page_links: links.PageLinks | None = None
+                ) -> tuple[str, dict[str, str]]:
+    """Render a single markdown page into template, returning the HTML and
+    the page's front matter, with the page title filled in under "title".
+    Anything wrong with the page's contents is raised as a PageError.
+    Parsed markdown comes from ast_cache when it's given. A {{ Toc }} slot
+    in the template is filled with links to the page's headings. The
+    page's links and anchors are collected into page_links if it's given.
+
+    template is either markup, which is prepared for this page alone, or a
+    Template already prepared with the same manifest and minifying, as a
+    TemplateSet does once for every page of a build.
+    """
+    # lines of front matter come before the markdown that's parsed, and
+    # errors should point at the file itself
+    line_offset = 0
+    outline = blocks.Outline()
+    try:
+        deadline = None
+        if budget:
+            budget.check_size(from_path)
+            deadline = budget.deadline()
+
+        source = ""
+        with open(from_path) as f:
+            source = f.read()
+
+        metadata, markdown = split_front_matter(source)
+        line_offset = source.count("\n", 0, len(source) - len(markdown))
+        title = extract_title(markdown)
+        if ast_cache:
+            source_node = ast_cache.parse(markdown, deadline, outline)
         else:
-            filename = pathlib.Path(basename).stem + ".html"
-            dest_path = os.path.join(dest_dir, filename)
-            generate_page(src_path, dest_path, template_path)
+            source_node = blocks.markdown_to_html_node(markdown, deadline,
+                                                       outline)
+    except blocks.MarkdownError as e:
+        kind = type(e.__cause__ or e).__name__
+        raise PageError(from_path, e.line + line_offset, e.column, kind,
+                        e.message) from e
+    except ValueError as e:
+        raise PageError(from_path, line_offset + 1, 1, type(e).__name__,
+                        str(e)) from e
+
+    if page_links is not None:
+        page_links.collect(markdown, outline, line_offset)
+    if image_manifest:
+        images.annotate(source_node, image_manifest)
+    if asset_manifest:
+        assets.rewrite_tree(source_node, asset_manifest)
+    if isinstance(template, str):
+        template = templates.Template(template).prepare(asset_manifest,
+                                                        minifier is not None)
+
+    metadata["title"] = title
+    toc_node = outline.to_html_node()
+    toc = toc_node.to_html(minifier) if toc_node else ""
+    html = template.render(title, source_node.to_html(minifier), toc,
+                           minifier,
+                           template.critical_css(source_node, toc_node))
+    return html, metadata
+
+
+def generate_page(from_path: str, dest_path: str,
+                  template: templates.Template,
+                  image_manifest: dict[str, images.ImageInfo] | None = None,
+                  asset_manifest: dict[str, str] | None = None,
+                  minifier: hn.Minifier | None = None,
+                  budget: PageBudget | None = None,
+                  ast_cache: astcache.ASTCache | None = None,
+                  page_links: links.PageLinks | None = None,
+                  output: outputs.Output | None = None) -> dict[str, str]:
+    """Render a single markdown page into a prepared template at dest_path,
+    through output if it's given, and return its front matter, as
+    render_html does
+    """
+    html, metadata = render_html(from_path, template, image_manifest,
+                                 asset_manifest, minifier, budget, ast_cache,
+                                 page_links)
+    output = output or outputs.DirectoryOutput(os.path.dirname(dest_path))
+    output.write(dest_path, html)
+    return metadata
+
+
+# how long a page took to render, in seconds, and whether its parsed
+# markdown came from the AST cache (None without one)
+PageStats = tuple[float, bool | None]
+# what rendering a page comes back with: its metadata, the bytes saved by
+# minifying, the error it failed with, its links, the page itself, if it was
+# handed back rather than written, and its stats
+RenderOutcome = tuple[dict[str, str] | None, int, PageError | None,
+                      links.PageLinks | None, bytes | None, PageStats]
+
+
+def render_page(from_path: str, dest_path: str, options: PageOptions
+                ) -> RenderOutcome:
+    """Render a page, returning any error rather than raising it
+    """
+    minifier = hn.Minifier() if options.minify else None
+    page_links = None
+    if options.links_root is not None:
+        page_links = links.PageLinks(
+            from_path, links.url_for(dest_path, options.links_root))
+    output = options.output
+    if output is None:
+        output = outputs.MemoryOutput(os.path.dirname(dest_path))
+    ast_cache = options.ast_cache
+    ast_hits = ast_cache.hits if ast_cache else 0
+    start = time.perf_counter()
+    try:
+        metadata = generate_page(from_path, dest_path,
+                                 options.templates.for_page(from_path),
+                                 options.image_manifest,
+                                 options.asset_manifest, minifier,
+                                 options.budget, options.ast_cache,
+                                 page_links, output)
+    except PageError as e:
+        return None, 0, e, None, None, (time.perf_counter() - start, None)
+    except OSError as e:
+        error = PageError(from_path, 1, 1, type(e).__name__, str(e))
+        return None, 0, error, None, None, (time.perf_counter() - start, None)
+    stats = (time.perf_counter() - start,
+             ast_cache.hits > ast_hits if ast_cache else None)
+    page = output.read(dest_path) if options.output is None else None
+    return (metadata, minifier.bytes_saved if minifier else 0, None,
+            page_links, page, stats)
+
+
+def record_page(entry: walk.PlanEntry, error: PageError | None,
+                stats: PageStats):
+    """Record a page's outcome in the build's metrics
+    """
+    seconds, ast_hit = stats
+    metrics.observe("page_render_seconds", seconds)
+    metrics.inc("bytes_read_total", entry.size)
+    if error is not None:
+        metrics.inc("page_errors_total")
+    else:
+        metrics.inc("pages_rendered_total")
+    if ast_hit is not None:
+        metrics.inc("cache_hits_total" if ast_hit else "cache_misses_total",
+                    label="ast")
+
+
+_worker_options: PageOptions | None = None
+
+
+def _init_worker(options: PageOptions):
+    global _worker_options
+    _worker_options = options
+
+
+def _render_in_worker(from_path: str, dest_path: str) -> RenderOutcome:
+    return render_page(from_path, dest_path, _worker_options)
+
+
+def generate_listings(listings: listing.Listings,
+                      template: templates.Template,
+                      minifier: hn.Minifier | None = None):
+    """Write the listing pages that changed into template, which should be
+    prepared the way the rest of the build's pages are
+    """
+    output = listings.output
+    # pages the last build wrote are kept as long as nothing that went into
+    # them changed, down to the stylesheets their critical CSS comes from
+    salt = "\0".join([template.source, str(minifier is not None)] +
+                      [sheet.source for sheet in template.stylesheets])
+    for page in listings.stale_pages(salt=salt):
+        dest_path = os.path.join(listings.root_dir, page.path)
+        log.debug("listing", "Generating listing {dest}", dest=dest_path)
+        output.mkdir(os.path.dirname(dest_path))
+        node = page.to_html_node()
+        html = template.render(page.title, node.to_html(minifier),
+                               minifier=minifier,
+                               critical_css=template.critical_css(node))
+        # listings aren't in the link graph, so they get no prefetch hints
+        output.write(dest_path, html.replace(links.PREFETCH_MARK, "", 1))
+
+
+def generate_pages(src_dir: str, dest_dir: str, template_path: str,
+                   listings: bool = False, page_size: int = 10,
+                   image_manifest: dict[str, images.ImageInfo] | None = None,
+                   asset_manifest: dict[str, str] | None = None,
+                   minify: bool = False,
+                   budget: PageBudget | None = None,
+                   plan: walk.BuildPlan | None = None,
+                   keep_going: bool = False, jobs: int = 1,
+                   ast_cache: astcache.ASTCache | None = None,
+                   check_links: bool = False,
+                   output: outputs.Output | None = None,
+                   template_dir: str | None = None,
+                   critical_css: critical.CriticalCSS | None = None,
+                   prefetch: int = 0,
+                   listing_state: str | None = None) -> BuildResult:
+    """Render every markdown file under src_dir into dest_dir, mirroring the
+    directory layout, as laid out by plan (src_dir is scanned if no plan
+    is given). With listings enabled, paginated directory and tag
+    listing pages are synthesized from the metadata gathered along the way;
+    only the ones that changed since the build that left the state file at
+    listing_state are rendered.
+    Images found in image_manifest get their dimensions and srcset filled in,
+    and asset URLs found in asset_manifest are rewritten to their
+    fingerprinted names.
+
+    The first page that fails raises a PageError, unless keep_going is set,
+    in which case every failure is collected into the result and the rest of
+    the pages are still written. With jobs > 1, pages are rendered by a pool
+    of worker processes. Parsed markdown is reused from ast_cache, which is
+    trimmed to size afterwards.
+
+    With check_links, every link and image in the markdown is checked
+    against an index of what the build published, gathered while rendering,
+    and the result's link_report lists any that point nowhere.
+
+    Everything is written through output, which defaults to the dest_dir
+    directory itself.
+
+    Pages are rendered into template_path, unless template_dir has a
+    template.html for their directory, or one above it, as TemplateSet
+    picks them. Every template is compiled before any page is rendered, and
+    workers are handed them compiled. Listings use template_path. With
+    critical_css, the stylesheets templates link to are loaded without
+    blocking rendering, and the rules each page can use are inlined into
+    it.
+
+    With prefetch, each page's head gets prefetch hints for up to that many
+    of the pages it links to, ranked by a link graph of the whole site.
+    The graph is put together from the links collected while rendering, so
+    pages are held until the last one is rendered, then written.
+    """
+    output = output or outputs.DirectoryOutput(dest_dir)
+    collector = None
+    if listings:
+        collector = listing.Listings(dest_dir, page_size, output,
+                                     listing_state)
+    template_set = templates.TemplateSet(template_path, src_dir,
+                                         template_dir, asset_manifest, minify,
+                                         critical_css, prefetch > 0)
+    graph = links.LinkGraph() if prefetch > 0 else None
+    options = PageOptions(template_set, image_manifest, asset_manifest,
+                          minify, budget, ast_cache,
+                          dest_dir if check_links or graph else None,
+                          output if graph is None else None)
+    if plan is None:
+        plan = walk.scan_content(src_dir, dest_dir)
+    entries = plan.files(walk.PAGE)
+    # a template that doesn't compile fails the build before any page does
+    for entry in entries:
+        template_set.for_page(entry.src_path)
+
+    link_index = links.LinkIndex()
+    page_links = []
+    if check_links:
+        for entry in plan.files(walk.ASSET):
+            link_index.add_file(links.url_for(entry.dest_path, dest_dir))
+        for url in (asset_manifest or {}).values():
+            link_index.add_file(url)
+
+    for path in plan.directories(walk.PAGE):
+        output.mkdir(path)
+
+    pool = None
+    if jobs > 1:
+        worker_options = options
+        if options.output is not None and not output.shareable:
+            # workers hand their pages back to be written here instead
+            worker_options = copy.copy(options)
+            worker_options.output = None
+        pool = concurrent.futures.ProcessPoolExecutor(
+            jobs, initializer=_init_worker, initargs=(worker_options,))
+        outcomes = pool.map(_render_in_worker,
+                            [entry.src_path for entry in entries],
+                            [entry.dest_path for entry in entries],
+                            chunksize=max(len(entries) // (jobs * 4), 1))
+    else:
+        outcomes = (render_page(entry.src_path, entry.dest_path, options)
+                    for entry in entries)
+
+    result = BuildResult()
+    held = []
+    metered = metrics.enabled()
+    start = time.perf_counter()
+    progress = log.progress("pages", len(entries))
+    try:
+        for entry, (metadata, saved, error, found, page, stats) in \
+                zip(entries, outcomes):
+            progress.update()
+            if metered:
+                record_page(entry, error, stats)
+            if error is not None:
+                if not keep_going:
+                    raise error
+                log.error("page_error",
+                          "Error: {path}:{line}:{column}: {message}",
+                          **error.to_dict())
+                result.errors.append(error)
+                continue
+            if graph is not None:
+                graph.add_page(found)
+                held.append((entry.dest_path, found.url, page))
+            elif page is not None:
+                output.write(entry.dest_path, page)
+            log.debug("page", "Generated page {dest} from {src}",
+                      src=entry.src_path, dest=entry.dest_path)
+            result.pages += 1
+            result.bytes_saved += saved
+            if check_links:
+                link_index.add_page(found.url, found.anchors)
+                page_links.append(found)
+            if collector is not None:
+                collector.add(entry.dest_path, metadata["title"],
+                              extract_tags(metadata), entry.mtime)
+    finally:
+        progress.finish()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    mark = links.PREFETCH_MARK.encode()
+    for dest_path, url, page in held:
+        output.write(dest_path,
+                     page.replace(mark, graph.hints(url, prefetch).encode(),
+                                  1))
+    seconds = time.perf_counter() - start
+    log.info("pages", "Generated {pages} pages in {seconds:.2f}s",
+             pages=result.pages, errors=len(result.errors),
+             seconds=round(seconds, 3))
+
+    if collector is not None:
+        minifier = hn.Minifier() if minify else None
+        generate_listings(collector, template_set.default(), minifier)
+        if minifier:
+            result.bytes_saved += minifier.bytes_saved
+        if check_links:
+            for page in collector.pages():
+                link_index.add_file(
+                    links.url_for(os.path.join(dest_dir, page.path), dest_dir))
+    if check_links:
+        result.link_report = link_index.check(page_links)
+        report = result.link_report
+        log.info("links", "Checked {checked} links on {pages} pages,"
+                 " {broken} broken", checked=report.checked,
+                 pages=report.pages, broken=len(report.broken))
+        metrics.inc("broken_links_total", len(report.broken))
+    if minify:
+        log.info("minify", "Minifying saved {bytes_saved} bytes",
+                 bytes_saved=result.bytes_saved)
+    if ast_cache:
+        ast_cache.trim()
+    return result
@@ -0,0 +1,191 @@
+import collections
+import hashlib
+import re
+import threading
+from typing import Iterator
+
+import htmlnode as hn
+
+
+CLASS_PREFIX = "hl-"
+DEFAULT_MAX_ENTRIES = 4096
+
+# shared by the C-like languages below
+C_COMMENT = r'//[^\n]*|/\*(?:[^*]|\*(?!/))*(?:\*/|$)'
+NUMBER = r'\b(?:0[xX][0-9a-fA-F_]+|\d[\d_]*(?:\.\d+)?(?:[eE][+-]?\d+)?)\b'
+
+
+def string_pattern(quote: str) -> str:
+    # an unclosed string runs to the end of the line rather than failing, so
+    # the scan never has to come back for it
+    return rf'{quote}(?:[^{quote}\\\n]|\\.)*{quote}?'
+
+
+def keywords(*words: str) -> str:
+    return r'\b(?:' + "|".join(words) + r')\b'
+
+
+class Lexer:
+    """Splits code into (token type, text) pairs that cover every character
+    of it, with None for text that isn't highlighted
+    """
+    def tokens(self, code: str) -> Iterator[tuple[str | None, str]]:
+        yield None, code
+
+
+class RegexLexer(Lexer):
+    """A lexer made of (token type, pattern) rules, tried in order at each
+    position in a single pass over the code. Patterns should match as much
+    as they can rather than fail late, so the scan stays linear.
+    """
+    def __init__(self, rules: list[tuple[str, str]]):
+        self.pattern = re.compile("|".join(
+            f"(?P<{token_type}>{pattern})" for token_type, pattern in rules))
+
+    def tokens(self, code: str) -> Iterator[tuple[str | None, str]]:
+        pos = 0
+        for match in self.pattern.finditer(code):
+            if match.start() > pos:
+                yield None, code[pos:match.start()]
+            yield match.lastgroup, match.group()
+            pos = match.end()
+        if pos < len(code):
+            yield None, code[pos:]
+
+
+LEXERS: dict[str, Lexer] = {}
+
+
+def register(lexer: Lexer, *languages: str):
+    """Use lexer for code fenced with any of languages, e.g. ```python
+    """
+    for language in languages:
+        LEXERS[language.lower()] = lexer
+
+
+register(RegexLexer([
+    ("comment", r'#[^\n]*'),
+    ("string", r'"""(?:[^"]|"(?!""))*(?:"""|$)|'
+               r"'''(?:[^']|'(?!''))*(?:'''|$)|"
+               + string_pattern('"') + "|" + string_pattern("'")),
+    ("keyword", keywords(
+        "and", "as", "assert", "async", "await", "break", "class", "continue",
+        "def", "del", "elif", "else", "except", "False", "finally", "for",
+        "from", "global", "if", "import", "in", "is", "lambda", "None",
+        "nonlocal", "not", "or", "pass", "raise", "return", "True", "try",
+        "while", "with", "yield")),
+    ("number", NUMBER),
+]), "python", "py")
+register(RegexLexer([
+    ("comment", C_COMMENT),
+    ("string", string_pattern('"') + "|" + string_pattern("'") + "|"
+               r'`(?:[^`\\]|\\.)*`?'),
+    ("keyword", keywords(
+        "async", "await", "break", "case", "catch", "class", "const",
+        "continue", "default", "delete", "do", "else", "export", "extends",
+        "false", "finally", "for", "function", "if", "import", "in",
+        "instanceof", "let", "new", "null", "return", "switch", "this",
+        "throw", "true", "try", "typeof", "undefined", "var", "while",
+        "yield")),
+    ("number", NUMBER),
+]), "javascript", "js", "typescript", "ts")
+register(RegexLexer([
+    ("comment", C_COMMENT),
+    ("string", string_pattern('"') + "|" + string_pattern("'") + "|"
+               r'`[^`]*`?'),
+    ("keyword", keywords(
+        "break", "case", "chan", "const", "continue", "default", "defer",
+        "else", "fallthrough", "false", "for", "func", "go", "goto", "if",
+        "import", "interface", "map", "nil", "package", "range", "return",
+        "select", "struct", "switch", "true", "type", "var")),
+    ("number", NUMBER),
+]), "go", "golang")
+register(RegexLexer([
+    ("comment", r'(?<![^\s;|&])#[^\n]*'),
+    ("string", string_pattern('"') + "|" + r"'[^']*'?"),
+    ("keyword", keywords(
+        "case", "do", "done", "elif", "else", "esac", "export", "fi", "for",
+        "function", "if", "in", "local", "return", "then", "until",
+        "while")),
+    ("variable", r'\$(?:\{[^}\n]*\}?|\w+|[@*#?$!0-9])'),
+]), "bash", "sh", "shell", "console")
+register(RegexLexer([
+    ("string", string_pattern('"')),
+    ("keyword", keywords("true", "false", "null")),
+    ("number", r'-?' + NUMBER),
+]), "json")
+
+
+def fence_language(info: str) -> str | None:
+    """The language named by a code fence's info string: its first word
+    """
+    words = info.split()
+    return words[0].lower() if words else None
+
+
+def render(tokens: Iterator[tuple[str | None, str]]) -> str:
+    """Tokens as markup, with a span for every highlighted one
+    """
+    parts = []
+    for token_type, text in tokens:
+        text = hn.escape_text(text)
+        if token_type is None:
+            parts.append(text)
+        else:
+            parts.append(f'<span class="{CLASS_PREFIX}{token_type}">'
+                         f'{text}</span>')
+    return "".join(parts)
+
+
+class Highlighter:
+    """Highlights code with the registered lexers, remembering the rendered
+    markup for up to max_entries distinct (language, code hash) pairs so a
+    snippet that's repeated across pages is only lexed and rendered once per
+    process. Safe to share between threads.
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.cache: collections.OrderedDict[tuple[str, bytes], str] = \
+            collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def markup(self, language: str, code: str) -> str | None:
+        """code highlighted, or None if there's no lexer for language
+        """
+        lexer = LEXERS.get(language)
+        if lexer is None:
+            return None
+        key = (language, hashlib.blake2b(code.encode(),
+                                         digest_size=16).digest())
+        with self.lock:
+            markup = self.cache.get(key)
+            if markup is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return markup
+            self.misses += 1
+
+        markup = render(lexer.tokens(code))
+        with self.lock:
+            self.cache[key] = markup
+            if len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return markup
+
+    def to_html_node(self, code: str, language: str | None = None
+                     ) -> hn.HTMLNode:
+        """A <code> element for a code block, with a span for every
+        highlighted token when there's a lexer for language
+        """
+        props = {"class": f"language-{language}"} if language else None
+        markup = self.markup(language, code) if language else None
+        if not markup:
+            return hn.LeafNode('code', code, props)
+        return hn.ParentNode('code', children=[hn.RawNode(markup)],
+                             props=props)
+
+
+# what code blocks are highlighted with; each worker process gets its own
+DEFAULT = Highlighter()
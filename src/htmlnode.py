@@ -1,3 +1,74 @@
+import re
+
+
+# whitespace is significant inside these, so the minifier leaves them be
+PREFORMATTED_TAGS = ('pre', 'textarea', 'script', 'style')
+WHITESPACE_RE = re.compile(r'\s+')
+# indentation and line breaks between two tags in template markup; next to
+# text, a run of whitespace is collapsed to a space like any other, as it
+# still separates words
+TAG_WHITESPACE_RE = re.compile(r'(?<=>)\s*\n\s*(?=<)')
+PREFORMATTED_RE = re.compile(
+    r'(<(%s)\b.*?</\2\s*>)' % '|'.join(PREFORMATTED_TAGS),
+    re.DOTALL | re.IGNORECASE)
+
+
+def escape_text(text: str) -> str:
+    """Escape text for use as element content. Most text has nothing to
+    escape, so check for that first: `in` is a plain C scan and much cheaper
+    than building a new string. Chained str.replace calls beat both a
+    translate table and html.escape here (see bench_escape.py).
+    """
+    if '&' not in text and '<' not in text and '>' not in text:
+        return text
+    return (text.replace('&', '&amp;').replace('<', '&lt;')
+            .replace('>', '&gt;'))
+
+
+def escape_attr(value: str) -> str:
+    """Escape text for use inside a double-quoted attribute value
+    """
+    if '&' not in value and '<' not in value and '>' not in value and \
+            '"' not in value:
+        return value
+    return (value.replace('&', '&amp;').replace('<', '&lt;')
+            .replace('>', '&gt;').replace('"', '&quot;'))
+
+
+class Minifier:
+    """Collapses insignificant whitespace while HTML is being serialized and
+    keeps count of how many bytes that saved. Only ASCII whitespace is ever
+    removed, so characters and bytes saved are the same thing.
+    """
+    def __init__(self):
+        self.bytes_saved = 0
+
+    def text(self, text: str) -> str:
+        minified = WHITESPACE_RE.sub(' ', text)
+        self.bytes_saved += len(text) - len(minified)
+        return minified
+
+    def markup(self, html: str) -> str:
+        """Minify raw markup, such as a template, leaving preformatted
+        elements untouched
+        """
+        parts = PREFORMATTED_RE.split(html)
+        minified = []
+        # split() yields text, then a (whole element, tag name) pair per match
+        for i in range(0, len(parts), 3):
+            # preformatted elements either side are tags too
+            before = ">" if i else ""
+            after = "<" if i + 1 < len(parts) else ""
+            text = TAG_WHITESPACE_RE.sub('', before + parts[i] + after)
+            text = text[len(before):len(text) - len(after)]
+            minified.append(WHITESPACE_RE.sub(' ', text))
+            if i + 1 < len(parts):
+                minified.append(parts[i + 1])
+        result = "".join(minified).strip()
+        self.bytes_saved += len(html) - len(result)
+        return result
+
+
 class HTMLNode:
     def __init__(self, tag: str | None = None, value: str | None = None,
                  children: list['HTMLNode'] | None = None,
@@ -7,7 +78,7 @@ class HTMLNode:
         self.children = children
         self.props = props
     
-    def to_html(self) -> str:
+    def to_html(self, minifier: Minifier | None = None) -> str:
         raise NotImplementedError
     
     def props_to_html(self) -> str:
@@ -15,7 +86,7 @@ class HTMLNode:
         if self.props is None:
             return prop_string
         for key, value in self.props.items():
-            prop_string += f' {key}="{value}"'
+            prop_string += f' {key}="{escape_attr(value)}"'
         return prop_string
 
     def __eq__(self, other: object) -> bool:
@@ -44,19 +115,38 @@ class LeafNode(HTMLNode):
                   props: dict[str, str] | None = None):
         super().__init__(tag=tag, value=value, props=props)
 
-    def to_html(self) -> str:
+    def to_html(self, minifier: Minifier | None = None) -> str:
         # NOTE(thomasem): checking specifically for None here because an empty
         # string is an OK value
         if self.value is None:
             raise ValueError(self.value_required_error)
+        value = self.value
+        if minifier and self.tag not in PREFORMATTED_TAGS:
+            value = minifier.text(value)
+        # code is escaped like any other text, but otherwise left as is
+        value = escape_text(value)
         if not self.tag:
-            return self.value
-        return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+            return value
+        return f"<{self.tag}{self.props_to_html()}>{value}</{self.tag}>"
 
     def __repr__(self) -> str:
         return f"LeafNode({self.tag}, {self.value}, {self.props})"
 
 
+class RawNode(HTMLNode):
+    """Markup that's already been rendered, like highlighted code cached as
+    HTML, written out exactly as is
+    """
+    def __init__(self, value: str):
+        super().__init__(value=value)
+
+    def to_html(self, minifier: Minifier | None = None) -> str:
+        return self.value
+
+    def __repr__(self) -> str:
+        return f"RawNode({self.value})"
+
+
 class ParentNode(HTMLNode):
     tag_required_error = "tag required for ParentNode"
     children_required_error = "children required for ParentNode"
@@ -65,16 +155,34 @@ class ParentNode(HTMLNode):
                  props: dict[str, str] | None = None):
         super().__init__(tag=tag, children=children, props=props)
 
-    def to_html(self) -> str:
-        if not self.tag:
-            raise ValueError(self.tag_required_error)
-        if not self.children:
-            raise ValueError(self.children_required_error)
-
-        html = f"<{self.tag}{self.props_to_html()}>"
-        for child in self.children:
-            html += f"{child.to_html()}"
-        return html + f"</{self.tag}>"
+    def to_html(self, minifier: Minifier | None = None) -> str:
+        # walks the tree with a stack rather than recursing, so however
+        # deeply nested a page is, it can't hit the recursion limit
+        parts = []
+        stack: list[tuple[HTMLNode | str, Minifier | None]] = [
+            (self, minifier)]
+        while stack:
+            node, minifier = stack.pop()
+            if isinstance(node, str):
+                # the closing tag of a node opened earlier
+                parts.append(node)
+                continue
+            if not isinstance(node, ParentNode):
+                parts.append(node.to_html(minifier))
+                continue
+            if not node.tag:
+                raise ValueError(self.tag_required_error)
+            if not node.children:
+                raise ValueError(self.children_required_error)
+            if node.tag in PREFORMATTED_TAGS:
+                # e.g. <pre><code> from code blocks must come out exactly as
+                # is
+                minifier = None
+            parts.append(f"<{node.tag}{node.props_to_html()}>")
+            stack.append((f"</{node.tag}>", None))
+            for child in reversed(node.children):
+                stack.append((child, minifier))
+        return "".join(parts)
 
     def __repr__(self) -> str:
         return f"ParentNode({self.tag}, {self.children}, {self.props})"
@@ -0,0 +1,315 @@
+import concurrent.futures
+import hashlib
+import json
+import os
+import struct
+
+import htmlnode as hn
+import outputs
+import walk
+
+try:
+    from PIL import Image
+except ImportError:  # resizing is optional, dimensions are not
+    Image = None
+
+
+INDEX_FILENAME = "index.json"
+EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+DEFAULT_WIDTHS = (480, 960, 1600)
+DEFAULT_QUALITY = 80
+# matches the max-width of the article body in static/index.css
+DEFAULT_SIZES = "(max-width: 800px) 100vw, 800px"
+
+
+def image_size(path: str) -> tuple[int, int] | None:
+    """Read width and height from the header of a PNG, GIF or JPEG file
+    without decoding it, returning None for anything unrecognized
+    """
+    with open(path, 'rb') as f:
+        head = f.read(26)
+        if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10])
+        if not head.startswith(b'\xff\xd8'):
+            return None
+        # walk JPEG segments until we hit a start-of-frame marker; a file
+        # that ends first is as unrecognized as any other
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xff:
+                return None
+            if 0xc0 <= marker[1] <= 0xcf and marker[1] not in (0xc4, 0xc8,
+                                                                0xcc):
+                frame = f.read(7)
+                if len(frame) < 7:
+                    return None
+                height, width = struct.unpack('>HH', frame[3:7])
+                return width, height
+            length = f.read(2)
+            if len(length) < 2:
+                return None
+            length = struct.unpack('>H', length)[0]
+            if length < 2:
+                return None
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+class Variant:
+    def __init__(self, width: int, height: int, filename: str):
+        self.width = width
+        self.height = height
+        self.filename = filename
+
+
+class ImageInfo:
+    def __init__(self, width: int, height: int, variants: list[Variant]):
+        self.width = width
+        self.height = height
+        self.variants = variants
+
+    def props(self, url: str, sizes: str = DEFAULT_SIZES) -> dict[str, str]:
+        """Extra img attributes for an image published at url
+        """
+        props = {"width": str(self.width), "height": str(self.height)}
+        if self.variants:
+            base = url.rsplit("/", 1)[0]
+            srcset = [f"{base}/{v.filename} {v.width}w"
+                      for v in self.variants]
+            srcset.append(f"{url} {self.width}w")
+            props["srcset"] = ", ".join(srcset)
+            props["sizes"] = sizes
+        return props
+
+
+def _resize(src_path: str, dest_path: str, width: int, quality: int):
+    with Image.open(src_path) as img:
+        height = round(img.height * width / img.width)
+        resized = img.resize((width, height), Image.LANCZOS)
+        # written aside first, so a failed save doesn't leave a partial file
+        # that later builds take for a cached variant
+        root, ext = os.path.splitext(dest_path)
+        tmp_path = root + ".tmp" + ext
+        resized.save(tmp_path, quality=quality, optimize=True)
+    os.replace(tmp_path, dest_path)
+
+
+class ImageCache:
+    """Persistent cache of resized image variants.
+
+    Derivatives are stored under cache_dir, named by the hash of their source
+    and the parameters used to produce them. An index records each source's
+    size and mtime, so an unchanged image is recognized with a stat of it
+    and of its variants, and never re-read or re-hashed.
+    """
+    def __init__(self, cache_dir: str,
+                 widths: tuple[int, ...] = DEFAULT_WIDTHS,
+                 quality: int = DEFAULT_QUALITY, workers: int | None = None):
+        self.cache_dir = cache_dir
+        self.widths = tuple(sorted(widths))
+        self.quality = quality
+        self.workers = workers
+        self.index: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self.params = f"w={','.join(map(str, self.widths))};q={quality}"
+        if Image is None:
+            # without Pillow we can only report dimensions
+            self.params = "noresize"
+
+    def load_index(self):
+        path = os.path.join(self.cache_dir, INDEX_FILENAME)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            try:
+                self.index = json.load(f)
+            except json.JSONDecodeError:
+                self.index = {}
+
+    def save_index(self):
+        with open(os.path.join(self.cache_dir, INDEX_FILENAME), 'w') as f:
+            json.dump(self.index, f, sort_keys=True, indent=1)
+
+    def _lookup(self, src_path: str, stamp: tuple[int, int]) -> dict | None:
+        entry = self.index.get(src_path)
+        if entry is None:
+            return None
+        if (entry["size"], entry["mtime_ns"], entry["params"]) != \
+                (*stamp, self.params) or not self._cached(entry):
+            return None
+        return entry
+
+    def _cached(self, entry: dict) -> bool:
+        """Whether every variant entry lists is still in the cache, which
+        may have been pruned since
+        """
+        return all(os.path.exists(os.path.join(self.cache_dir, filename))
+                   for _, _, filename in entry["variants"])
+
+    def _build(self, src_path: str, stamp: tuple[int, int]) -> dict:
+        entry = {
+            "size": stamp[0],
+            "mtime_ns": stamp[1],
+            "params": self.params,
+            "width": None,
+            "height": None,
+            "variants": [],
+        }
+        size = image_size(src_path)
+        if size is None and Image is not None:
+            try:
+                with Image.open(src_path) as img:
+                    size = img.size
+            except OSError:
+                pass
+        if size is None:
+            # nothing we can tell the browser, but remember that so the next
+            # build doesn't have to open the file again
+            return entry
+        width, height = size
+        digest = walk.file_hash(src_path)
+
+        stem, ext = os.path.splitext(os.path.basename(src_path))
+        variants = []
+        if Image is not None and ext.lower() != ".gif":
+            key = hashlib.sha256(f"{digest};{self.params}".encode())
+            key = key.hexdigest()[:12]
+            try:
+                for w in self.widths:
+                    if w >= width:
+                        break
+                    filename = f"{stem}.{key}-{w}w{ext}"
+                    cached = os.path.join(self.cache_dir, filename)
+                    if not os.path.exists(cached):
+                        _resize(src_path, cached, w, self.quality)
+                    variants.append([w, round(height * w / width),
+                                     filename])
+            except OSError:
+                # a header that reads fine on a body Pillow can't decode;
+                # the original is still published, just without variants
+                variants = []
+
+        entry.update(hash=digest, width=width, height=height,
+                     variants=variants)
+        return entry
+
+    def process(self, src_paths: list[str],
+                stamps: dict[str, tuple[int, int]] | None = None
+                ) -> dict[str, ImageInfo]:
+        """Make sure every image in src_paths has up to date variants in the
+        cache, resizing misses in parallel, and return info keyed by path.
+        stamps holds the (size, mtime_ns) of paths already stat'ed, like the
+        entries of a build plan, so they aren't stat'ed again.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.load_index()
+
+        entries = {}
+        misses = []
+        for path in src_paths:
+            stamp = stamps.get(path) if stamps else None
+            if stamp is None:
+                stat = os.stat(path)
+                stamp = (stat.st_size, stat.st_mtime_ns)
+            entry = self._lookup(path, stamp)
+            if entry is None:
+                misses.append((path, stamp))
+            else:
+                entries[path] = entry
+        self.hits += len(entries)
+        self.misses += len(misses)
+
+        if misses:
+            with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+                futures = {pool.submit(self._build, path, stamp): path
+                           for path, stamp in misses}
+                for future in concurrent.futures.as_completed(futures):
+                    entries[futures[future]] = future.result()
+            self.index.update((path, entries[path]) for path, _ in misses)
+            self.save_index()
+
+        infos = {}
+        for path, entry in entries.items():
+            if entry["width"] is not None:
+                infos[path] = _image_info(entry)
+        return infos
+
+    def indexed(self, static_dir: str) -> dict[str, ImageInfo]:
+        """Info for every image under static_dir as of the last time it was
+        processed, keyed by site URL like process_images, without looking
+        at the images themselves
+        """
+        self.load_index()
+        static_dir = os.path.abspath(static_dir)
+        manifest = {}
+        for path, entry in self.index.items():
+            if entry["width"] is None or entry["params"] != self.params or \
+                    os.path.commonpath([static_dir, path]) != static_dir or \
+                    not self._cached(entry):
+                continue
+            rel_path = os.path.relpath(path, static_dir)
+            manifest["/" + rel_path.replace(os.sep, "/")] = \
+                _image_info(entry)
+        return manifest
+
+    def publish(self, info: ImageInfo, dest_dir: str,
+                output: outputs.Output | None = None):
+        """Place the cached variants of an image next to its published copy
+        """
+        output = output or outputs.DirectoryOutput(dest_dir)
+        for variant in info.variants:
+            dest = os.path.join(dest_dir, variant.filename)
+            if output.exists(dest):
+                continue
+            src = os.path.join(self.cache_dir, variant.filename)
+            output.copy(src, dest, link=True)
+
+
+def _image_info(entry: dict) -> ImageInfo:
+    variants = [Variant(*v) for v in entry["variants"]]
+    return ImageInfo(entry["width"], entry["height"], variants)
+
+
+def process_images(static_dir: str, public_dir: str, cache: ImageCache,
+                   plan: walk.BuildPlan | None = None,
+                   output: outputs.Output | None = None
+                   ) -> dict[str, ImageInfo]:
+    """Process every image under static_dir, publish its variants into the
+    mirrored location under public_dir, through output if it's given, and
+    return info keyed by site URL
+    """
+    output = output or outputs.DirectoryOutput(public_dir)
+    if plan is None:
+        plan = walk.scan_static(static_dir, public_dir)
+    entries = [entry for entry in plan.files(walk.ASSET)
+               if entry.src_path.lower().endswith(EXTENSIONS)]
+    src_paths = [entry.src_path for entry in entries]
+    stamps = {entry.src_path: (entry.size, entry.mtime_ns)
+              for entry in entries if entry.mtime_ns is not None}
+
+    manifest = {}
+    for src_path, info in cache.process(src_paths, stamps).items():
+        rel_path = os.path.relpath(src_path, static_dir)
+        dest_dir = os.path.dirname(os.path.join(public_dir, rel_path))
+        output.mkdir(dest_dir)
+        cache.publish(info, dest_dir, output)
+        manifest["/" + rel_path.replace(os.sep, "/")] = info
+    return manifest
+
+
+def annotate(node: hn.HTMLNode, manifest: dict[str, ImageInfo]):
+    """Add dimensions and srcset to every img in the tree that has an entry
+    in the manifest
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.tag == 'img' and node.props:
+            info = manifest.get(node.props.get("src", ""))
+            if info is not None:
+                node.props.update(info.props(node.props["src"]))
+        if node.children:
+            stack.extend(node.children)
@@ -0,0 +1,289 @@
+import collections
+import json
+import os
+import urllib.parse
+
+import blocks
+import htmlnode as hn
+import textnode as tn
+
+
+LINK = "link"
+IMAGE = "image"
+EXTRACTORS = ((IMAGE, tn.ImageExtractor()), (LINK, tn.LinkExtractor()))
+# what every reference definition line has in it
+DEFINITION_MARK = "]:"
+# where a page's prefetch hints go, once the link graph can rank them
+PREFETCH_MARK = "<!-- prefetch -->"
+
+
+def url_for(dest_path: str, dest_dir: str) -> str:
+    """The site URL a file written to dest_path is published at
+    """
+    return "/" + os.path.relpath(dest_path, dest_dir).replace(os.sep, "/")
+
+
+def canonical_url(url: str) -> str:
+    """How to link to the published URL url without a redirect: index
+    pages by their directory, with a trailing slash, and everything quoted
+    """
+    if url.endswith("/index.html"):
+        url = url[:-len("index.html")]
+    return urllib.parse.quote(url)
+
+
+def link_path(url: str, page_url: str) -> str | None:
+    """The site path a link to url on page_url points at, without any query
+    or fragment, or None if it points off the site
+    """
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme or parts.netloc:
+        return None
+    if not parts.path:
+        # a bare #fragment points into the page itself
+        return page_url
+    return urllib.parse.unquote(urllib.parse.urljoin(page_url, parts.path))
+
+
+def target(path: str, urls: dict[str, object] | set[str]) -> str | None:
+    """The published URL in urls a link path refers to, following
+    directory links to their index page
+    """
+    if path in urls:
+        return path
+    index = path.rstrip("/") + "/index.html"
+    if index in urls:
+        return index
+    return None
+
+
+class Link:
+    def __init__(self, kind: str, url: str, line: int, column: int):
+        self.kind = kind
+        self.url = url
+        self.line = line
+        self.column = column
+
+
+class PageLinks:
+    """The links and images a page points at, and the anchors it offers to
+    links pointing at it
+    """
+    def __init__(self, src_path: str, url: str):
+        self.src_path = src_path
+        self.url = url
+        self.anchors: list[str] = []
+        self.links: list[Link] = []
+
+    def collect(self, markdown: str, outline: blocks.Outline,
+                line_offset: int = 0):
+        """Find every link and image in markdown, skipping code blocks the
+        same way the parser does, along with where each one starts
+        """
+        self.anchors = [slug for _, slug, _ in outline.headings]
+        # links are found in document order, so lines are counted
+        # incrementally, each newline once
+        line = 1 + line_offset
+        counted_to = 0
+        # links never span lines, let alone blocks, so unless there are code
+        # blocks to skip or reference definitions to find the whole document
+        # can be searched at once
+        spans = [(0, markdown)]
+        has_definitions = DEFINITION_MARK in markdown
+        if blocks.BACKTICKS in markdown or has_definitions:
+            spans = [(offset, block) for offset, block
+                     in blocks.markdown_to_block_spans(markdown)
+                     if not blocks.Code.matches(block)]
+        definitions = tn.Definitions()
+        found = []
+        for offset, block in spans:
+            for kind, extractor in EXTRACTORS:
+                for start, _, _, url in extractor.find_all(block):
+                    found.append((offset + start, kind, url))
+            if has_definitions:
+                definitions.add_block(block, offset)
+        # reference links and images point wherever their definition does,
+        # so that's what's checked, once
+        found.extend((start, LINK, url) for start, url in definitions.urls)
+        found.sort()
+        for start, kind, url in found:
+            line += markdown.count("\n", counted_to, start)
+            counted_to = start
+            column = start - markdown.rfind("\n", 0, start)
+            self.links.append(Link(kind, url, line, column))
+
+
+class BrokenLink:
+    def __init__(self, src_path: str, line: int, column: int, kind: str,
+                 url: str, reason: str):
+        self.src_path = src_path
+        self.line = line
+        self.column = column
+        self.kind = kind
+        self.url = url
+        self.reason = reason
+
+    def __str__(self) -> str:
+        return (f"{self.src_path}:{self.line}:{self.column}: {self.reason}"
+                f" {self.kind} {self.url}")
+
+    def to_dict(self) -> dict[str, str | int]:
+        return {
+            "path": self.src_path,
+            "line": self.line,
+            "column": self.column,
+            "kind": self.kind,
+            "url": self.url,
+            "reason": self.reason,
+        }
+
+
+class LinkReport:
+    def __init__(self):
+        self.pages = 0
+        self.checked = 0
+        self.external = 0
+        self.broken: list[BrokenLink] = []
+
+    def to_dict(self) -> dict:
+        return {
+            "pages": self.pages,
+            "checked": self.checked,
+            "external": self.external,
+            "broken_count": len(self.broken),
+            "broken": [link.to_dict() for link in self.broken],
+        }
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+
+class LinkIndex:
+    """Every URL a build publishes, and the anchors on each page, held in
+    dicts so checking a link is a couple of hash lookups however big the
+    site is
+    """
+    def __init__(self):
+        # None where a file's anchors aren't known, so any fragment passes
+        self.anchors: dict[str, set[str] | None] = {}
+
+    def add_file(self, url: str):
+        self.anchors.setdefault(url, None)
+
+    def add_page(self, url: str, anchors: list[str]):
+        self.anchors[url] = set(anchors)
+
+    def problem(self, url: str, page_url: str) -> str | None:
+        """What's wrong with a link to url from page_url: "external" if it
+        isn't checked at all, or why it's broken, or None if it's fine
+        """
+        path = link_path(url, page_url)
+        if path is None:
+            return "external"
+        found = target(path, self.anchors)
+        if found is None:
+            return "missing"
+        fragment = urllib.parse.urlsplit(url).fragment
+        if fragment:
+            anchors = self.anchors[found]
+            if anchors is not None and fragment not in anchors:
+                return "missing anchor in"
+        return None
+
+    def check(self, pages: list[PageLinks]) -> LinkReport:
+        report = LinkReport()
+        # sites link to the same few places over and over, so each distinct
+        # URL is only resolved once per directory it's linked from (and once
+        # overall, when it's root-relative or a bare fragment)
+        problems: dict[tuple[str, str], str | None] = {}
+        for page in pages:
+            report.pages += 1
+            base = page.url.rsplit("/", 1)[0]
+            for link in page.links:
+                if link.url.startswith("/") and \
+                        not link.url.startswith("//"):
+                    key = ("", link.url)
+                elif link.url.startswith("#"):
+                    key = (page.url, link.url)
+                else:
+                    key = (base, link.url)
+                try:
+                    problem = problems[key]
+                except KeyError:
+                    problem = problems[key] = self.problem(link.url,
+                                                           page.url)
+                if problem == "external":
+                    report.external += 1
+                    continue
+                report.checked += 1
+                if problem:
+                    report.broken.append(BrokenLink(
+                        page.src_path, link.line, link.column, link.kind,
+                        link.url, problem))
+        return report
+
+
+class LinkGraph:
+    """Which pages link to which, added to a page at a time as each one is
+    rendered, from the links it was rendered with. Once every page is in,
+    it ranks where each page's readers are likely to go next.
+    """
+    def __init__(self):
+        # the site paths each page links to, in the order it first does,
+        # each with the query it links to it with
+        self.edges: dict[str, list[tuple[str, str]]] = {}
+        self.in_degree: dict[str, int] | None = None
+
+    def add_page(self, page: PageLinks):
+        seen = set()
+        edges = []
+        for link in page.links:
+            if link.kind != LINK:
+                continue
+            path = link_path(link.url, page.url)
+            if path is None or path == page.url or path in seen:
+                continue
+            seen.add(path)
+            edges.append((path, urllib.parse.urlsplit(link.url).query))
+        self.edges[page.url] = edges
+        self.in_degree = None
+
+    def pages_in_degree(self) -> dict[str, int]:
+        """How many other pages link to each page, however they link to it
+        """
+        if self.in_degree is None:
+            self.in_degree = collections.Counter()
+            for url, edges in self.edges.items():
+                pages = {target(path, self.edges) for path, _ in edges}
+                pages.discard(None)
+                pages.discard(url)
+                self.in_degree.update(pages)
+        return self.in_degree
+
+    def next_pages(self, url: str, count: int) -> list[str]:
+        """The canonical URLs of up to count pages the page at url links
+        to, most likely to be visited next first. Links further up the page
+        and to pages more of the site links to rank higher.
+        """
+        in_degree = self.pages_in_degree()
+        ranked = []
+        seen = {url}
+        for position, (path, query) in enumerate(self.edges.get(url, ())):
+            page = target(path, self.edges)
+            if page is None or page in seen:
+                continue
+            seen.add(page)
+            score = (1 + in_degree.get(page, 0)) / (1 + position)
+            # the resolved page's own URL, not the link's, which may only
+            # get there through a redirect
+            href = canonical_url(page)
+            if query:
+                href += "?" + query
+            ranked.append((-score, position, href))
+        ranked.sort()
+        return [href for _, _, href in ranked[:count]]
+
+    def hints(self, url: str, count: int) -> str:
+        return "".join(f'<link rel="prefetch" href="{hn.escape_attr(href)}">'
+                       for href in self.next_pages(url, count))
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+
+import blocks
+import htmlnode as hn
+import outputs
+
+
+INDEX_FILENAME = "index.html"
+TAGS_DIR = "tags"
+
+
+class Entry:
+    def __init__(self, href: str, title: str, tags: list[str], mtime: float):
+        self.href = href
+        self.title = title
+        self.tags = tags
+        self.mtime = mtime
+
+    def sort_key(self) -> tuple[float, str]:
+        return (self.mtime, self.href)
+
+    def __repr__(self) -> str:
+        return f"Entry({self.href}, {self.title}, {self.tags}, {self.mtime})"
+
+
+class ListingPage:
+    def __init__(self, path: str, title: str, entries: list[Entry],
+                 older: str | None = None, newer: str | None = None):
+        self.path = path
+        self.title = title
+        self.entries = entries
+        self.older = older
+        self.newer = newer
+
+    def digest(self, salt: str = "") -> str:
+        """Hash of everything that ends up on the rendered page, used to
+        decide whether a previously written page is still current
+        """
+        h = hashlib.sha256(salt.encode())
+        h.update(repr((self.title, self.older, self.newer)).encode())
+        for entry in self.entries:
+            h.update(repr((entry.href, entry.title)).encode())
+        return h.hexdigest()
+
+    def to_html_node(self) -> hn.HTMLNode:
+        items = []
+        # pages are filled oldest first, but read best newest first
+        for entry in reversed(self.entries):
+            link = hn.LeafNode('a', entry.title, {"href": entry.href})
+            items.append(hn.ParentNode('li', children=[link]))
+        children = [
+            hn.LeafNode('h1', self.title),
+            hn.ParentNode('ul', children=items),
+        ]
+        nav = []
+        if self.newer:
+            nav.append(hn.LeafNode('a', "Newer", {"href": self.newer}))
+        if self.older:
+            if nav:
+                nav.append(hn.LeafNode(None, " | "))
+            nav.append(hn.LeafNode('a', "Older", {"href": self.older}))
+        if nav:
+            children.append(hn.ParentNode('p', children=nav))
+        return hn.ParentNode('div', children=children)
+
+
+class Listings:
+    """Collects page metadata during a generate_pages walk and turns it into
+    paginated directory and tag listing pages.
+
+    Pages are numbered from the oldest entry forward, so a new post only ever
+    lands on the last page. Together with the digests kept in the state
+    file at state_path, that means adding one post re-renders the newest
+    page, the index that mirrors it and, when a new page is started, the
+    page before it. Without a state file every page is rendered.
+    """
+    def __init__(self, root_dir: str, page_size: int = 10,
+                 output: outputs.Output | None = None,
+                 state_path: str | None = None):
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        self.root_dir = root_dir
+        # where the pages are written
+        self.output = output or outputs.DirectoryOutput(root_dir)
+        # kept outside the output, which a full build clears
+        self.state_path = state_path
+        self.page_size = page_size
+        self.directories: dict[str, list[Entry]] = {}
+        self.tags: dict[str, list[Entry]] = {}
+        self.indexed: set[str] = set()
+        # every page added, which no listing page may be written over
+        self.paths: set[str] = set()
+
+    def add(self, dest_path: str, title: str, tags: list[str],
+            mtime: float):
+        rel_path = os.path.relpath(dest_path, self.root_dir)
+        self.paths.add(rel_path)
+        rel_dir, filename = os.path.split(rel_path)
+        if filename == INDEX_FILENAME:
+            # hand-written indexes win over generated ones, and aren't listed
+            # in their own directory
+            self.indexed.add(rel_dir)
+            return
+
+        entry = Entry("/" + rel_path.replace(os.sep, "/"), title, tags, mtime)
+        self.directories.setdefault(rel_dir, []).append(entry)
+        for tag in tags:
+            self.tags.setdefault(tag, []).append(entry)
+
+    def _paginate(self, rel_dir: str, title: str,
+                  entries: list[Entry]) -> list[ListingPage]:
+        entries = sorted(entries, key=Entry.sort_key)
+        chunks = [entries[i:i + self.page_size]
+                  for i in range(0, len(entries), self.page_size)]
+
+        def page_path(number: int) -> str:
+            return os.path.join(rel_dir, f"page-{number}.html")
+
+        def page_href(number: int) -> str:
+            return "/" + page_path(number).replace(os.sep, "/")
+
+        pages = []
+        for i, chunk in enumerate(chunks):
+            number = i + 1
+            older = page_href(number - 1) if number > 1 else None
+            newer = page_href(number + 1) if number < len(chunks) else None
+            pages.append(ListingPage(page_path(number), title, chunk,
+                                     older, newer))
+        return pages
+
+    def tag_dirs(self) -> dict[str, str]:
+        """The directory each tag's listing goes in: its slug, with -1,
+        -2... on the end where tags slug the same, or to a directory the
+        content already has under tags/
+        """
+        used = {os.path.basename(rel_dir)
+                for rel_dir in self.directories.keys() | self.indexed
+                if os.path.dirname(rel_dir) == TAGS_DIR}
+        dirs = {}
+        for tag in sorted(self.tags):
+            base = blocks.slugify(tag) or "tag"
+            slug = base
+            suffix = 1
+            while slug in used:
+                slug = f"{base}-{suffix}"
+                suffix += 1
+            used.add(slug)
+            dirs[tag] = os.path.join(TAGS_DIR, slug)
+        return dirs
+
+    def pages(self) -> list[ListingPage]:
+        """Every listing page for the entries collected so far. Raises
+        ValueError if one would be written over a page from the content.
+        """
+        pages = []
+        for rel_dir, entries in sorted(self.directories.items()):
+            name = os.path.basename(rel_dir) or "Home"
+            paginated = self._paginate(rel_dir, name, entries)
+            pages.extend(paginated)
+            if rel_dir not in self.indexed:
+                newest = paginated[-1]
+                pages.append(ListingPage(
+                    os.path.join(rel_dir, INDEX_FILENAME), newest.title,
+                    newest.entries, newest.older))
+
+        tag_dirs = self.tag_dirs()
+        for tag, entries in sorted(self.tags.items()):
+            rel_dir = tag_dirs[tag]
+            paginated = self._paginate(rel_dir, f"Tagged: {tag}", entries)
+            pages.extend(paginated)
+            newest = paginated[-1]
+            pages.append(ListingPage(
+                os.path.join(rel_dir, INDEX_FILENAME), newest.title,
+                newest.entries, newest.older))
+
+        for page in pages:
+            if page.path in self.paths:
+                raise ValueError(f"{page.path} is both a page and a listing"
+                                 " page; rename the page")
+        return pages
+
+    def load_state(self) -> dict[str, str]:
+        if self.state_path is None:
+            return {}
+        return load_state(self.state_path, self.root_dir)
+
+    def save_state(self, state: dict[str, str]):
+        if self.state_path is None:
+            return
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path, 'w') as f:
+            json.dump({"root": self.root_dir, "pages": state}, f,
+                      sort_keys=True, indent=1)
+
+    def stale_pages(self, salt: str = "") -> list[ListingPage]:
+        """Listing pages that need to be rendered, either because they're new,
+        their contents changed or their output went missing. Pages the last
+        build wrote that are gone from the listings are removed. The state
+        file is updated to reflect the returned pages as rendered.
+        """
+        old_state = self.load_state()
+        new_state = {}
+        stale = []
+        for page in self.pages():
+            digest = page.digest(salt)
+            new_state[page.path] = digest
+            dest_path = os.path.join(self.root_dir, page.path)
+            if old_state.get(page.path) == digest and \
+                    self.output.exists(dest_path):
+                continue
+            stale.append(page)
+        for path in old_state.keys() - new_state.keys():
+            self.output.remove(os.path.join(self.root_dir, path))
+        self.save_state(new_state)
+        return stale
+
+
+def load_state(state_path: str, root_dir: str) -> dict[str, str]:
+    """The digests of the listing pages the last build wrote under root_dir,
+    keyed by their paths relative to it, from the state file at state_path
+    """
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if not isinstance(state, dict) or state.get("root") != root_dir:
+        return {}
+    return state.get("pages", {})
@@ -0,0 +1,161 @@
+import json
+import sys
+import time
+from typing import TextIO
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {level: name for name, level in LEVELS.items()}
+TEXT = "text"
+JSON = "json"
+# how many debug lines to hold before writing them out in one go
+BUFFER_LINES = 512
+# seconds between redraws of the progress display, at most
+PROGRESS_INTERVAL = 0.2
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:02}"
+    return f"{minutes}:{seconds:02}"
+
+
+class Logger:
+    """Writes build events to stream (stdout by default) as text lines or,
+    with the JSON format, one JSON object per line. Events below level are
+    dropped before anything about them is formatted, so a per-file debug
+    event costs no more than the call when it isn't shown.
+
+    Debug events are buffered and written out in batches; anything more
+    important flushes the buffer and is written straight away. With a
+    progress_stream, stages can show a progress display on it.
+    """
+    def __init__(self, level: int = INFO, format: str = TEXT,
+                 stream: TextIO | None = None,
+                 progress_stream: TextIO | None = None):
+        self.level = level
+        self.format = format
+        self.stream = stream
+        self.progress_stream = progress_stream
+        self.buffer: list[str] = []
+        self.progress_shown = False
+
+    def log(self, level: int, event: str, text: str, /, **fields):
+        """Log event with fields, described by text, a str.format template
+        filled in with fields, when it's shown as text
+        """
+        if level < self.level:
+            return
+        if self.format == JSON:
+            line = json.dumps({"time": round(time.time(), 3),
+                               "level": LEVEL_NAMES[level],
+                               "event": event, **fields})
+        else:
+            line = text.format(**fields)
+        self.buffer.append(line)
+        if level > DEBUG or len(self.buffer) >= BUFFER_LINES:
+            self.flush()
+
+    def clear_progress(self):
+        if self.progress_shown:
+            self.progress_stream.write("\r\033[K")
+            self.progress_stream.flush()
+            self.progress_shown = False
+
+    def flush(self):
+        if not self.buffer:
+            return
+        self.clear_progress()
+        stream = self.stream or sys.stdout
+        stream.write("\n".join(self.buffer) + "\n")
+        stream.flush()
+        self.buffer.clear()
+
+    def progress(self, label: str, total: int) -> "Progress":
+        return Progress(self, label, total)
+
+
+class Progress:
+    """A one line display of how many of total items a stage has done, how
+    fast and how long it has left, redrawn at most every PROGRESS_INTERVAL
+    seconds. It only counts when the logger has no progress_stream.
+    """
+    def __init__(self, logger: Logger, label: str, total: int):
+        self.logger = logger
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.start = time.monotonic()
+        self.drawn = 0.0
+
+    def update(self, count: int = 1):
+        self.done += count
+        stream = self.logger.progress_stream
+        if stream is None:
+            return
+        now = time.monotonic()
+        if now - self.drawn < PROGRESS_INTERVAL and self.done < self.total:
+            return
+        self.drawn = now
+        # anything logged so far goes above the display, not through it
+        self.logger.flush()
+        elapsed = now - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        stream.write(f"\r\033[K{self.label} {self.done}/{self.total},"
+                     f" {rate:.0f}/s, ETA {format_duration(eta)}")
+        stream.flush()
+        self.logger.progress_shown = True
+
+    def finish(self):
+        self.logger.clear_progress()
+
+
+# what the module level functions below log through, set by configure
+_logger = Logger()
+
+
+def configure(level: int = INFO, format: str = TEXT,
+              stream: TextIO | None = None,
+              progress: bool = False) -> Logger:
+    """Replace the logger, flushing anything the old one was holding
+    """
+    global _logger
+    _logger.flush()
+    _logger = Logger(level, format, stream, sys.stderr if progress else None)
+    return _logger
+
+
+def enabled(level: int) -> bool:
+    return level >= _logger.level
+
+
+def debug(event: str, text: str, /, **fields):
+    if _logger.level <= DEBUG:
+        _logger.log(DEBUG, event, text, **fields)
+
+
+def info(event: str, text: str, /, **fields):
+    _logger.log(INFO, event, text, **fields)
+
+
+def warning(event: str, text: str, /, **fields):
+    _logger.log(WARNING, event, text, **fields)
+
+
+def error(event: str, text: str, /, **fields):
+    _logger.log(ERROR, event, text, **fields)
+
+
+def progress(label: str, total: int) -> Progress:
+    return _logger.progress(label, total)
+
+
+def flush():
+    _logger.flush()
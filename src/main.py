@@ -1,37 +1,336 @@
-import shutil
+import argparse
 import os
+import sys
+import time
 
+import assets
+import astcache
+import critical
 import generate
+import images
+import listing
+import log
+import metrics
+import outputs
+import preview
+import serve
+import walk
 
-def copy(src: str, dest: str):
-    if os.path.exists(dest):
-        print(f"Found content at {dest}, removing...")
-        shutil.rmtree(dest)
+def copy(src: str, dest: str, plan: walk.BuildPlan | None = None,
+         output: outputs.Output | None = None,
+         keep: frozenset[str] = frozenset()):
+    """Replace dest with a copy of src, as laid out by plan (src is scanned
+    if no plan is given), written through output (dest itself if no output
+    is given). Files named in keep, relative to dest, are left in place.
+    """
+    if plan is None:
+        plan = walk.scan_static(src, dest)
+    output = output or outputs.DirectoryOutput(dest)
 
-    print(f"Creating directory {dest}...")
-    os.mkdir(dest)
+    output.clear(keep)
 
-    for basename in os.listdir(src):
-        path = os.path.join(src, basename)
-        if os.path.isdir(path):
-            next_dest = os.path.join(dest, basename)
-            print(f"Found directory {path}, copying into {next_dest}")
-            copy(path, next_dest)
+    for path in plan.directories(walk.ASSET):
+        log.debug("mkdir", "Creating directory {path}...", path=path)
+        output.mkdir(path)
+
+    files = plan.files(walk.ASSET)
+    for entry in files:
+        log.debug("copy", "Copying {src} to {dest}", src=entry.src_path,
+                  dest=entry.dest_path)
+        output.copy(entry.src_path, entry.dest_path)
+    if metrics.enabled():
+        metrics.inc("files_copied_total", len(files))
+        metrics.inc("bytes_read_total", sum(entry.size for entry in files))
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Build the static site, or serve a built one")
+    commands = parser.add_subparsers(dest="command")
+    serve_parser = commands.add_parser(
+        "serve", help="serve the built site from public/")
+    serve_parser.add_argument("--host", default="localhost")
+    serve_parser.add_argument("--port", type=int, default=8888)
+    serve_parser.add_argument("--root", default="public",
+                              help="directory to serve (default: public)")
+    serve_parser.add_argument("--quiet", action="store_true",
+                              help="don't log every request")
+    serve_parser.add_argument("--image-cache", default=".cache/images",
+                              help="where the build kept resized image"
+                                   " variants, which are served as immutable"
+                                   " (default: .cache/images)")
+    preview_parser = commands.add_parser(
+        "preview", help="render pages from content/ as they're requested")
+    preview_parser.add_argument("--host", default="localhost")
+    preview_parser.add_argument("--port", type=int, default=8888)
+    preview_parser.add_argument("--cache-mb", type=int, default=64,
+                                help="rendered pages to keep in memory"
+                                     " (default: 64)")
+    preview_parser.add_argument("--quiet", action="store_true",
+                                help="don't log every request")
+    preview_parser.add_argument("--templates", default="templates",
+                                help="per-directory templates"
+                                     " (default: templates)")
+
+    parser.add_argument("--output", default="public",
+                        help="where to write the site: a directory, or a"
+                             " .tar, .tar.gz, .tgz, .tar.xz or .zip archive"
+                             " streamed straight from the build"
+                             " (default: public)")
+    parser.add_argument("--pages", nargs="+", metavar="PATH",
+                        help="only render these content files, skipping"
+                             " static files and the walk over content/")
+    parser.add_argument("--pages-from", metavar="FILE",
+                        help="only render the content files listed in FILE,"
+                             " one per line (- for stdin)")
+    parser.add_argument("--templates", default="templates",
+                        help="directory of per-directory templates,"
+                             " mirroring content/ (default: templates)")
+    parser.add_argument("--listings", action="store_true",
+                        help="generate paginated directory and tag listings")
+    parser.add_argument("--page-size", type=int, default=10,
+                        help="entries per listing page (default: 10)")
+    parser.add_argument("--minify", action="store_true",
+                        help="collapse insignificant whitespace in pages")
+    parser.add_argument("--no-images", action="store_true",
+                        help="copy images verbatim, skipping resizing and"
+                             " dimension detection")
+    parser.add_argument("--no-fingerprint", action="store_true",
+                        help="don't publish content-hashed asset names")
+    parser.add_argument("--no-critical-css", action="store_true",
+                        help="load stylesheets with a blocking link, instead"
+                             " of inlining what each page needs")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="hint browsers to prefetch up to N of the pages"
+                             " each page links to (default: 0)")
+    parser.add_argument("--precompress", action="store_true",
+                        help="write .gz (and .br) variants of text files")
+    parser.add_argument("--max-page-bytes", type=int,
+                        help="fail pages whose source is larger than this")
+    parser.add_argument("--max-page-seconds", type=float,
+                        help="fail pages that take longer than this to render")
+    parser.add_argument("--image-cache", default=".cache/images",
+                        help="directory for resized image variants"
+                             " (default: .cache/images)")
+    parser.add_argument("--ast-cache", default=".cache/ast",
+                        help="directory for parsed markdown"
+                             " (default: .cache/ast)")
+    parser.add_argument("--ast-cache-mb", type=int, default=256,
+                        help="size to trim the parsed markdown cache to"
+                             " (default: 256)")
+    parser.add_argument("--no-ast-cache", action="store_true",
+                        help="parse every page from scratch")
+    parser.add_argument("--keep-going", action="store_true",
+                        help="render every page that can be rendered and"
+                             " report all failures at the end")
+    parser.add_argument("--error-report",
+                        help="write failed pages to this file as JSON")
+    parser.add_argument("--check-links", action="store_true",
+                        help="check internal links and images point at"
+                             " something the build published")
+    parser.add_argument("--link-report",
+                        help="write the link check to this file as JSON"
+                             " (implies --check-links)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="pages to render in parallel (default: 1)")
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument("-v", "--verbose", dest="log_level",
+                           action="store_const", const=log.DEBUG,
+                           default=log.INFO,
+                           help="log every file the build writes")
+    verbosity.add_argument("-q", "--quiet", dest="log_level",
+                           action="store_const", const=log.WARNING,
+                           help="only log warnings and errors")
+    parser.add_argument("--log-format", choices=(log.TEXT, log.JSON),
+                        default=log.TEXT,
+                        help="log lines of text, or JSON objects"
+                             " (default: text)")
+    parser.add_argument("--progress", action="store_true",
+                        help="show pages done, rate and ETA on stderr")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write build metrics to FILE in the Prometheus"
+                             " textfile collector's format")
+    parser.add_argument("--metrics-json", metavar="FILE",
+                        help="write build metrics to FILE as JSON")
+    args = parser.parse_args(argv)
+    if (args.pages or args.pages_from) and \
+            (args.listings or args.check_links or args.link_report or
+             args.prefetch or outputs.is_archive(args.output)):
+        parser.error("--pages and --pages-from can't be combined with"
+                     " --listings, link checking, --prefetch or an archive"
+                     " --output, which need every page")
+    return args
+
+
+def page_targets(args: argparse.Namespace, content_path: str
+                 ) -> list[str] | None:
+    """The content files a targeted build renders, or None for a full build.
+    Paths that aren't content files, like the rest of a git diff, are
+    skipped.
+    """
+    if args.pages is None and args.pages_from is None:
+        return None
+    paths = list(args.pages or [])
+    if args.pages_from == "-":
+        paths.extend(sys.stdin.read().splitlines())
+    elif args.pages_from:
+        with open(args.pages_from) as f:
+            paths.extend(f.read().splitlines())
+
+    targets = []
+    for path in paths:
+        path = path.strip()
+        if not path:
+            continue
+        path = os.path.abspath(path)
+        if os.path.commonpath([content_path, path]) != content_path:
+            log.debug("skip", "Skipping {path}, which isn't in content/",
+                      path=path)
+        elif not os.path.isfile(path):
+            log.warning("missing", "Skipping {path}, which doesn't exist",
+                        path=path)
         else:
-            print(f"Copying {path} to {dest}")
-            shutil.copy(path, dest)
+            targets.append(path)
+    return targets
+
 
+def build(args: argparse.Namespace) -> int:
+    with outputs.open_output(os.path.abspath(args.output)) as output:
+        if metrics.enabled():
+            # innermost, so precompressed variants are counted too
+            output = metrics.MeteredOutput(output)
+        if args.precompress:
+            output = serve.PrecompressedOutput(output)
+        status = build_to(args, output)
+    if args.precompress:
+        log.info("precompress", "Precompressed {files} files",
+                 files=output.written)
+    return status
 
-def main():
+
+def build_to(args: argparse.Namespace, output: outputs.Output) -> int:
     current_path = os.path.abspath(".")
-    public_path = os.path.abspath("public")
+    public_path = output.root
     static_path = os.path.abspath("static")
     content_path = os.path.abspath("content")
+    image_cache = images.ImageCache(os.path.abspath(args.image_cache))
+    listing_state = os.path.abspath(".cache/listings.json")
+
+    targets = page_targets(args, content_path)
+    image_manifest = None
+    asset_manifest = None
+    if targets is not None:
+        # static files stay as the last full build left them, and pages
+        # refer to them the way that build did
+        plan = walk.plan_pages(content_path, public_path, targets)
+        if not args.no_images:
+            image_manifest = image_cache.indexed(static_path)
+        if not args.no_fingerprint:
+            asset_manifest = assets.load_manifest(public_path, output)
+    else:
+        # one walk over both trees feeds every stage below
+        plan = walk.scan([
+            walk.Tree(walk.ASSET, static_path, public_path),
+            walk.Tree(walk.PAGE, content_path, public_path, walk.page_name),
+        ])
+
+        # listing pages the last build wrote are left for generate_pages to
+        # check, so the ones that haven't changed aren't rendered again
+        keep = frozenset()
+        if args.listings:
+            keep = frozenset(
+                path.replace(os.sep, "/") for path in
+                listing.load_state(listing_state, public_path))
+        copy(static_path, public_path, plan, output, keep)
+
+        if not args.no_images:
+            image_manifest = images.process_images(
+                static_path, public_path, image_cache, plan, output)
+            metrics.inc("cache_hits_total", image_cache.hits, "image")
+            metrics.inc("cache_misses_total", image_cache.misses, "image")
 
-    copy(static_path, public_path)
+        if not args.no_fingerprint:
+            hashes = assets.HashCache(os.path.abspath(".cache/assets.json"))
+            asset_manifest = assets.fingerprint_assets(
+                static_path, public_path, hashes, plan, output)
 
     template_path = os.path.join(current_path, "template.html")
-    generate.generate_pages(content_path, public_path, template_path)
+    critical_css = None
+    if not args.no_critical_css:
+        critical_css = critical.CriticalCSS(static_path)
+    budget = generate.PageBudget(args.max_page_bytes, args.max_page_seconds)
+    ast_cache = None
+    if not args.no_ast_cache:
+        ast_cache = astcache.ASTCache(os.path.abspath(args.ast_cache),
+                                      args.ast_cache_mb << 20)
+    result = generate.generate_pages(content_path, public_path, template_path,
+                                     listings=args.listings,
+                                     page_size=args.page_size,
+                                     image_manifest=image_manifest,
+                                     asset_manifest=asset_manifest,
+                                     minify=args.minify,
+                                     budget=budget,
+                                     plan=plan,
+                                     keep_going=args.keep_going,
+                                     jobs=args.jobs,
+                                     ast_cache=ast_cache,
+                                     check_links=args.check_links or
+                                     bool(args.link_report),
+                                     output=output,
+                                     template_dir=os.path.abspath(
+                                         args.templates),
+                                     critical_css=critical_css,
+                                     prefetch=args.prefetch,
+                                     listing_state=listing_state)
+
+    if args.error_report:
+        result.write_error_report(args.error_report)
+    status = 0
+    if result.link_report is not None:
+        if args.link_report:
+            result.link_report.write(args.link_report)
+        for link in result.link_report.broken:
+            log.error("broken_link", "  {path}:{line}:{column}: {reason}"
+                      " {kind} {url}", **link.to_dict())
+        if result.link_report.broken:
+            status = 1
+    if result.errors:
+        log.error("failed", "{failed} of {pages} pages failed:",
+                  failed=len(result.errors),
+                  pages=result.pages + len(result.errors))
+        for error in result.errors:
+            log.error("page_error", "  {path}:{line}:{column}: {message}",
+                      **error.to_dict())
+        status = 1
+    return status
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    if args.command == "serve":
+        serve.serve(args.root, args.host, args.port, verbose=not args.quiet,
+                    image_cache=args.image_cache)
+    elif args.command == "preview":
+        preview.preview("content", "template.html", "static", args.host,
+                        args.port, args.cache_mb << 20,
+                        verbose=not args.quiet, template_dir=args.templates)
+    else:
+        log.configure(args.log_level, args.log_format,
+                      progress=args.progress)
+        metrics.configure(bool(args.metrics or args.metrics_json))
+        start = time.perf_counter()
+        # a build that raises is reported as failed
+        status = 1
+        try:
+            status = build(args)
+        finally:
+            metrics.set_gauge("build_duration_seconds",
+                              time.perf_counter() - start)
+            metrics.set_gauge("build_timestamp_seconds", time.time())
+            metrics.set_gauge("build_status", status)
+            metrics.write(args.metrics, args.metrics_json)
+            log.flush()
+        sys.exit(status)
 
 
 if __name__ == "__main__":
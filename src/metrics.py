@@ -0,0 +1,238 @@
+import bisect
+import json
+import os
+
+import outputs
+
+
+PREFIX = "bdssg_"
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+# upper bounds, in seconds, of the page render time histogram's buckets
+RENDER_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                  1.0, 2.5, 5.0, 10.0)
+# every metric a build reports: its type, what it is, and the name of the
+# label it's broken down by, if any
+METRICS = {
+    "build_duration_seconds": (GAUGE, "Seconds the build took", None),
+    "build_timestamp_seconds": (GAUGE, "When the build finished, in"
+                                " seconds since the epoch", None),
+    "build_status": (GAUGE, "The build's exit status, 0 if it succeeded",
+                     None),
+    "pages_rendered_total": (COUNTER, "Pages rendered", None),
+    "page_errors_total": (COUNTER, "Pages that failed to render", None),
+    "broken_links_total": (COUNTER, "Broken links found by link checking",
+                           None),
+    "files_copied_total": (COUNTER, "Static files copied", None),
+    "bytes_read_total": (COUNTER, "Bytes of content and static files read",
+                         None),
+    "bytes_written_total": (COUNTER, "Bytes written to the output", None),
+    "cache_hits_total": (COUNTER, "Cache lookups that found what they were"
+                         " after", "cache"),
+    "cache_misses_total": (COUNTER, "Cache lookups that didn't", "cache"),
+    "cache_hit_ratio": (GAUGE, "Share of cache lookups that hit", "cache"),
+    "page_render_seconds": (HISTOGRAM, "Seconds each page took to render",
+                            None),
+}
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        # per bucket, not cumulative; the last one is for anything over the
+        # largest bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """(le, count) pairs, as Prometheus buckets are: each counting
+        everything up to and including its bound
+        """
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),),
+                                self.counts):
+            total += count
+            pairs.append(("+Inf" if bound == float("inf") else repr(bound),
+                          total))
+        return pairs
+
+
+def _format(value: float) -> str:
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """The values of every metric in METRICS, by label value ("" for
+    metrics without a label)
+    """
+    def __init__(self):
+        self.values: dict[str, dict[str, float]] = {}
+        self.histograms: dict[str, Histogram] = {}
+        for name, (kind, _, _) in METRICS.items():
+            if kind == HISTOGRAM:
+                self.histograms[name] = Histogram(RENDER_BUCKETS)
+            else:
+                self.values[name] = {}
+
+    def inc(self, name: str, amount: float = 1, label: str = ""):
+        values = self.values[name]
+        values[label] = values.get(label, 0) + amount
+
+    def set_gauge(self, name: str, value: float, label: str = ""):
+        self.values[name][label] = value
+
+    def observe(self, name: str, value: float):
+        self.histograms[name].observe(value)
+
+    def update_ratios(self):
+        hits = self.values["cache_hits_total"]
+        misses = self.values["cache_misses_total"]
+        for cache in hits.keys() | misses.keys():
+            lookups = hits.get(cache, 0) + misses.get(cache, 0)
+            if lookups:
+                self.set_gauge("cache_hit_ratio",
+                               hits.get(cache, 0) / lookups, cache)
+
+    def to_prometheus(self) -> str:
+        """Every metric in the Prometheus text exposition format, as the
+        node exporter's textfile collector reads it
+        """
+        self.update_ratios()
+        lines = []
+        for name, (kind, help_text, label) in METRICS.items():
+            full_name = PREFIX + name
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            if kind == HISTOGRAM:
+                histogram = self.histograms[name]
+                for le, count in histogram.cumulative():
+                    lines.append(f'{full_name}_bucket{{le="{le}"}} {count}')
+                lines.append(f"{full_name}_sum {_format(histogram.sum)}")
+                lines.append(f"{full_name}_count {histogram.count}")
+            elif label is None:
+                value = self.values[name].get("", 0)
+                lines.append(f"{full_name} {_format(value)}")
+            else:
+                for label_value, value in sorted(self.values[name].items()):
+                    lines.append(f'{full_name}{{{label}="{label_value}"}}'
+                                 f" {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        self.update_ratios()
+        metrics = {}
+        for name, (kind, _, label) in METRICS.items():
+            if kind == HISTOGRAM:
+                histogram = self.histograms[name]
+                metrics[name] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": dict(histogram.cumulative()),
+                }
+            elif label is None:
+                metrics[name] = self.values[name].get("", 0)
+            else:
+                metrics[name] = dict(sorted(self.values[name].items()))
+        return metrics
+
+
+def _write_atomically(path: str, data: str):
+    # whatever collects the file may read it at any moment, so it's only
+    # ever replaced whole
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class MeteredOutput(outputs.Output):
+    """Wraps another output, counting the bytes written through it. Every
+    file has to pass through this process to be counted, so worker
+    processes hand their pages back rather than writing them.
+    """
+    def __init__(self, output: outputs.Output):
+        super().__init__(output.root)
+        self.output = output
+
+    def clear(self, keep: frozenset[str] = frozenset()):
+        self.output.clear(keep)
+
+    def mkdir(self, path: str):
+        self.output.mkdir(path)
+
+    def remove(self, path: str):
+        self.output.remove(path)
+
+    def write(self, path: str, data: str | bytes):
+        data = data.encode() if isinstance(data, str) else data
+        self.output.write(path, data)
+        inc("bytes_written_total", len(data))
+
+    def copy(self, src_path: str, path: str, link: bool = False):
+        self.output.copy(src_path, path, link)
+        inc("bytes_written_total", os.path.getsize(src_path))
+
+    def exists(self, path: str) -> bool:
+        return self.output.exists(path)
+
+    def read(self, path: str) -> bytes | None:
+        return self.output.read(path)
+
+    def close(self):
+        self.output.close()
+
+    def abort(self):
+        self.output.abort()
+
+
+# what the module level functions below record into, set by configure; None
+# while metrics are off, so recording one costs a single check
+_registry: Registry | None = None
+
+
+def configure(enabled: bool = False) -> Registry | None:
+    """Start recording into a new registry, or stop recording
+    """
+    global _registry
+    _registry = Registry() if enabled else None
+    return _registry
+
+
+def enabled() -> bool:
+    return _registry is not None
+
+
+def inc(name: str, amount: float = 1, label: str = ""):
+    if _registry is not None:
+        _registry.inc(name, amount, label)
+
+
+def set_gauge(name: str, value: float, label: str = ""):
+    if _registry is not None:
+        _registry.set_gauge(name, value, label)
+
+
+def observe(name: str, value: float):
+    if _registry is not None:
+        _registry.observe(name, value)
+
+
+def write(prometheus_path: str | None = None, json_path: str | None = None):
+    """Write what was recorded to a Prometheus textfile and as JSON, to
+    whichever paths are given
+    """
+    if _registry is None:
+        return
+    if prometheus_path:
+        _write_atomically(prometheus_path, _registry.to_prometheus())
+    if json_path:
+        _write_atomically(json_path,
+                          json.dumps(_registry.to_dict(), indent=1) + "\n")
@@ -0,0 +1,290 @@
+import io
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+
+import log
+
+
+# archive extensions, and the tarfile mode each one is streamed with
+TAR_MODES = ((".tar.gz", "w|gz"), (".tgz", "w|gz"), (".tar.xz", "w|xz"),
+             (".tar", "w|"))
+ZIP_EXTENSION = ".zip"
+
+
+class Output:
+    """Somewhere a build publishes the site. Files are addressed by the same
+    dest paths the build plan lays out under root, so the stages of a build
+    don't need to know where their output actually ends up.
+
+    Outputs are context managers: leaving the block closes them, or aborts
+    them if it raised.
+    """
+    # whether worker processes can write through their own copy of this
+    # output, rather than handing their pages back to be written
+    shareable = False
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def name(self, path: str) -> str:
+        """path relative to root, with / separators: "" for root itself
+        """
+        name = os.path.relpath(path, self.root).replace(os.sep, "/")
+        return "" if name == "." else name
+
+    def clear(self, keep: frozenset[str] = frozenset()):
+        """Remove anything left over from a previous build, except the files
+        named in keep (relative to root, as name() gives them)
+        """
+
+    def mkdir(self, path: str):
+        pass
+
+    def remove(self, path: str):
+        """Remove a file a previous build left, if it's there
+        """
+
+    def write(self, path: str, data: str | bytes):
+        raise NotImplementedError
+
+    def copy(self, src_path: str, path: str, link: bool = False):
+        """Publish the local file at src_path as path. With link, outputs
+        that can may hard link it instead, so it must never be modified in
+        place.
+        """
+        with open(src_path, 'rb') as f:
+            self.write(path, f.read())
+
+    def exists(self, path: str) -> bool:
+        return False
+
+    def read(self, path: str) -> bytes | None:
+        """What was written to path, or None if it can't be read back
+        """
+        return None
+
+    def close(self):
+        pass
+
+    def abort(self):
+        self.close()
+
+    def __enter__(self) -> "Output":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _encode(data: str | bytes) -> bytes:
+    return data.encode() if isinstance(data, str) else data
+
+
+class DirectoryOutput(Output):
+    """Writes the site out as files under root on the local filesystem
+    """
+    shareable = True
+
+    def clear(self, keep: frozenset[str] = frozenset()):
+        if not os.path.exists(self.root):
+            return
+        log.info("clear", "Found content at {root}, removing...",
+                 root=self.root)
+        if not keep:
+            shutil.rmtree(self.root)
+            return
+        for dirpath, dirnames, filenames in os.walk(self.root,
+                                                    topdown=False):
+            for name in filenames + [name for name in dirnames if
+                                     os.path.islink(os.path.join(dirpath,
+                                                                 name))]:
+                path = os.path.join(dirpath, name)
+                if self.name(path) not in keep:
+                    os.remove(path)
+            if dirpath != self.root and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+
+    def mkdir(self, path: str):
+        os.makedirs(path, exist_ok=True)
+
+    def remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def write(self, path: str, data: str | bytes):
+        with open(path, 'wb') as f:
+            f.write(_encode(data))
+
+    def copy(self, src_path: str, path: str, link: bool = False):
+        if link:
+            try:
+                os.link(src_path, path)
+                return
+            except OSError:
+                pass
+        shutil.copy(src_path, path)
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def read(self, path: str) -> bytes | None:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class MemoryOutput(Output):
+    """Keeps the site in a dict of file names to contents, for tests and
+    anything else that wants a build without touching the disk
+    """
+    def __init__(self, root: str):
+        super().__init__(root)
+        self.files: dict[str, bytes] = {}
+        self.dirs: set[str] = set()
+
+    def clear(self, keep: frozenset[str] = frozenset()):
+        self.files = {name: data for name, data in self.files.items()
+                      if name in keep}
+        self.dirs = {name for name in self.dirs
+                     if any(kept.startswith(name + "/") for kept in keep)}
+
+    def mkdir(self, path: str):
+        name = self.name(path)
+        if name:
+            self.dirs.add(name)
+
+    def remove(self, path: str):
+        self.files.pop(self.name(path), None)
+
+    def write(self, path: str, data: str | bytes):
+        self.files[self.name(path)] = _encode(data)
+
+    def exists(self, path: str) -> bool:
+        name = self.name(path)
+        return name in self.files or name in self.dirs
+
+    def read(self, path: str) -> bytes | None:
+        return self.files.get(self.name(path))
+
+
+class ArchiveOutput(Output):
+    """Streams the site into a tar or zip archive at path as it's built, so
+    publishing it doesn't take another pass over the files. root is where
+    paths are resolved against, and defaults to path itself, so pages are
+    reported as e.g. site.tar.gz/index.html.
+
+    The archive is written to a temporary file beside path and only moved
+    into place when it's closed, so an aborted build leaves any previous
+    archive alone.
+    """
+    def __init__(self, path: str, root: str | None = None):
+        super().__init__(root or path)
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.mtime = int(time.time())
+        self.names: set[str] = set()
+        self.tar = None
+        self.zip = None
+        if path.endswith(ZIP_EXTENSION):
+            self.zip = zipfile.ZipFile(self.tmp_path, 'w',
+                                       zipfile.ZIP_DEFLATED)
+            return
+        for extension, mode in TAR_MODES:
+            if path.endswith(extension):
+                self.tar = tarfile.open(self.tmp_path, mode)
+                return
+        raise ValueError(f"{path} isn't a .zip, .tar, .tar.gz, .tgz or"
+                         " .tar.xz archive")
+
+    def _claim(self, path: str) -> str | None:
+        # archives happily hold the same name twice, so it's up to us not to
+        name = self.name(path)
+        if not name or name in self.names:
+            return None
+        self.names.add(name)
+        return name
+
+    def mkdir(self, path: str):
+        name = self._claim(path)
+        if name is None:
+            return
+        if self.zip:
+            info = zipfile.ZipInfo(name + "/",
+                                   time.localtime(self.mtime)[:6])
+            info.external_attr = (0o40755 << 16) | 0x10
+            self.zip.writestr(info, b"")
+        else:
+            info = tarfile.TarInfo(name)
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            info.mtime = self.mtime
+            self.tar.addfile(info)
+
+    def write(self, path: str, data: str | bytes):
+        name = self._claim(path)
+        if name is None:
+            return
+        data = _encode(data)
+        if self.zip:
+            info = zipfile.ZipInfo(name, time.localtime(self.mtime)[:6])
+            info.external_attr = 0o644 << 16
+            self.zip.writestr(info, data, zipfile.ZIP_DEFLATED)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o644
+            info.mtime = self.mtime
+            self.tar.addfile(info, io.BytesIO(data))
+
+    def copy(self, src_path: str, path: str, link: bool = False):
+        # both formats stream the file in, without reading it all at once
+        name = self._claim(path)
+        if name is None:
+            return
+        if self.zip:
+            self.zip.write(src_path, name)
+        else:
+            self.tar.add(src_path, name, recursive=False,
+                         filter=_anonymous)
+
+    def exists(self, path: str) -> bool:
+        return self.name(path) in self.names
+
+    def close(self):
+        (self.zip or self.tar).close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        (self.zip or self.tar).close()
+        os.remove(self.tmp_path)
+
+
+def _anonymous(info: tarfile.TarInfo) -> tarfile.TarInfo:
+    # whoever happened to build the site shouldn't end up in the archive
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    return info
+
+
+def is_archive(path: str) -> bool:
+    return path.endswith(ZIP_EXTENSION) or \
+        any(path.endswith(extension) for extension, _ in TAR_MODES)
+
+
+def open_output(target: str) -> Output:
+    """An archive output for a target ending in one of the archive
+    extensions, and a directory output for anything else
+    """
+    if is_archive(target):
+        return ArchiveOutput(target)
+    return DirectoryOutput(target)
@@ -0,0 +1,323 @@
+import collections
+import hashlib
+import http
+import json
+import mimetypes
+import os
+import socketserver
+import threading
+import wsgiref.simple_server
+from typing import Callable, Iterable
+
+import generate
+import serve
+import templates
+
+
+STATS_PATH = "/_preview/stats"
+FILE_CHUNK = 1 << 16
+
+
+class CachedPage:
+    def __init__(self, version: tuple[int, ...], digest: str, body: bytes):
+        self.version = version
+        self.digest = digest
+        self.body = body
+
+
+class PageCache:
+    """Rendered pages keyed by source path, holding at most max_bytes of
+    HTML and evicting the least recently used page first. Safe to share
+    between threads.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.pages: collections.OrderedDict[str, CachedPage] = \
+            collections.OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> CachedPage | None:
+        with self.lock:
+            page = self.pages.get(key)
+            if page is not None:
+                self.pages.move_to_end(key)
+            return page
+
+    def put(self, key: str, page: CachedPage):
+        with self.lock:
+            old = self.pages.pop(key, None)
+            if old is not None:
+                self.size -= len(old.body)
+            if len(page.body) > self.max_bytes:
+                return
+            self.pages[key] = page
+            self.size += len(page.body)
+            while self.size > self.max_bytes:
+                _, evicted = self.pages.popitem(last=False)
+                self.size -= len(evicted.body)
+                self.evictions += 1
+
+    def record(self, hit: bool, revalidated: bool = False):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if revalidated:
+                self.revalidations += 1
+
+    def stats(self) -> dict[str, int | float]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "pages": len(self.pages),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def source_digest(src_path: str, template: templates.Template) -> str:
+    h = hashlib.sha256()
+    with open(src_path, 'rb') as f:
+        h.update(f.read())
+    h.update(b"\0")
+    h.update(template.source.encode())
+    return h.hexdigest()
+
+
+class Preview:
+    """A WSGI app that renders content pages when they're requested instead
+    of building the whole site up front. Rendered pages are cached until
+    their source or their template changes: a changed size or mtime sends
+    the page back through a content hash, and it's only rendered again if
+    that differs too. Pages pick their template from template_dir as a build
+    does. Anything that isn't a page is served from static_dir.
+    """
+    def __init__(self, content_dir: str, template_path: str,
+                 static_dir: str | None = None,
+                 cache_bytes: int = 64 << 20,
+                 template_dir: str | None = None):
+        self.content_dir = os.path.abspath(content_dir)
+        self.template_path = os.path.abspath(template_path)
+        self.static_dir = os.path.abspath(static_dir) if static_dir else None
+        self.template_dir = os.path.abspath(template_dir) if template_dir \
+            else None
+        self.cache = PageCache(cache_bytes)
+        self.templates = templates.TemplateSet(
+            self.template_path, self.content_dir, self.template_dir)
+        self.layout = self.template_layout()
+
+    def template_layout(self) -> dict[str, int]:
+        """The mtime of every directory under template_dir, which changes
+        when a template.html is added to or removed from it, or -1 for a
+        template_dir that isn't there
+        """
+        if self.template_dir is None:
+            return {}
+        if not os.path.isdir(self.template_dir):
+            return {self.template_dir: -1}
+        return {path: os.stat(path).st_mtime_ns
+                for path, _, _ in os.walk(self.template_dir)}
+
+    def layout_current(self) -> bool:
+        for path, mtime_ns in self.layout.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime_ns:
+                    return False
+            except FileNotFoundError:
+                if mtime_ns != -1:
+                    return False
+        return True
+
+    def template(self, src_path: str) -> templates.Template:
+        """The template src_path renders with. The set they come from is
+        kept between requests, and only built again once a template it
+        holds has changed or templates have come or gone.
+        """
+        template_set = self.templates
+        if not self.layout_current():
+            template_set = None
+        else:
+            template = template_set.for_page(src_path)
+            if not template.current():
+                template_set = None
+        if template_set is None:
+            # requests racing to do this each build a set; the last one in
+            # is kept, and they're all current
+            self.layout = self.template_layout()
+            template_set = templates.TemplateSet(
+                self.template_path, self.content_dir, self.template_dir)
+            self.templates = template_set
+            template = template_set.for_page(src_path)
+        return template
+
+    def version(self, src_path: str, template: templates.Template
+                ) -> tuple[int, ...]:
+        src = os.stat(src_path)
+        version = [src.st_size, src.st_mtime_ns]
+        for stamp in template.dependencies.values():
+            version.extend(stamp)
+        return tuple(version)
+
+    def page(self, src_path: str) -> CachedPage:
+        """The rendered page for src_path, from the cache if it's still
+        current. Raises OSError if it doesn't exist and PageError if it
+        doesn't render.
+        """
+        template = self.template(src_path)
+        version = self.version(src_path, template)
+        cached = self.cache.get(src_path)
+        if cached is not None and cached.version == version:
+            self.cache.record(hit=True)
+            return cached
+
+        digest = source_digest(src_path, template)
+        if cached is not None and cached.digest == digest:
+            # touched but not changed
+            page = CachedPage(version, digest, cached.body)
+            self.cache.put(src_path, page)
+            self.cache.record(hit=True, revalidated=True)
+            return page
+
+        # two requests for the same stale page may both render it; the
+        # second put() just replaces the first
+        self.cache.record(hit=False)
+        html, _ = generate.render_html(src_path, template)
+        page = CachedPage(version, digest, html.encode())
+        self.cache.put(src_path, page)
+        return page
+
+    def resolve(self, path: str) -> tuple[str, str] | None:
+        """Map a request path to ("page", source path), ("static", file
+        path) or ("directory", URL to redirect to), or None if there's
+        nothing there
+        """
+        parts = [p for p in path.split("/") if p and p not in (".", "..")]
+        if not parts or path.endswith("/"):
+            parts.append("index.html")
+        if parts[-1].endswith(".html"):
+            src_path = os.path.join(self.content_dir, *parts)
+            src_path = src_path.removesuffix(".html") + ".md"
+            if os.path.isfile(src_path):
+                return "page", src_path
+        elif os.path.isdir(os.path.join(self.content_dir, *parts)):
+            return "directory", path + "/"
+        if self.static_dir:
+            static_path = os.path.join(self.static_dir, *parts)
+            if os.path.isfile(static_path):
+                return "static", static_path
+            if os.path.isdir(static_path) and not path.endswith("/"):
+                return "directory", path + "/"
+        return None
+
+    def __call__(self, environ: dict, start_response: Callable
+                 ) -> Iterable[bytes]:
+        # PATH_INFO arrives already percent-decoded
+        path = environ.get("PATH_INFO") or "/"
+        if path == STATS_PATH:
+            body = json.dumps(self.cache.stats(), indent=1).encode()
+            return respond(start_response, http.HTTPStatus.OK,
+                           "application/json", body)
+
+        resolved = self.resolve(path)
+        if resolved is None:
+            return respond(start_response, http.HTTPStatus.NOT_FOUND,
+                           "text/plain", b"not found\n")
+        kind, target = resolved
+        if kind == "directory":
+            start_response(status_line(http.HTTPStatus.MOVED_PERMANENTLY),
+                           [("Location", target), ("Content-Length", "0")])
+            return []
+        if kind == "static":
+            return self.send_static(environ, start_response, target)
+
+        try:
+            page = self.page(target)
+        except generate.PageError as e:
+            return respond(start_response,
+                           http.HTTPStatus.INTERNAL_SERVER_ERROR,
+                           "text/plain", f"{e}\n".encode())
+        tag = f'"{page.digest[:16]}"'
+        if serve.etag_matches(environ.get("HTTP_IF_NONE_MATCH"), tag):
+            start_response(status_line(http.HTTPStatus.NOT_MODIFIED),
+                           [("ETag", tag)])
+            return []
+        return respond(start_response, http.HTTPStatus.OK,
+                       "text/html; charset=utf-8", page.body,
+                       [("ETag", tag),
+                        ("Cache-Control", serve.DEFAULT_CACHE_CONTROL)])
+
+    def send_static(self, environ: dict, start_response: Callable,
+                    fs_path: str) -> Iterable[bytes]:
+        stat = os.stat(fs_path)
+        tag = serve.etag(stat)
+        if serve.etag_matches(environ.get("HTTP_IF_NONE_MATCH"), tag):
+            start_response(status_line(http.HTTPStatus.NOT_MODIFIED),
+                           [("ETag", tag)])
+            return []
+        content_type = mimetypes.guess_type(fs_path)[0] or \
+            "application/octet-stream"
+        start_response(status_line(http.HTTPStatus.OK), [
+            ("Content-Type", content_type),
+            ("Content-Length", str(stat.st_size)),
+            ("ETag", tag),
+            ("Cache-Control", serve.DEFAULT_CACHE_CONTROL),
+        ])
+        f = open(fs_path, 'rb')
+        wrapper = environ.get("wsgi.file_wrapper")
+        if wrapper:
+            return wrapper(f, FILE_CHUNK)
+        with f:
+            return [f.read()]
+
+
+def status_line(status: http.HTTPStatus) -> str:
+    return f"{status.value} {status.phrase}"
+
+
+def respond(start_response: Callable, status: http.HTTPStatus,
+            content_type: str, body: bytes,
+            headers: list[tuple[str, str]] | None = None) -> list[bytes]:
+    start_response(status_line(status), [
+        ("Content-Type", content_type),
+        ("Content-Length", str(len(body))),
+    ] + (headers or []))
+    return [body]
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn,
+                          wsgiref.simple_server.WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(wsgiref.simple_server.WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def preview(content_dir: str, template_path: str, static_dir: str,
+            host: str = "localhost", port: int = 8888,
+            cache_bytes: int = 64 << 20, verbose: bool = True,
+            template_dir: str | None = None):
+    app = Preview(content_dir, template_path, static_dir, cache_bytes,
+                  template_dir)
+    handler = wsgiref.simple_server.WSGIRequestHandler if verbose else \
+        QuietHandler
+    with wsgiref.simple_server.make_server(
+            host, port, app, ThreadingWSGIServer, handler) as server:
+        print(f"Previewing {app.content_dir} on http://{host}:{port}/"
+              f" (cache stats at {STATS_PATH})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,163 @@
+import collections
+import concurrent.futures
+import threading
+import time
+from typing import Iterable
+
+import blocks
+import htmlnode as hn
+
+
+DEFAULT_CACHE_SIZE = 1024
+# batches with fewer items than this to render are rendered in-process even
+# when there's an executor, as handing them over costs more than it saves
+POOL_MIN_ITEMS = 64
+# items handed to a pool at a time
+POOL_CHUNK_SIZE = 16
+
+
+def render_one(markdown: str, minify: bool = False,
+               max_seconds: float | None = None) -> str:
+    """markdown rendered to HTML. Raises MarkdownError if it doesn't parse,
+    or BudgetExceeded if it takes longer than max_seconds.
+    """
+    deadline = None
+    if max_seconds is not None:
+        deadline = time.monotonic() + max_seconds
+    node = blocks.markdown_to_html_node(markdown, deadline)
+    return node.to_html(hn.Minifier() if minify else None)
+
+
+def _render_chunk(markdowns: list[str], minify: bool,
+                  max_seconds: float | None) -> list[str | ValueError]:
+    # what a pool runs, a chunk at a time; failures come back as values so
+    # one bad item doesn't lose the rest of its chunk
+    results = []
+    for markdown in markdowns:
+        try:
+            results.append(render_one(markdown, minify, max_seconds))
+        except ValueError as e:
+            results.append(e)
+    return results
+
+
+class Renderer:
+    """Renders markdown strings to HTML in-process, for embedding the
+    renderer in something else, like a service rendering snippets on
+    request. The HTML for the last cache_size distinct inputs is kept, so
+    repeats are only rendered once. Safe to share between threads.
+    """
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE,
+                 minify: bool = False, max_seconds: float | None = None):
+        self.cache_size = cache_size
+        self.minify = minify
+        self.max_seconds = max_seconds
+        self.cache: collections.OrderedDict[str, str] = \
+            collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, markdown: str) -> str | None:
+        with self.lock:
+            html = self.cache.get(markdown)
+            if html is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.cache.move_to_end(markdown)
+            return html
+
+    def remember(self, markdown: str, html: str):
+        if self.cache_size <= 0:
+            return
+        with self.lock:
+            self.cache[markdown] = html
+            self.cache.move_to_end(markdown)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def render(self, markdown: str) -> str:
+        """markdown rendered to HTML, as render_one does
+        """
+        html = self.cached(markdown)
+        if html is None:
+            html = render_one(markdown, self.minify, self.max_seconds)
+            self.remember(markdown, html)
+        return html
+
+    def render_many(self, markdowns: Iterable[str],
+                    executor: concurrent.futures.Executor | None = None,
+                    keep_going: bool = False,
+                    chunk_size: int = POOL_CHUNK_SIZE
+                    ) -> list[str | ValueError]:
+        """Every item of markdowns rendered to HTML, in order. Items that
+        are cached or repeat an earlier item are only rendered once. With
+        an executor, a thread or process pool, the rest are rendered on it
+        in chunks, if there are at least POOL_MIN_ITEMS of them.
+
+        The first item that fails raises its MarkdownError (or
+        BudgetExceeded), unless keep_going is set, in which case the error
+        takes its place in the results.
+        """
+        items = list(markdowns)
+        results: list = [None] * len(items)
+        # where each distinct markdown that isn't cached goes
+        pending: dict[str, list[int]] = {}
+        for i, markdown in enumerate(items):
+            if markdown in pending:
+                pending[markdown].append(i)
+                with self.lock:
+                    self.hits += 1
+                continue
+            html = self.cached(markdown)
+            if html is None:
+                pending[markdown] = [i]
+            else:
+                results[i] = html
+
+        todo = list(pending)
+        if executor is not None and len(todo) >= POOL_MIN_ITEMS:
+            chunks = [todo[i:i + chunk_size]
+                      for i in range(0, len(todo), chunk_size)]
+            rendered = []
+            for chunk_results in executor.map(
+                    _render_chunk, chunks, [self.minify] * len(chunks),
+                    [self.max_seconds] * len(chunks)):
+                rendered.extend(chunk_results)
+        else:
+            rendered = _render_chunk(todo, self.minify, self.max_seconds)
+
+        for markdown, result in zip(todo, rendered):
+            if isinstance(result, ValueError):
+                if not keep_going:
+                    raise result
+            else:
+                self.remember(markdown, result)
+            for i in pending[markdown]:
+                results[i] = result
+        return results
+
+    def stats(self) -> dict[str, int | float]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.cache),
+                "max_entries": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# what render_many() renders with, shared by every caller in the process
+_renderer = Renderer()
+
+
+def render_many(markdowns: Iterable[str],
+                executor: concurrent.futures.Executor | None = None,
+                keep_going: bool = False) -> list[str | ValueError]:
+    """Render every item of markdowns to HTML with a renderer shared by the
+    whole process, as Renderer.render_many does
+    """
+    return _renderer.render_many(markdowns, executor, keep_going)
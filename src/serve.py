@@ -0,0 +1,300 @@
+import gzip
+import http
+import http.server
+import mimetypes
+import os
+import shutil
+import urllib.parse
+
+import assets
+import images
+import outputs
+
+try:
+    import brotli
+except ImportError:  # .br variants are only served if they already exist
+    brotli = None
+
+
+# precompressed variants, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".json", ".svg", ".txt",
+                           ".xml")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "no-cache"
+SENDFILE_CHUNK = 1 << 20
+
+
+def accepted_encodings(header: str | None) -> set[str]:
+    """Content codings from an Accept-Encoding header that weren't refused
+    with q=0
+    """
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding)
+    return accepted
+
+
+def etag(stat: os.stat_result, encoding: str | None = None) -> str:
+    # size and mtime are enough to tell versions of a file apart, without
+    # having to read it
+    tag = f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+    if encoding:
+        tag += f"-{encoding}"
+    return f'"{tag}"'
+
+
+def etag_matches(header: str | None, tag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == tag:
+            return True
+    return False
+
+
+def immutable_files(root: str, image_cache: str | None = None
+                    ) -> tuple[set[str], set[str]]:
+    """The files under root that are published under names made from their
+    content, so can never change and can be cached forever: the paths of
+    the fingerprinted assets in root's asset manifest, and the filenames of
+    the image variants in image_cache's index
+    """
+    paths = set()
+    for url in (assets.load_manifest(root) or {}).values():
+        paths.add(os.path.join(root, *url.split("/")))
+    variants = set()
+    if image_cache:
+        cache = images.ImageCache(image_cache)
+        cache.load_index()
+        for entry in cache.index.values():
+            variants.update(filename for _, _, filename
+                            in entry.get("variants", ()))
+    return paths, variants
+
+
+def compress(data: bytes, encoding: str, level: int = 9) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data)
+    return gzip.compress(data, level, mtime=0)
+
+
+class PrecompressedOutput(outputs.Output):
+    """Wraps another output, writing .gz (and .br, when brotli is installed)
+    variants of every compressible file alongside it as it's published, so
+    precompressing works the same whatever the site is written to. Every
+    file passes through this process, so worker processes hand their pages
+    back rather than writing them.
+    """
+    def __init__(self, output: outputs.Output, level: int = 9):
+        super().__init__(output.root)
+        self.output = output
+        self.level = level
+        self.written = 0
+
+    def _variants(self, path: str, data: bytes):
+        if not path.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        for encoding, suffix in ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            self.output.write(path + suffix,
+                              compress(data, encoding, self.level))
+            self.written += 1
+
+    def clear(self, keep: frozenset[str] = frozenset()):
+        # a kept file's variants are still current
+        self.output.clear(keep.union(name + suffix for name in keep
+                                     for _, suffix in ENCODINGS))
+
+    def mkdir(self, path: str):
+        self.output.mkdir(path)
+
+    def remove(self, path: str):
+        self.output.remove(path)
+        for _, suffix in ENCODINGS:
+            self.output.remove(path + suffix)
+
+    def write(self, path: str, data: str | bytes):
+        data = data.encode() if isinstance(data, str) else data
+        self.output.write(path, data)
+        self._variants(path, data)
+
+    def copy(self, src_path: str, path: str, link: bool = False):
+        self.output.copy(src_path, path, link)
+        if path.endswith(COMPRESSIBLE_EXTENSIONS):
+            with open(src_path, 'rb') as f:
+                self._variants(path, f.read())
+
+    def exists(self, path: str) -> bool:
+        return self.output.exists(path)
+
+    def read(self, path: str) -> bytes | None:
+        return self.output.read(path)
+
+    def close(self):
+        self.output.close()
+
+    def abort(self):
+        self.output.abort()
+
+
+class StaticHandler(http.server.BaseHTTPRequestHandler):
+    """Serves files from the server's root directory over keep-alive
+    connections, answering conditional requests from stat() alone and
+    sending bodies with sendfile() where the platform has it
+    """
+    protocol_version = "HTTP/1.1"
+    server_version = "bdssg"
+    # headers and a sendfile() body go out as separate writes, which Nagle
+    # would otherwise hold up waiting on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def resolve(self) -> str | None:
+        path = urllib.parse.urlsplit(self.path).path
+        path = urllib.parse.unquote(path)
+        parts = [p for p in path.split("/") if p and p not in (".", "..")]
+        fs_path = os.path.join(self.server.root, *parts)
+        if os.path.isdir(fs_path):
+            if not path.endswith("/"):
+                return None
+            fs_path = os.path.join(fs_path, "index.html")
+        return fs_path
+
+    def redirect_to_directory(self):
+        parts = urllib.parse.urlsplit(self.path)
+        location = urllib.parse.urlunsplit(
+            parts._replace(path=parts.path + "/"))
+        self.send_response(http.HTTPStatus.MOVED_PERMANENTLY)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def send_empty(self, status: http.HTTPStatus):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.serve(body=False)
+
+    def do_GET(self):
+        self.serve(body=True)
+
+    def serve(self, body: bool):
+        fs_path = self.resolve()
+        if fs_path is None:
+            return self.redirect_to_directory()
+
+        try:
+            stat = os.stat(fs_path)
+        except OSError:
+            return self.send_empty(http.HTTPStatus.NOT_FOUND)
+
+        content_type = mimetypes.guess_type(fs_path)[0] or \
+            "application/octet-stream"
+        encoding = None
+        if fs_path.endswith(COMPRESSIBLE_EXTENSIONS):
+            accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+            for coding, suffix in ENCODINGS:
+                if coding not in accepted:
+                    continue
+                try:
+                    stat = os.stat(fs_path + suffix)
+                except OSError:
+                    continue
+                encoding = coding
+                fs_path += suffix
+                break
+
+        tag = etag(stat, encoding)
+        if self.server.immutable(fs_path.removesuffix(".br")
+                                 .removesuffix(".gz")):
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            cache_control = DEFAULT_CACHE_CONTROL
+
+        if etag_matches(self.headers.get("If-None-Match"), tag):
+            self.send_response(http.HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", tag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return
+
+        try:
+            f = open(fs_path, 'rb')
+        except OSError:
+            return self.send_empty(http.HTTPStatus.NOT_FOUND)
+        with f:
+            self.send_response(http.HTTPStatus.OK)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(stat.st_size))
+            self.send_header("ETag", tag)
+            self.send_header("Cache-Control", cache_control)
+            self.send_header("Vary", "Accept-Encoding")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.end_headers()
+            if body:
+                self.send_body(f, stat.st_size)
+
+    def send_body(self, f, size: int):
+        if not hasattr(os, "sendfile"):
+            shutil.copyfileobj(f, self.wfile)
+            return
+        # headers have already been flushed, so the body can go straight
+        # from the page cache to the socket
+        offset = 0
+        out = self.connection.fileno()
+        while offset < size:
+            sent = os.sendfile(out, f.fileno(), offset,
+                               min(SENDFILE_CHUNK, size - offset))
+            if sent == 0:
+                break
+            offset += sent
+
+
+class StaticServer(http.server.ThreadingHTTPServer):
+    """Serves root, with what the build published under content-derived
+    names, as of when the server started, marked immutable
+    """
+    def __init__(self, address: tuple[str, int], root: str,
+                 verbose: bool = False, image_cache: str | None = None):
+        self.root = os.path.abspath(root)
+        self.verbose = verbose
+        self.immutable_paths, self.immutable_variants = immutable_files(
+            self.root, image_cache)
+        super().__init__(address, StaticHandler)
+
+    def immutable(self, fs_path: str) -> bool:
+        return fs_path in self.immutable_paths or \
+            os.path.basename(fs_path) in self.immutable_variants
+
+
+def serve(root: str, host: str = "localhost", port: int = 8888,
+          verbose: bool = True, image_cache: str | None = None):
+    with StaticServer((host, port), root, verbose, image_cache) as server:
+        print(f"Serving {server.root} on http://{host}:{port}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,330 @@
+import os
+import re
+
+import assets
+import critical
+import htmlnode as hn
+import links
+
+
+# what a directory's pages are rendered into, looked for under the templates
+# directory at the same path relative to it as the pages are to content/
+TEMPLATE_FILENAME = "template.html"
+# the slots a page fills in, split out when a template is compiled
+SLOT_RE = re.compile(r"\{\{ (Title|Toc|Content|Critical) \}\}")
+# {% include "name" %}, {% extends "name" %}, {% block name %} and
+# {% endblock %}, or any other tag, which is an error
+TAG_RE = re.compile(r'\{%\s*(\w+)\s*(.*?)\s*%\}')
+WORD_RE = re.compile(r'\w+')
+
+
+class TemplateError(ValueError):
+    def __init__(self, path: str, line: int, message: str):
+        super().__init__(path, line, message)
+        self.path = path
+        self.line = line
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line}: {self.message}"
+
+
+class Template:
+    """Markup compiled down to a flat list of chunks, with the text between
+    slots at even indices and slot names at odd ones, so filling one in is
+    a single join. dependencies holds the size and mtime of every file that
+    went into it when it was compiled.
+    """
+    def __init__(self, source: str,
+                 dependencies: dict[str, tuple[int, int]] | None = None):
+        self.source = source
+        self.dependencies = dependencies or {}
+        self.chunks = SLOT_RE.split(source)
+        # saved by minifying the markup, which every page rendered with it
+        # saves again
+        self.bytes_saved = 0
+        # stylesheets that pages get the critical part of inlined, and the
+        # features the template's own markup gives every page
+        self.stylesheets: list[critical.Stylesheet] = []
+        self.features: set[str] = set()
+
+    def current(self) -> bool:
+        """Whether none of the files that went into it have changed since
+        """
+        for path, stamp in self.dependencies.items():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return False
+            if (stat.st_size, stat.st_mtime_ns) != stamp:
+                return False
+        return True
+
+    def prepare(self, asset_manifest: dict[str, str] | None = None,
+                minify: bool = False,
+                critical_css: critical.CriticalCSS | None = None,
+                prefetch: bool = False) -> "Template":
+        """A copy with asset URLs rewritten to their fingerprinted names and
+        the markup minified, as every page of a build needs it. With
+        critical_css, stylesheets are loaded without blocking rendering
+        and what each page needs of them is inlined. With prefetch, the
+        head ends with a mark for prefetch hints to be put in.
+        """
+        source = self.source
+        stylesheets = []
+        if critical_css:
+            source, stylesheets = critical_css.defer(source)
+        if asset_manifest:
+            source = assets.rewrite_template(source, asset_manifest)
+        minifier = hn.Minifier() if minify else None
+        if minifier:
+            source = minifier.markup(source)
+        if prefetch:
+            source = source.replace("</head>",
+                                    links.PREFETCH_MARK + "</head>", 1)
+        prepared = Template(source, self.dependencies)
+        prepared.bytes_saved = minifier.bytes_saved if minifier else 0
+        if stylesheets:
+            prepared.stylesheets = stylesheets
+            prepared.features = critical.markup_features(source)
+        return prepared
+
+    def critical_css(self, *nodes: hn.HTMLNode | None) -> str:
+        """A style element with the CSS a page made of nodes needs, if the
+        template inlines any
+        """
+        if not self.stylesheets:
+            return ""
+        features = critical.features(nodes)
+        features.update(self.features)
+        return critical.inline("".join(sheet.critical(features)
+                                       for sheet in self.stylesheets))
+
+    def render(self, title: str, content: str, toc: str = "",
+               minifier: hn.Minifier | None = None,
+               critical_css: str = "") -> str:
+        values = {"Title": hn.escape_text(title), "Toc": toc,
+                  "Content": content, "Critical": critical_css}
+        parts = self.chunks.copy()
+        for i in range(1, len(parts), 2):
+            parts[i] = values[parts[i]]
+        if minifier:
+            minifier.bytes_saved += self.bytes_saved
+        return "".join(parts)
+
+
+class Block:
+    def __init__(self, name: str):
+        self.name = name
+        self.body: list = []
+
+
+class Include:
+    def __init__(self, name: str, path: str, line: int):
+        self.name = name
+        # where it was included from
+        self.path = path
+        self.line = line
+
+
+class Compiler:
+    """Resolves a template's includes and extends into one piece of markup.
+    Names are relative to root, and can't point outside it.
+
+    A template that extends another is the other one, with any of its
+    blocks that the first one also defines swapped for the first one's.
+    Anything outside of blocks in an extending template is dropped.
+    """
+    def __init__(self, root: str):
+        self.root = root
+        self.dependencies: dict[str, tuple[int, int]] = {}
+        self.loading: list[str] = []
+
+    def compile(self, path: str) -> Template:
+        out = []
+        self.expand(path, {}, out)
+        return Template("".join(out), self.dependencies)
+
+    def resolve(self, name: str, path: str, line: int) -> str:
+        resolved = os.path.normpath(os.path.join(self.root, name))
+        if os.path.commonpath([self.root, resolved]) != self.root:
+            raise TemplateError(path, line, f"{name} isn't under {self.root}")
+        if not os.path.isfile(resolved):
+            raise TemplateError(path, line, f"can't find template {name}")
+        return resolved
+
+    def parse(self, path: str) -> tuple[tuple[str, int] | None, list,
+                                        dict[str, list]]:
+        """The template at path as the template it extends, if any, with the
+        line that says so, its body and its blocks by name
+        """
+        stat = os.stat(path)
+        self.dependencies[path] = (stat.st_size, stat.st_mtime_ns)
+        source = ""
+        with open(path) as f:
+            source = f.read()
+
+        extends = None
+        body = []
+        blocks = {}
+        open_blocks = []
+        pos = 0
+        for match in TAG_RE.finditer(source):
+            current = open_blocks[-1].body if open_blocks else body
+            if match.start() > pos:
+                current.append(source[pos:match.start()])
+            pos = match.end()
+            line = source.count("\n", 0, match.start()) + 1
+            tag, arg = match.groups()
+            quoted = arg[1:-1] if len(arg) > 1 and arg[0] == arg[-1] == '"' \
+                else None
+            word = arg if WORD_RE.fullmatch(arg) else None
+            if tag in ("include", "extends") and quoted is None:
+                raise TemplateError(path, line,
+                                    f'{tag} needs a quoted template name')
+            if tag == "include":
+                current.append(Include(quoted, path, line))
+            elif tag == "extends":
+                if extends is not None:
+                    raise TemplateError(path, line, "extends more than once")
+                extends = (quoted, line)
+            elif tag == "block":
+                if word is None:
+                    raise TemplateError(path, line, "block needs a name")
+                if word in blocks:
+                    raise TemplateError(path, line,
+                                        f"block {word} is defined twice")
+                block = Block(word)
+                blocks[word] = block.body
+                current.append(block)
+                open_blocks.append(block)
+            elif tag == "endblock":
+                if not open_blocks:
+                    raise TemplateError(path, line, "endblock without block")
+                block = open_blocks.pop()
+                if word is not None and word != block.name:
+                    raise TemplateError(path, line,
+                                        f"endblock {word} closes block"
+                                        f" {block.name}")
+            else:
+                raise TemplateError(path, line, f"unknown tag {tag}")
+        if pos < len(source):
+            body.append(source[pos:])
+        if open_blocks:
+            raise TemplateError(path, source.count("\n") + 1,
+                                f"block {open_blocks[-1].name} is never"
+                                " closed")
+        return extends, body, blocks
+
+    def expand(self, path: str, overrides: dict[str, list], out: list[str]):
+        if path in self.loading:
+            raise TemplateError(path, 1, "includes or extends itself")
+        self.loading.append(path)
+        extends, body, blocks = self.parse(path)
+        if extends is not None:
+            # blocks from further down the chain win
+            parent = self.resolve(extends[0], path, extends[1])
+            self.expand(parent, {**blocks, **overrides}, out)
+        else:
+            self.flatten(body, overrides, out)
+        self.loading.pop()
+
+    def flatten(self, body: list, overrides: dict[str, list],
+                out: list[str]):
+        for node in body:
+            if isinstance(node, str):
+                out.append(node)
+            elif isinstance(node, Block):
+                self.flatten(overrides.get(node.name, node.body), overrides,
+                             out)
+            else:
+                included = self.resolve(node.name, node.path, node.line)
+                self.expand(included, {}, out)
+
+
+# compiled templates by path and root, kept for as long as the files they
+# were compiled from stay the same
+_compiled: dict[tuple[str, str], Template] = {}
+
+
+def load(path: str, root: str | None = None) -> Template:
+    """The template at path compiled, with names resolved against root (the
+    directory it's in by default). It's only compiled again once it, or
+    anything it includes or extends, has changed.
+    """
+    path = os.path.abspath(path)
+    root = os.path.abspath(root or os.path.dirname(path))
+    key = (path, root)
+    template = _compiled.get(key)
+    if template is None or not template.current():
+        template = Compiler(root).compile(path)
+        _compiled[key] = template
+    return template
+
+
+class TemplateSet:
+    """The templates a build renders pages with. Pages in a directory under
+    content_dir are rendered with the template.html at the same path under
+    template_dir, or the nearest one above it, and default_path if there
+    isn't one. Templates name what they include and extend relative to the
+    directory default_path is in.
+
+    Each template is compiled and prepared once, and which one a directory
+    uses is only looked up once, so pages after the first cost a dict
+    lookup. A set can be pickled to worker processes along with everything
+    it has compiled.
+    """
+    def __init__(self, default_path: str, content_dir: str | None = None,
+                 template_dir: str | None = None,
+                 asset_manifest: dict[str, str] | None = None,
+                 minify: bool = False,
+                 critical_css: critical.CriticalCSS | None = None,
+                 prefetch: bool = False):
+        self.default_path = os.path.abspath(default_path)
+        self.root = os.path.dirname(self.default_path)
+        self.content_dir = os.path.abspath(content_dir) if content_dir \
+            else None
+        self.template_dir = os.path.abspath(template_dir) if template_dir \
+            else None
+        self.asset_manifest = asset_manifest
+        self.minify = minify
+        self.critical_css = critical_css
+        self.prefetch = prefetch
+        self.by_path: dict[str, Template] = {}
+        self.by_dir: dict[str, Template] = {}
+
+    def get(self, path: str) -> Template:
+        template = self.by_path.get(path)
+        if template is None:
+            template = load(path, self.root).prepare(
+                self.asset_manifest, self.minify, self.critical_css,
+                self.prefetch)
+            self.by_path[path] = template
+        return template
+
+    def default(self) -> Template:
+        return self.get(self.default_path)
+
+    def for_page(self, src_path: str) -> Template:
+        return self.for_dir(os.path.dirname(os.path.abspath(src_path)))
+
+    def for_dir(self, src_dir: str) -> Template:
+        template = self.by_dir.get(src_dir)
+        if template is None:
+            template = self.select(src_dir)
+            self.by_dir[src_dir] = template
+        return template
+
+    def select(self, src_dir: str) -> Template:
+        if self.content_dir is None or self.template_dir is None or \
+                os.path.commonpath([self.content_dir, src_dir]) != \
+                self.content_dir:
+            return self.default()
+        rel_dir = os.path.relpath(src_dir, self.content_dir)
+        path = os.path.normpath(os.path.join(self.template_dir, rel_dir,
+                                             TEMPLATE_FILENAME))
+        if os.path.isfile(path):
+            return self.get(path)
+        if src_dir == self.content_dir:
+            return self.default()
+        return self.for_dir(os.path.dirname(src_dir))
@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+import unittest
+
+from assets import (
+    MANIFEST_FILENAME,
+    HashCache,
+    fingerprint_assets,
+    fingerprinted_name,
+    load_manifest,
+    rewrite_template,
+    rewrite_tree,
+    rewrite_url,
+)
+import htmlnode as hn
+
+
+MANIFEST = {
+    "/index.css": "/index.abc.css",
+    "/images/a.png": "/images/a.def.png",
+}
+
+
+class TestRewrite(unittest.TestCase):
+    def test_fingerprinted_name(self):
+        self.assertEqual(fingerprinted_name("index.css", "abc"),
+                         "index.abc.css")
+        self.assertEqual(fingerprinted_name("LICENSE", "abc"), "LICENSE.abc")
+
+    def test_rewrite_url(self):
+        tests = [
+            ("/index.css", "/index.abc.css"),
+            ("/index.css?v=1", "/index.abc.css?v=1"),
+            ("/images/a.png#frag", "/images/a.def.png#frag"),
+            ("/recipes", "/recipes"),
+            ("index.css", "index.css"),
+        ]
+        for url, expected in tests:
+            self.assertEqual(rewrite_url(url, MANIFEST), expected)
+
+    def test_rewrite_template(self):
+        template = ('<link href="/index.css" rel="stylesheet">'
+                    '<a href="/about">{{ Title }}</a>')
+        self.assertEqual(rewrite_template(template, MANIFEST), (
+            '<link href="/index.abc.css" rel="stylesheet">'
+            '<a href="/about">{{ Title }}</a>'
+        ))
+
+    def test_rewrite_tree(self):
+        img = hn.LeafNode('img', "", {
+            "src": "/images/a.png",
+            "alt": "/index.css",
+            "srcset": "/images/a.k-480w.png 480w, /images/a.png 960w",
+        })
+        link = hn.LeafNode('a', "css", {"href": "/index.css"})
+        rewrite_tree(hn.ParentNode('p', children=[img, link]), MANIFEST)
+        self.assertEqual(img.props, {
+            "src": "/images/a.def.png",
+            "alt": "/index.css",
+            "srcset": "/images/a.k-480w.png 480w, /images/a.def.png 960w",
+        })
+        self.assertEqual(link.props, {"href": "/index.abc.css"})
+
+
+class TestFingerprintAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        os.makedirs(os.path.join(self.static, "images"))
+        os.makedirs(self.public)
+        self.write("index.css", "body {}")
+        self.write(os.path.join("images", "a.png"), "png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path: str, content: str):
+        with open(os.path.join(self.static, rel_path), 'w') as f:
+            f.write(content)
+
+    def test_fingerprint_assets(self):
+        manifest = fingerprint_assets(self.static, self.public)
+        self.assertEqual(sorted(manifest), ["/images/a.png", "/index.css"])
+        for url, fingerprinted in manifest.items():
+            path = os.path.join(self.public, fingerprinted.lstrip("/"))
+            with open(path) as f:
+                self.assertEqual(f.read(),
+                                 "body {}" if url == "/index.css" else "png")
+        with open(os.path.join(self.public, MANIFEST_FILENAME)) as f:
+            self.assertEqual(json.load(f), manifest)
+        self.assertEqual(load_manifest(self.public), manifest)
+        self.assertIsNone(load_manifest(self.static))
+
+    def test_fingerprint_only_changed(self):
+        first = fingerprint_assets(self.static, self.public)
+        self.write("index.css", "body { color: red; }")
+        second = fingerprint_assets(self.static, self.public)
+        self.assertNotEqual(first["/index.css"], second["/index.css"])
+        self.assertEqual(first["/images/a.png"], second["/images/a.png"])
+
+    def test_hash_cache(self):
+        cache_path = os.path.join(self.tmp.name, "cache", "hashes.json")
+        path = os.path.join(self.static, "index.css")
+        cache = HashCache(cache_path)
+        digest = cache.hash(path)
+        cache.save()
+
+        # a reloaded cache trusts the stored hash while size and mtime match
+        cache = HashCache(cache_path)
+        cache.entries[path][2] = "stored"
+        self.assertEqual(cache.hash(path), "stored")
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(cache.hash(path), digest)
+
+        # files that are gone are dropped when it's saved
+        cache.entries["/gone.css"] = [1, 1, "gone"]
+        cache.save([path])
+        self.assertEqual(list(HashCache(cache_path).entries), [path])
+
+
+if __name__ == "__main__":
+    unittest.main()
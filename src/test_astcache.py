@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+import astcache
+from astcache import ASTCache, decode, encode
+from blocks import Outline, markdown_to_html_node
+
+
+MARKDOWN = """# Heading
+
+Some **bold** and [a link](/somewhere.html) and `code`.
+
+- one
+- two
+
+```
+print("hi")
+```
+
+```python
+x = "<b>"
+```"""
+
+
+class TestASTCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ASTCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_encode_decode(self):
+        node = markdown_to_html_node(MARKDOWN)
+        self.assertEqual(decode(encode(node)), node)
+        self.assertEqual(decode(encode(node)).to_html(), node.to_html())
+
+    def test_parse(self):
+        first = self.cache.parse(MARKDOWN)
+        second = self.cache.parse(MARKDOWN)
+        self.assertEqual(first, markdown_to_html_node(MARKDOWN))
+        self.assertEqual(second, first)
+        self.assertIsNot(second, first)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+        self.cache.parse(MARKDOWN + " more")
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_outline(self):
+        markdown = "# Title\n\n## Part\n\n## Part"
+        self.cache.parse(markdown)
+        outline = Outline()
+        self.cache.parse(markdown, outline=outline)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(outline.headings, [
+            (1, "title", "Title"), (2, "part", "Part"), (2, "part-1", "Part"),
+        ])
+        self.assertEqual(outline.add(2, "Part"), "part-2")
+
+    def test_corrupt_entry(self):
+        self.cache.parse(MARKDOWN)
+        with open(self.cache.path(MARKDOWN), 'wb') as f:
+            f.write(b"\x00garbage")
+        self.assertEqual(self.cache.parse(MARKDOWN),
+                         markdown_to_html_node(MARKDOWN))
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_parser_version(self):
+        self.cache.parse(MARKDOWN)
+        version = astcache.PARSER_VERSION
+        astcache.PARSER_VERSION = version + 1
+        try:
+            self.assertIsNone(ASTCache(self.tmp.name).load(MARKDOWN))
+        finally:
+            astcache.PARSER_VERSION = version
+
+    def test_trim(self):
+        markdowns = [f"{MARKDOWN}\n\n{i}" for i in range(4)]
+        for i, markdown in enumerate(markdowns):
+            self.cache.parse(markdown)
+            os.utime(self.cache.path(markdown), ns=(i, i))
+        # using a tree makes it the most recently used
+        self.cache.parse(markdowns[0])
+        size = os.path.getsize(self.cache.path(markdowns[0]))
+
+        self.cache.max_bytes = size * 2
+        self.assertEqual(self.cache.trim(), 2)
+        remaining = [os.path.exists(self.cache.path(markdown))
+                     for markdown in markdowns]
+        self.assertEqual(remaining, [True, False, False, True])
+        self.assertEqual(self.cache.trim(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,21 @@
+import sys
 import unittest
 
 from blocks import (
+    BudgetExceeded,
     Code,
     Heading,
+    MarkdownError,
     OrderedList,
+    Outline,
     Paragraph,
     Quote,
     UnorderedList,
     block_to_block_type,
+    markdown_to_block_spans,
     markdown_to_block_strings,
     markdown_to_html_node,
+    slugify,
     text_to_children,
 )
 import textnode as tn
@@ -47,6 +53,8 @@ class TestBlockToBlockType(unittest.TestCase):
             "# Shopping list",
             "###### Essentials",
             "1. apples\n4. beer\n5. beer\n6. soft pretzels\n10. mustard",
+            "- fruit\n  - apples\n    1. green\n\t* pears",
+            "1. fruit\n   - apples\n2. beer",
         ]
         expected_types = [
             UnorderedList,
@@ -56,6 +64,8 @@ class TestBlockToBlockType(unittest.TestCase):
             Heading,
             Heading,
             OrderedList,
+            UnorderedList,
+            OrderedList,
         ]
         self.assertEqual(len(blocks), len(expected_types))
         for block, expected in zip(blocks, expected_types):
@@ -68,6 +78,8 @@ class TestBlockToBlockType(unittest.TestCase):
             "def ```main()``` is not a code block, but more inline",
             "> almost a block quote\n but not really",
             "* I was a list\n until I forgot what I was doing",
+            "- bullets\n1. then numbers",
+            "1. numbers\n- then bullets",
         ]
         for block in blocks:
             self.assertIsInstance(block_to_block_type(block), Paragraph)
@@ -127,7 +139,7 @@ class TestBlockTypes(unittest.TestCase):
         node = h3.to_html_node()
         expected = hn.ParentNode('h3', children=[
             hn.LeafNode(None, "Heading 3"),
-        ])
+        ], props={"id": "heading-3"})
         self.assertEqual(node, expected)
 
     def test_code_to_html_node(self):
@@ -138,6 +150,19 @@ class TestBlockTypes(unittest.TestCase):
         ])
         self.assertEqual(node, expected)
 
+        code = Code("```python title\nreturn 1\n```")
+        self.assertEqual(code.to_html_node().to_html(), (
+            '<pre><code class="language-python">'
+            '<span class="hl-keyword">return</span> '
+            '<span class="hl-number">1</span></code></pre>'
+        ))
+        code = Code("```elflang\nfunc main(){}\n```")
+        self.assertEqual(code.to_html_node().to_html(), (
+            '<pre><code class="language-elflang">func main(){}</code></pre>'
+        ))
+        self.assertEqual(Code("```x = 1```").to_html_node().to_html(),
+                         '<pre><code>x = 1</code></pre>')
+
     def test_quote_to_html_node(self):
         text = """
 > Failure is success in progress.
@@ -196,6 +221,56 @@ class TestBlockTypes(unittest.TestCase):
         ])
         self.assertEqual(node, expected)
 
+    def test_nested_list_to_html_node(self):
+        text = """
+- fruit
+  - apples
+    1. green
+    2. **red**
+  - pears
+- beer
+    - deeper than it needs to be
+  - back out
+"""
+        node = UnorderedList(text.strip()).to_html_node()
+        self.assertEqual(node.to_html(), (
+            '<ul>'
+            '<li>fruit<ul>'
+            '<li>apples<ol><li>green</li><li><b>red</b></li></ol></li>'
+            '<li>pears</li>'
+            '</ul></li>'
+            '<li>beer<ul>'
+            '<li>deeper than it needs to be</li>'
+            '<li>back out</li>'
+            '</ul></li>'
+            '</ul>'
+        ))
+
+    def test_nested_quote_to_html_node(self):
+        text = """
+> Outside
+>> Inside
+>> still inside
+> > > Way inside
+> Outside again
+"""
+        node = Quote(text.strip()).to_html_node()
+        expected = hn.ParentNode('blockquote', children=[
+            hn.LeafNode(None, "Outside"),
+            hn.ParentNode('blockquote', children=[
+                hn.LeafNode(None, "Inside still inside"),
+                hn.ParentNode('blockquote', children=[
+                    hn.LeafNode(None, "Way inside"),
+                ]),
+            ]),
+            hn.LeafNode(None, "Outside again"),
+        ])
+        self.assertEqual(node, expected)
+
+        node = Quote(">>> Straight in").to_html_node()
+        self.assertEqual(node.to_html(), "<blockquote><blockquote><blockquote>"
+                         "Straight in</blockquote></blockquote></blockquote>")
+
 
 class TestMarkdownToHTMLNode(unittest.TestCase):
     def test_markdown_to_html_node(self):
@@ -225,10 +300,11 @@ and now a code block
 """
         node = markdown_to_html_node(markdown)
         expected = hn.ParentNode('div', children=[
-            hn.ParentNode('h1', children=[hn.LeafNode(None, "heading 1")]),
+            hn.ParentNode('h1', children=[hn.LeafNode(None, "heading 1")],
+                          props={"id": "heading-1"}),
             hn.ParentNode('h2', children=[
                 hn.LeafNode(None, "unordered list below")
-            ]),
+            ], props={"id": "unordered-list-below"}),
             hn.ParentNode('ul', children=[
                 hn.ParentNode('li', children=[
                     hn.LeafNode(None, "unordered list "),
@@ -253,7 +329,7 @@ and now a code block
             ]),
             hn.ParentNode('h2', children=[
                 hn.LeafNode(None, "ordered list below")
-            ]),
+            ], props={"id": "ordered-list-below"}),
             hn.ParentNode('ol', children=[
                 hn.ParentNode('li', children=[
                     hn.LeafNode(None, "ordered list "),
@@ -270,6 +346,124 @@ and now a code block
         ])
         self.assertEqual(node, expected)
 
+    def test_markdown_to_html_node_deadline(self):
+        with self.assertRaises(BudgetExceeded):
+            markdown_to_html_node("# heading\n\nparagraph", deadline=0)
+        node = markdown_to_html_node("# heading", deadline=float("inf"))
+        self.assertEqual(node.tag, 'div')
+
+    def test_deep_nesting(self):
+        depth = sys.getrecursionlimit() + 500
+        markdown = "\n".join(" " * i + "- item" for i in range(depth))
+        html = markdown_to_html_node(markdown).to_html()
+        self.assertEqual(html.count("<ul>"), depth)
+        self.assertTrue(html.endswith("</li></ul>" * depth + "</div>"))
+
+        markdown = "\n".join(">" * (i + 1) + " quote" for i in range(depth))
+        html = markdown_to_html_node(markdown).to_html()
+        self.assertEqual(html.count("<blockquote>"), depth)
+
+    def test_markdown_to_block_spans(self):
+        markdown = "# heading\n\n  para\ngraph  \r\n\r\n- item"
+        spans = markdown_to_block_spans(markdown)
+        self.assertEqual(spans, [
+            (0, "# heading"),
+            (13, "para\ngraph"),
+            (29, "- item"),
+        ])
+        for offset, block in spans:
+            self.assertTrue(markdown.startswith(block, offset))
+
+    def test_references_and_footnotes(self):
+        markdown = "\n".join([
+            "See [the docs][docs] and a claim.[^1]",
+            "",
+            "[docs]: /docs.html",
+            "",
+            "[^1]: Backed by [docs].",
+        ])
+        self.assertEqual(
+            markdown_to_html_node(markdown).to_html(),
+            '<div><p>See <a href="/docs.html">the docs</a> and a claim.'
+            '<sup><a href="#fn-1" id="fnref-1">1</a></sup></p>'
+            '<section class="footnotes"><ol><li id="fn-1">Backed by '
+            '<a href="/docs.html">docs</a>. <a href="#fnref-1">\u21a9</a>'
+            '</li></ol></section></div>')
+        # without definitions, brackets are just text
+        self.assertEqual(markdown_to_html_node("[docs] [^1]").to_html(),
+                         "<div><p>[docs] [^1]</p></div>")
+
+    def test_markdown_to_html_node_error_position(self):
+        tests = [
+            ("# heading\n\nsome **bold text", 3, 6),
+            ("# heading\n\n- one\n- *two\n- three", 4, 3),
+            ("`code` and `more code", 1, 12),
+            # quote lines are joined without their markers
+            ("> q\n> **x", 2, 3),
+            ("para\n\n> a\n>> b\n>   c *d", 5, 7),
+        ]
+        for markdown, line, column in tests:
+            with self.assertRaises(MarkdownError) as error:
+                markdown_to_html_node(markdown)
+            self.assertEqual((error.exception.line, error.exception.column),
+                             (line, column))
+            self.assertEqual(str(error.exception),
+                             f"{line}:{column}: "
+                             "unclosed formatting syntax found")
+
+
+class TestSlugify(unittest.TestCase):
+    def test_slugify(self):
+        tests = [
+            ("Food", "food"),
+            ("Stir Fry-day!", "stir-fry-day"),
+            ("  C++ & Rust  ", "c-rust"),
+        ]
+        for text, expected in tests:
+            self.assertEqual(slugify(text), expected)
+
+
+class TestOutline(unittest.TestCase):
+    def test_ids(self):
+        outline = Outline()
+        markdown = "\n\n".join([
+            "# Intro", "## Intro", "## Intro-1", "### *Intro*", "## !!!",
+            "## [Usage](/usage.html) `notes`",
+        ])
+        node = markdown_to_html_node(markdown, outline=outline)
+        ids = [child.props["id"] for child in node.children]
+        self.assertEqual(ids, [
+            "intro", "intro-1", "intro-1-1", "intro-2", "section",
+            "usage-notes",
+        ])
+        self.assertEqual(outline.headings[5], (2, "usage-notes",
+                                               "Usage notes"))
+
+    def test_many_duplicates(self):
+        outline = Outline()
+        for _ in range(5000):
+            outline.add(2, "Step")
+        self.assertEqual(outline.headings[-1][1], "step-4999")
+        self.assertEqual(len(outline.used), 5000)
+        self.assertEqual(outline.next_suffix["step"], 5000)
+
+    def test_to_html_node(self):
+        outline = Outline()
+        self.assertIsNone(outline.to_html_node())
+        for level, text in ((1, "Title"), (2, "A"), (3, "A.1"), (4, "A.1.a"),
+                            (3, "A.2"), (2, "B"), (4, "B deep")):
+            outline.add(level, text)
+        self.assertEqual(outline.to_html_node().to_html(), (
+            '<ul>'
+            '<li><a href="#a">A</a><ul>'
+            '<li><a href="#a-1">A.1</a><ul>'
+            '<li><a href="#a-1-a">A.1.a</a></li></ul></li>'
+            '<li><a href="#a-2">A.2</a></li></ul></li>'
+            '<li><a href="#b">B</a><ul>'
+            '<li><a href="#b-deep">B deep</a></li></ul></li>'
+            '</ul>'
+        ))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,150 @@
+import io
+import os
+import tempfile
+import unittest
+
+import log
+import htmlnode as hn
+from critical import (
+    CriticalCSS,
+    Stylesheet,
+    features,
+    markup_features,
+    requirements,
+    split_rules,
+)
+from generate import generate_pages
+from outputs import MemoryOutput
+
+
+CSS = """/* site styles { */
+@charset "utf-8";
+body { margin: 0; }
+pre code, blockquote > p:first-child { padding: 0; }
+a:hover, *::selection { color: red; }
+.hl-keyword { content: "}"; }
+#title { font-size: 2em; }
+@media (max-width: 600px) {
+    pre { overflow: auto; }
+    img { width: 100%; }
+}
+@font-face { font-family: Mono; src: url(mono.woff2); }
+"""
+
+
+def setUpModule():
+    log.configure(stream=io.StringIO())
+
+
+def tearDownModule():
+    log.configure()
+
+
+class TestCritical(unittest.TestCase):
+    def test_requirements(self):
+        tests = [
+            ("pre code", {"pre", "code"}),
+            ("blockquote > p:first-child", {"blockquote", "p"}),
+            ("A:hover", {"a"}),
+            ("*::selection", set()),
+            ('a[href^="http"].external', {"a", ".external"}),
+            ("li:not(.done)#Top", {"li", "#Top"}),
+        ]
+        for selector, expected in tests:
+            self.assertEqual(requirements(selector), expected, selector)
+
+    def test_split_rules(self):
+        self.assertEqual(split_rules('@import "a.css"; a { b: "}" } '
+                                     '@media x { p { c: d } }'),
+                         [("a", ' b: "}" '), ("@media x", " p { c: d } ")])
+
+    def test_critical(self):
+        sheet = Stylesheet(CSS)
+        self.assertEqual(sheet.critical({"body", "p", "div"}),
+                         "body{margin: 0;}*::selection{color: red;}")
+        self.assertEqual(
+            sheet.critical({"body", "pre", "code", "a", ".hl-keyword",
+                            "#title"}),
+            'body{margin: 0;}pre code{padding: 0;}'
+            'a:hover,*::selection{color: red;}.hl-keyword{content: "}";}'
+            '#title{font-size: 2em;}'
+            '@media (max-width: 600px){pre{overflow: auto;}}')
+
+        # features no selector mentions don't make for another entry
+        sheet.critical({"body", "p", "div", "#other", ".other", "section"})
+        self.assertEqual(len(sheet.cache), 2)
+
+    def test_features(self):
+        node = hn.ParentNode("div", [
+            hn.LeafNode("h1", "Title", {"id": "title"}),
+            hn.ParentNode("pre", [
+                hn.LeafNode("span", "def", {"class": "hl-keyword x"}),
+            ]),
+            hn.LeafNode(None, "text"),
+        ])
+        self.assertEqual(features([node, None]),
+                         {"div", "h1", "#title", "pre", "span",
+                          ".hl-keyword", ".x"})
+        self.assertEqual(markup_features('<BODY class="a b"><main id="m">'),
+                         {"body", ".a", ".b", "main", "#m"})
+
+    def test_defer(self):
+        with tempfile.TemporaryDirectory() as static:
+            with open(os.path.join(static, "index.css"), 'w') as f:
+                f.write(CSS)
+            critical_css = CriticalCSS(static)
+            markup, sheets = critical_css.defer(
+                '<link href="/index.css" rel="stylesheet">'
+                '<link href="/print.css" rel="stylesheet">'
+                '<link href="/index.css" rel="stylesheet" media="print">'
+                '<link href="/index.css" rel="icon">')
+            self.assertEqual(markup, (
+                '{{ Critical }}<link href="/index.css" rel="preload"'
+                ' as="style"'
+                ' onload="this.onload=null;this.rel=\'stylesheet\'">'
+                '<noscript><link href="/index.css" rel="stylesheet">'
+                '</noscript>'
+                '<link href="/print.css" rel="stylesheet">'
+                '<link href="/index.css" rel="stylesheet" media="print">'
+                '<link href="/index.css" rel="icon">'))
+            self.assertEqual(len(sheets), 1)
+            self.assertIs(critical_css.stylesheet("/index.css"), sheets[0])
+            self.assertIsNone(critical_css.stylesheet("/../index.css"))
+
+    def test_generate_pages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for rel_path, data in (
+                ("template.html",
+                 '<head><link href="/index.css" rel="stylesheet"></head>'
+                 '<body>{{ Content }}</body>'),
+                (os.path.join("static", "index.css"), CSS),
+                (os.path.join("content", "index.md"), "# Home"),
+                (os.path.join("content", "code.md"),
+                 "# Code\n\n```\nx\n```"),
+            ):
+                path = os.path.join(tmp, rel_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w') as f:
+                    f.write(data)
+            public = os.path.join(tmp, "public")
+            output = MemoryOutput(public)
+            generate_pages(os.path.join(tmp, "content"), public,
+                           os.path.join(tmp, "template.html"),
+                           asset_manifest={"/index.css": "/index.abc.css"},
+                           output=output, listings=True,
+                           critical_css=CriticalCSS(
+                               os.path.join(tmp, "static")))
+            home = output.files["index.html"].decode()
+            self.assertTrue(home.startswith(
+                "<head><style>body{margin: 0;}*::selection{color: red;}"
+                '</style><link href="/index.abc.css" rel="preload"'))
+            code = output.files["code.html"].decode()
+            self.assertIn("pre code{padding: 0;}", code)
+            self.assertIn("@media (max-width: 600px){pre{overflow: auto;}}",
+                          code)
+            # listings are deferred too, and get what their links need
+            self.assertIn("a:hover", output.files["page-1.html"].decode())
+
+
+if __name__ == "__main__":
+    unittest.main()
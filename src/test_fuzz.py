@@ -0,0 +1,97 @@
+import unittest
+
+from fuzz import (
+    REFERENCE,
+    Engine,
+    Fuzzer,
+    MarkdownGenerator,
+    minimize,
+    outcome,
+)
+import blocks
+import textnode as tn
+
+
+def broken_text_to_textnodes(text: str,
+                             definitions: tn.Definitions | None = None
+                             ) -> list[tn.TextNode]:
+    # forgets about code spans entirely
+    nodes = [tn.TextNode(text)]
+    for extractor in (tn.ImageExtractor(), tn.LinkExtractor()):
+        nodes = tn.split_nodes_extractor(nodes, extractor)
+    nodes = tn.split_nodes_delimiter(nodes, "**", tn.TextType.Bold)
+    return tn.split_nodes_delimiter(nodes, "*", tn.TextType.Italic)
+
+
+class TestMarkdownGenerator(unittest.TestCase):
+    def test_deterministic(self):
+        first = [MarkdownGenerator(7).document() for _ in range(3)]
+        second = [MarkdownGenerator(7).document() for _ in range(3)]
+        self.assertEqual(first, second)
+        self.assertNotEqual(MarkdownGenerator(1).document(),
+                            MarkdownGenerator(2).document())
+
+
+class TestOutcome(unittest.TestCase):
+    def test_outcome(self):
+        self.assertEqual(outcome(len, "abc"), ("ok", 3))
+        self.assertEqual(outcome(tn.text_to_textnodes, "*a"),
+                         ("error", "UnclosedDelimiterError",
+                          "unclosed formatting syntax found"))
+
+
+class TestMinimize(unittest.TestCase):
+    def test_minimize(self):
+        text = "lots of\nharmless text\nwith a ` in it\nand more"
+        self.assertEqual(minimize(text, lambda s: "`" in s), "`")
+
+    def test_minimize_keeps_failing(self):
+        text = "ab\ncd\nef"
+        result = minimize(text, lambda s: "a" in s and "f" in s)
+        self.assertEqual(result, "af")
+
+
+class TestFuzzer(unittest.TestCase):
+    def test_reference_agrees_with_itself(self):
+        fuzzer = Fuzzer([Engine("copy", tn.text_to_textnodes,
+                                blocks.markdown_to_block_strings,
+                                blocks.markdown_to_html_node)])
+        self.assertEqual(fuzzer.run(50), [])
+        self.assertEqual(fuzzer.stats[("copy", "text_to_textnodes")].calls,
+                         50)
+        self.assertIn("markdown_to_html_node", fuzzer.report())
+
+    def test_finds_and_minimizes_mismatch(self):
+        broken = Engine("broken", broken_text_to_textnodes,
+                        REFERENCE.markdown_to_block_strings,
+                        REFERENCE.markdown_to_html_node)
+        mismatches = Fuzzer([broken], seed=3).run(50)
+        self.assertTrue(mismatches)
+        for mismatch in mismatches:
+            self.assertEqual(mismatch.engine, "broken")
+            self.assertEqual(mismatch.target, "text_to_textnodes")
+            self.assertIn("`", mismatch.text)
+            self.assertNotEqual(mismatch.expected, mismatch.actual)
+            # dropping any single character makes the mismatch go away
+            for i in range(len(mismatch.text)):
+                smaller = mismatch.text[:i] + mismatch.text[i + 1:]
+                self.assertEqual(outcome(tn.text_to_textnodes, smaller),
+                                 outcome(broken_text_to_textnodes, smaller))
+
+    def test_finds_mismatch_in_documents(self):
+        # the same scanner bug, seen only through whole documents
+        def broken_markdown_to_html_node(markdown: str):
+            return blocks.markdown_to_html_node(
+                markdown, inline=broken_text_to_textnodes)
+
+        broken = Engine("broken", REFERENCE.text_to_textnodes,
+                        REFERENCE.markdown_to_block_strings,
+                        broken_markdown_to_html_node)
+        mismatches = Fuzzer([broken], seed=3).run(50)
+        self.assertTrue(mismatches)
+        self.assertEqual({mismatch.target for mismatch in mismatches},
+                         {"markdown_to_html_node"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,30 @@
+import io
+import json
+import os
+import tempfile
 import unittest
 
+import log
+from blocks import BudgetExceeded
 from generate import (
-    extract_title
+    PageBudget,
+    PageError,
+    extract_tags,
+    extract_title,
+    generate_pages,
+    render_html,
+    split_front_matter,
 )
 
+
+def setUpModule():
+    log.configure(stream=io.StringIO())
+
+
+def tearDownModule():
+    log.configure()
+
+
 class TestExtractTitle(unittest.TestCase):
     def test_extract_title_hello(self):
         title = extract_title("# Hello")
@@ -23,3 +44,119 @@ We've got a small note at the top, but the first h1 is below
     def test_extract_title_raises(self):
         with self.assertRaises(ValueError):
             extract_title("none to be found")
+
+
+class TestSplitFrontMatter(unittest.TestCase):
+    def test_split_front_matter(self):
+        markdown = "---\ntags: food, Vegan\nDraft: yes\n---\n# Title\n"
+        metadata, body = split_front_matter(markdown)
+        self.assertEqual(metadata, {"tags": "food, Vegan", "draft": "yes"})
+        self.assertEqual(body, "# Title\n")
+
+    def test_split_front_matter_none(self):
+        for markdown in ("# Title\n---\ntags: a\n---\n", "---\ntags: a\n", ""):
+            self.assertEqual(split_front_matter(markdown), ({}, markdown))
+
+    def test_extract_tags(self):
+        tests = [
+            ({}, []),
+            ({"tags": ""}, []),
+            ({"tags": "food, vegan ,food,"}, ["food", "vegan"]),
+        ]
+        for metadata, expected in tests:
+            self.assertEqual(extract_tags(metadata), expected)
+
+
+class TestPageBudget(unittest.TestCase):
+    def test_check_size(self):
+        with tempfile.NamedTemporaryFile('w', suffix=".md") as f:
+            f.write("# " + "x" * 100)
+            f.flush()
+            PageBudget().check_size(f.name)
+            PageBudget(max_bytes=102).check_size(f.name)
+            with self.assertRaises(BudgetExceeded) as error:
+                PageBudget(max_bytes=101).check_size(f.name)
+            self.assertIn(os.path.basename(f.name), str(error.exception))
+
+    def test_deadline(self):
+        self.assertIsNone(PageBudget().deadline())
+        self.assertIsNotNone(PageBudget(max_seconds=1).deadline())
+
+
+class TestRenderHtml(unittest.TestCase):
+    def test_toc(self):
+        with tempfile.NamedTemporaryFile('w', suffix=".md") as f:
+            f.write("# Title\n\n## One\n\ntext\n\n### Two")
+            f.flush()
+            html, metadata = render_html(
+                f.name, "<nav>{{ Toc }}</nav><main>{{ Content }}</main>")
+        self.assertEqual(metadata["title"], "Title")
+        self.assertEqual(html, (
+            '<nav><ul><li><a href="#one">One</a><ul>'
+            '<li><a href="#two">Two</a></li></ul></li></ul></nav>'
+            '<main><div><h1 id="title">Title</h1><h2 id="one">One</h2>'
+            '<p>text</p><h3 id="two">Two</h3></div></main>'
+        ))
+
+
+class TestCollectErrors(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        for rel_path, data in (
+            ("template.html", "<title>{{ Title }}</title>{{ Content }}"),
+            (os.path.join("content", "index.md"), "# Home"),
+            (os.path.join("content", "bad.md"),
+             "---\ntags: x\n---\n# Bad\n\nsome **bold text\n"),
+            (os.path.join("content", "post", "untitled.md"), "no title"),
+        ):
+            path = os.path.join(self.tmp.name, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(data)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fail_fast(self):
+        with self.assertRaises(PageError) as error:
+            generate_pages(self.content, self.public, self.template)
+        self.assertEqual(error.exception.path,
+                         os.path.join(self.content, "bad.md"))
+
+    def test_keep_going(self):
+        for jobs in (1, 2):
+            result = generate_pages(self.content, self.public, self.template,
+                                    keep_going=True, jobs=jobs)
+            self.assertEqual(result.pages, 1)
+            self.assertTrue(
+                os.path.exists(os.path.join(self.public, "index.html")))
+            self.assertEqual([e.to_dict() for e in result.errors], [
+                {
+                    "path": os.path.join(self.content, "bad.md"),
+                    "line": 6,
+                    "column": 6,
+                    "kind": "UnclosedDelimiterError",
+                    "message": "unclosed formatting syntax found",
+                },
+                {
+                    "path": os.path.join(self.content, "post", "untitled.md"),
+                    "line": 1,
+                    "column": 1,
+                    "kind": "ValueError",
+                    "message": "could not find title",
+                },
+            ])
+
+            report_path = os.path.join(self.tmp.name, "errors.json")
+            result.write_error_report(report_path)
+            with open(report_path) as f:
+                report = json.load(f)
+            self.assertEqual(report["error_count"], 2)
+            self.assertEqual(report["errors"][0]["line"], 6)
+
+    def test_page_error_str(self):
+        error = PageError("content/bad.md", 6, 6, "ValueError", "oops")
+        self.assertEqual(str(error), "content/bad.md:6:6: oops")
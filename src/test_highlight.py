@@ -0,0 +1,95 @@
+import unittest
+
+from highlight import (
+    LEXERS,
+    Highlighter,
+    Lexer,
+    fence_language,
+    register,
+)
+
+
+class TestLexers(unittest.TestCase):
+    def test_tokens_cover_code(self):
+        samples = {
+            "python": 'def f(x):\n    """doc"""\n    return x + 1  # one\n',
+            "js": "const s = `tpl ${x}`; /* unclosed",
+            "go": 'func main() {\n\tfmt.Println("Hello, World!")\n}',
+            "bash": 'if [ -d "$HOME" ]; then ls; fi # done\nls ${DIR}',
+            "json": '{"a": [1, -2.5e3, true, null]}',
+        }
+        for language, code in samples.items():
+            tokens = list(LEXERS[language].tokens(code))
+            self.assertEqual("".join(text for _, text in tokens), code)
+            self.assertIn("keyword" if language != "json" else "string",
+                          [token_type for token_type, _ in tokens])
+
+    def test_python(self):
+        tokens = list(LEXERS["py"].tokens("if x == 'a#b': # c\n  pass"))
+        self.assertEqual(tokens, [
+            ("keyword", "if"), (None, " x == "), ("string", "'a#b'"),
+            (None, ": "), ("comment", "# c"), (None, "\n  "),
+            ("keyword", "pass"),
+        ])
+
+    def test_unclosed(self):
+        # stays linear on pathological input
+        code = '"""' + '"' * 20000
+        tokens = list(LEXERS["python"].tokens(code))
+        self.assertEqual("".join(text for _, text in tokens), code)
+
+    def test_fence_language(self):
+        self.assertEqual(fence_language("Python  {.numbered}"), "python")
+        self.assertIsNone(fence_language("   "))
+
+
+class TestHighlighter(unittest.TestCase):
+    def test_memoized(self):
+        highlighter = Highlighter(max_entries=2)
+        first = highlighter.to_html_node("x = 1", "python")
+        second = highlighter.to_html_node("x = 1", "python")
+        self.assertEqual(first, second)
+        self.assertEqual((highlighter.hits, highlighter.misses), (1, 1))
+
+        # what's kept is the markup itself
+        self.assertEqual(list(highlighter.cache.values()),
+                         ['x = <span class="hl-number">1</span>'])
+
+        highlighter.markup("python", "y = 2")
+        highlighter.markup("python", "z = 3")
+        self.assertEqual(len(highlighter.cache), 2)
+        highlighter.markup("python", "x = 1")
+        self.assertEqual(highlighter.misses, 4)
+
+    def test_to_html_node(self):
+        highlighter = Highlighter()
+        self.assertEqual(
+            highlighter.to_html_node("a < b", "nope").to_html(),
+            '<code class="language-nope">a &lt; b</code>')
+        self.assertEqual(highlighter.to_html_node("a", None).to_html(),
+                         '<code>a</code>')
+        self.assertEqual(
+            highlighter.to_html_node("return '<b>'", "python").to_html(),
+            '<code class="language-python">'
+            '<span class="hl-keyword">return</span> '
+            "<span class=\"hl-string\">'&lt;b&gt;'</span></code>")
+        self.assertEqual(highlighter.to_html_node("", "python").to_html(),
+                         '<code class="language-python"></code>')
+
+    def test_register(self):
+        class Shouting(Lexer):
+            def tokens(self, code):
+                yield "keyword", code.upper()
+
+        register(Shouting(), "Shout")
+        try:
+            self.assertEqual(
+                Highlighter().to_html_node("hi", "shout").to_html(),
+                '<code class="language-shout">'
+                '<span class="hl-keyword">HI</span></code>')
+        finally:
+            del LEXERS["shout"]
+
+
+if __name__ == "__main__":
+    unittest.main()
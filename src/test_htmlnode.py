@@ -3,7 +3,10 @@ import unittest
 from htmlnode import (
     HTMLNode,
     LeafNode,
+    Minifier,
     ParentNode,
+    escape_attr,
+    escape_text,
 )
 
 
@@ -113,3 +116,87 @@ class TestParentNode(unittest.TestCase):
         for args, expected in tests:
             parent = ParentNode(*args)
             self.assertEqual(expected, parent.to_html())
+
+
+class TestMinifier(unittest.TestCase):
+    def test_text(self):
+        minifier = Minifier()
+        self.assertEqual(minifier.text("a  b\n\t c "), "a b c ")
+        self.assertEqual(minifier.bytes_saved, 3)
+
+    def test_markup(self):
+        minifier = Minifier()
+        html = ("<html>\n    <head>\n        <title> {{ Title }} </title>\n"
+                "    </head>\n    <body>\n        {{ Content }}\n"
+                "    </body>\n</html>\n")
+        expected = ("<html><head><title> {{ Title }} </title></head>"
+                    "<body> {{ Content }} </body></html>")
+        self.assertEqual(minifier.markup(html), expected)
+        self.assertEqual(minifier.bytes_saved, len(html) - len(expected))
+
+    def test_markup_inline(self):
+        # line breaks between text and a tag still separate words
+        html = "<p>Made by\n  <a href='/'>me</a>\n  and friends</p>"
+        self.assertEqual(Minifier().markup(html),
+                         "<p>Made by <a href='/'>me</a> and friends</p>")
+
+    def test_markup_preformatted(self):
+        minifier = Minifier()
+        html = "<div>\n  <PRE>\n  a  b\n</PRE>\n  <p>c   d</p>\n</div>"
+        self.assertEqual(minifier.markup(html),
+                         "<div><PRE>\n  a  b\n</PRE><p>c d</p></div>")
+
+    def test_to_html_minified(self):
+        minifier = Minifier()
+        node = ParentNode('div', [
+            ParentNode('p', [
+                LeafNode(None, "some\ntext   here "),
+                LeafNode('code', "x  =  1"),
+            ]),
+            ParentNode('pre', [LeafNode('code', "def f():\n    return  1")]),
+        ])
+        self.assertEqual(node.to_html(minifier), (
+            "<div><p>some text here <code>x = 1</code></p>"
+            "<pre><code>def f():\n    return  1</code></pre></div>"
+        ))
+        self.assertEqual(minifier.bytes_saved, 4)
+        # and nothing changes without a minifier
+        self.assertIn("some\ntext   here ", node.to_html())
+
+
+class TestEscape(unittest.TestCase):
+    def test_escape_text(self):
+        tests = [
+            ("plain text", "plain text"),
+            ("", ""),
+            ('a < b && c > "d"', 'a &lt; b &amp;&amp; c &gt; "d"'),
+            ("&amp;", "&amp;amp;"),
+        ]
+        for text, expected in tests:
+            self.assertEqual(escape_text(text), expected)
+
+    def test_escape_text_fast_path(self):
+        text = "nothing special"
+        self.assertIs(escape_text(text), text)
+        self.assertIs(escape_attr(text), text)
+
+    def test_escape_attr(self):
+        self.assertEqual(escape_attr('/a?b=1&c="<x>"'),
+                         '/a?b=1&amp;c=&quot;&lt;x&gt;&quot;')
+
+    def test_to_html_escapes(self):
+        node = ParentNode('p', [
+            LeafNode(None, "1 < 2 & 3"),
+            LeafNode('a', "<b>", {"href": '/q?a=1&b="2"'}),
+        ])
+        self.assertEqual(node.to_html(), (
+            '<p>1 &lt; 2 &amp; 3'
+            '<a href="/q?a=1&amp;b=&quot;2&quot;">&lt;b&gt;</a></p>'
+        ))
+
+    def test_to_html_escapes_code(self):
+        code = "if a < b:\n    print('&')\n"
+        node = ParentNode('pre', [LeafNode('code', code)])
+        self.assertEqual(node.to_html(Minifier()), (
+            "<pre><code>if a &lt; b:\n    print('&amp;')\n</code></pre>"
+        ))
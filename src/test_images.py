@@ -0,0 +1,181 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from images import (
+    Image,
+    ImageCache,
+    ImageInfo,
+    Variant,
+    annotate,
+    image_size,
+    process_images,
+)
+import htmlnode as hn
+
+
+def png_header(width: int, height: int) -> bytes:
+    return (b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' +
+            struct.pack('>II', width, height) + b'\x08\x02\x00\x00\x00')
+
+
+def jpeg_header(width: int, height: int) -> bytes:
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+    sof0 = (b'\xff\xc0' + struct.pack('>H', 17) + b'\x08' +
+            struct.pack('>HH', height, width) + b'\x03' + b'\x00' * 9)
+    return b'\xff\xd8' + app0 + sof0
+
+
+class TestImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_image_size(self):
+        tests = [
+            ("a.png", png_header(640, 480), (640, 480)),
+            ("b.gif", b'GIF89a' + struct.pack('<HH', 32, 16) + b'\x00' * 8,
+             (32, 16)),
+            ("c.jpg", jpeg_header(1024, 768), (1024, 768)),
+            ("d.txt", b'not an image at all', None),
+            # truncated JPEGs, in a segment header and in the frame header
+            ("e.jpg", b'\xff\xd8\xff\xe0\x00', None),
+            ("f.jpg", jpeg_header(1024, 768)[:-12], None),
+            ("g.jpg", b'\xff\xd8\xff\xe0\x00\x00', None),
+        ]
+        for name, data, expected in tests:
+            self.assertEqual(image_size(self.write(name, data)), expected)
+
+
+class TestImageInfo(unittest.TestCase):
+    def test_props_no_variants(self):
+        info = ImageInfo(640, 480, [])
+        self.assertEqual(info.props("/images/a.png"),
+                         {"width": "640", "height": "480"})
+
+    def test_props_variants(self):
+        info = ImageInfo(1200, 600, [Variant(480, 240, "a.k-480w.png")])
+        props = info.props("/images/a.png", sizes="100vw")
+        self.assertEqual(props["srcset"],
+                         "/images/a.k-480w.png 480w, /images/a.png 1200w")
+        self.assertEqual(props["sizes"], "100vw")
+
+
+class TestAnnotate(unittest.TestCase):
+    def test_annotate(self):
+        img = hn.LeafNode('img', "", {"src": "/images/a.png", "alt": "a"})
+        other = hn.LeafNode('img', "", {"src": "/images/b.png", "alt": "b"})
+        tree = hn.ParentNode('div', children=[
+            hn.ParentNode('p', children=[img, other]),
+        ])
+        annotate(tree, {"/images/a.png": ImageInfo(640, 480, [])})
+        self.assertEqual(img.props, {"src": "/images/a.png", "alt": "a",
+                                     "width": "640", "height": "480"})
+        self.assertEqual(other.props, {"src": "/images/b.png", "alt": "b"})
+
+
+class TestImageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.path = os.path.join(self.static, "images", "a.png")
+        with open(self.path, 'wb') as f:
+            f.write(png_header(320, 200))
+        with open(os.path.join(self.static, "index.css"), 'w') as f:
+            f.write("body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @unittest.skipIf(Image is not None, "Pillow would try to decode")
+    def test_process_images(self):
+        cache = ImageCache(self.cache_dir)
+        manifest = process_images(self.static, self.public, cache)
+        self.assertEqual(list(manifest), ["/images/a.png"])
+        self.assertEqual(manifest["/images/a.png"].width, 320)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        # a fresh cache picks up the persisted index and only stats
+        cache = ImageCache(self.cache_dir)
+        manifest = process_images(self.static, self.public, cache)
+        self.assertEqual(manifest["/images/a.png"].height, 200)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+        # targeted builds take the index's word for it
+        indexed = ImageCache(self.cache_dir).indexed(self.static)
+        self.assertEqual(list(indexed), ["/images/a.png"])
+        self.assertEqual(indexed["/images/a.png"].width, 320)
+        self.assertEqual(ImageCache(self.cache_dir).indexed(self.public), {})
+
+    @unittest.skipIf(Image is not None, "Pillow would try to decode")
+    def test_process_changed_source(self):
+        cache = ImageCache(self.cache_dir)
+        cache.process([self.path])
+        with open(self.path, 'wb') as f:
+            f.write(png_header(64, 64) + b'\x00')
+        infos = cache.process([self.path])
+        self.assertEqual(infos[self.path].width, 64)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    @unittest.skipIf(Image is not None, "Pillow would try to decode")
+    def test_process_stamps(self):
+        cache = ImageCache(self.cache_dir)
+        cache.process([self.path])
+        stat = os.stat(self.path)
+        # a plan's size and mtime are taken in place of a stat
+        cache.process([self.path],
+                      {self.path: (stat.st_size, stat.st_mtime_ns)})
+        cache.process([self.path], {self.path: (stat.st_size, 0)})
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_process_variants(self):
+        Image.new('RGB', (1000, 500)).save(self.path)
+        cache = ImageCache(self.cache_dir, widths=(200, 2000))
+        manifest = process_images(self.static, self.public, cache)
+        variants = manifest["/images/a.png"].variants
+        self.assertEqual([(v.width, v.height) for v in variants],
+                         [(200, 100)])
+        published = os.path.join(self.public, "images", variants[0].filename)
+        with Image.open(published) as img:
+            self.assertEqual(img.size, (200, 100))
+
+        # a variant pruned from the cache is made again, not looked for
+        os.remove(os.path.join(self.cache_dir, variants[0].filename))
+        self.assertEqual(ImageCache(self.cache_dir).indexed(self.static), {})
+        cache = ImageCache(self.cache_dir, widths=(200, 2000))
+        process_images(self.static, os.path.join(self.tmp.name, "public2"),
+                       cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertTrue(os.path.exists(
+            os.path.join(self.cache_dir, variants[0].filename)))
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_process_truncated(self):
+        Image.new('RGB', (1000, 500)).save(self.path)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        with open(self.path, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        cache = ImageCache(self.cache_dir, widths=(200,))
+        manifest = process_images(self.static, self.public, cache)
+        # the header still gives the size, but there's nothing to resize
+        self.assertEqual(manifest["/images/a.png"].width, 1000)
+        self.assertEqual(manifest["/images/a.png"].variants, [])
+        self.assertEqual(os.listdir(self.cache_dir), ["index.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+import io
+import os
+import tempfile
+import unittest
+
+import log
+from blocks import Outline, markdown_to_html_node
+from generate import generate_pages
+from links import IMAGE, LINK, LinkGraph, LinkIndex, PageLinks, url_for
+from outputs import MemoryOutput
+
+
+MARKDOWN = """# Title
+
+See [the recipe](/recipes/stir-fry.html) and ![a map](/images/map.png).
+
+```
+[not a link](/nowhere.html)
+```
+
+## Notes
+
+- [back up](#title) or [out](https://example.com)"""
+
+
+def collect(markdown: str, url: str = "/index.html",
+            line_offset: int = 0) -> PageLinks:
+    outline = Outline()
+    markdown_to_html_node(markdown, outline=outline)
+    page = PageLinks("index.md", url)
+    page.collect(markdown, outline, line_offset)
+    return page
+
+
+def setUpModule():
+    log.configure(stream=io.StringIO())
+
+
+def tearDownModule():
+    log.configure()
+
+
+class TestPageLinks(unittest.TestCase):
+    def test_url_for(self):
+        self.assertEqual(url_for(os.path.join("public", "a", "b.html"),
+                                 "public"), "/a/b.html")
+
+    def test_collect(self):
+        page = collect(MARKDOWN, line_offset=2)
+        self.assertEqual(page.anchors, ["title", "notes"])
+        self.assertEqual(
+            [(link.kind, link.url, link.line, link.column)
+             for link in page.links],
+            [
+                (LINK, "/recipes/stir-fry.html", 5, 5),
+                (IMAGE, "/images/map.png", 5, 46),
+                (LINK, "#title", 13, 3),
+                (LINK, "https://example.com", 13, 24),
+            ])
+
+
+    def test_collect_definitions(self):
+        page = collect("See [the docs][docs].\n\n```\n[x]: /nowhere.html\n"
+                       "```\n\n[docs]: /docs.html")
+        self.assertEqual(
+            [(link.kind, link.url, link.line, link.column)
+             for link in page.links],
+            [(LINK, "/docs.html", 7, 9)])
+
+class TestLinkIndex(unittest.TestCase):
+    def test_check(self):
+        index = LinkIndex()
+        index.add_page("/index.html", ["title"])
+        index.add_page("/recipes/index.html", ["intro"])
+        index.add_page("/recipes/stir-fry.html", [])
+        index.add_file("/images/map.png")
+        index.add_file("/tags/index.html")
+
+        markdown = "\n".join([
+            "# Links",
+            "[a](/recipes/stir-fry.html) [b](stir-fry.html#oops)",
+            "[c](/recipes/) [d](/recipes) [e](/recipes/#intro)",
+            "[f](../index.html#title) [g](#intro) [h](/missing.html)",
+            "![i](/images/map.png) ![j](/images/nope.png)",
+            "[k](/tags/#anything) [l](mailto:me@example.com)",
+            "[m](/recipes/stir%2Dfry.html?print=1)",
+        ])
+        page = collect(markdown, "/recipes/index.html")
+        report = index.check([page])
+        self.assertEqual(report.pages, 1)
+        self.assertEqual(report.checked, 12)
+        self.assertEqual(report.external, 1)
+        self.assertEqual([str(link) for link in report.broken], [
+            "index.md:2:29: missing anchor in link stir-fry.html#oops",
+            "index.md:4:38: missing link /missing.html",
+            "index.md:5:23: missing image /images/nope.png",
+        ])
+        self.assertEqual(report.to_dict()["broken_count"], 3)
+
+
+class TestCheckLinks(unittest.TestCase):
+    def test_generate_pages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, "content")
+            public = os.path.join(tmp, "public")
+            template = os.path.join(tmp, "template.html")
+            for rel_path, data in (
+                ("template.html", "{{ Content }}"),
+                (os.path.join("content", "index.md"),
+                 "# Home\n\n[post](/post/) [gone](/gone.html#x)"),
+                (os.path.join("content", "post", "index.md"),
+                 "# Post\n\n## Part\n\n[home](/#home) [part](#part)"),
+            ):
+                path = os.path.join(tmp, rel_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w') as f:
+                    f.write(data)
+
+            for jobs in (1, 2):
+                result = generate_pages(content, public, template,
+                                        check_links=True, jobs=jobs)
+                report = result.link_report
+                self.assertEqual((report.pages, report.checked), (2, 4))
+                self.assertEqual([link.url for link in report.broken],
+                                 ["/gone.html#x"])
+            self.assertIsNone(
+                generate_pages(content, public, template).link_report)
+
+
+
+class TestLinkGraph(unittest.TestCase):
+    def test_next_pages(self):
+        graph = LinkGraph()
+        pages = {
+            "/index.html": "[a](/a.html) [b](b.html#top) ![img](/b.html) "
+                           "[self](#x) [out](https://example.com) "
+                           "[docs](/docs/) [docs again](/docs/index.html)",
+            "/a.html": "[b](/b.html) [home](/)",
+            "/docs/index.html": "[b](../b.html?v=1)",
+            "/b.html": "[gone](/gone.html) [home](index.html)",
+            "/c.html": "[b](/b.html) [majesty](/majesty)",
+            "/majesty/index.html": "[b](/b.html)",
+        }
+        for url, markdown in pages.items():
+            graph.add_page(collect(markdown, url))
+
+        # b is linked to from five pages, so it outranks a link above it
+        self.assertEqual(graph.pages_in_degree(), {
+            "/index.html": 2, "/a.html": 1, "/b.html": 5,
+            "/docs/index.html": 1, "/majesty/index.html": 1})
+        self.assertEqual(graph.next_pages("/index.html", 3),
+                         ["/b.html", "/a.html", "/docs/"])
+        self.assertEqual(graph.next_pages("/index.html", 1), ["/b.html"])
+        self.assertEqual(graph.next_pages("/b.html", 3), ["/"])
+        # hints go straight to the page, not through the server's redirect
+        # from a directory to its index
+        self.assertEqual(graph.next_pages("/c.html", 3),
+                         ["/b.html", "/majesty/"])
+        self.assertEqual(graph.next_pages("/unknown.html", 3), [])
+        self.assertEqual(graph.hints("/docs/index.html", 3),
+                         '<link rel="prefetch" href="/b.html?v=1">')
+
+    def test_generate_pages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, "content")
+            public = os.path.join(tmp, "public")
+            template = os.path.join(tmp, "template.html")
+            for rel_path, data in (
+                ("template.html", "<head></head>{{ Content }}"),
+                (os.path.join("content", "index.md"),
+                 "# Home\n\n[one](/post/one.html) [two](/post/two.html)"),
+                (os.path.join("content", "post", "one.md"),
+                 "# One\n\n[two](two.html)"),
+                (os.path.join("content", "post", "two.md"), "# Two"),
+            ):
+                path = os.path.join(tmp, rel_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w') as f:
+                    f.write(data)
+
+            for jobs in (1, 2):
+                output = MemoryOutput(public)
+                generate_pages(content, public, template, jobs=jobs,
+                               listings=True, prefetch=1, output=output)
+                self.assertTrue(output.files["index.html"].startswith(
+                    b'<head><link rel="prefetch" href="/post/one.html">'
+                    b'</head>'))
+                self.assertTrue(output.files["post/two.html"].startswith(
+                    b"<head></head>"))
+                self.assertTrue(output.files["post/page-1.html"].startswith(
+                    b"<head></head>"))
+
+            output = MemoryOutput(public)
+            generate_pages(content, public, template, output=output)
+            self.assertTrue(output.files["index.html"].startswith(
+                b"<head></head>"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import os
+import tempfile
+import unittest
+
+from listing import (
+    Listings,
+    load_state,
+)
+
+
+class TestListings(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_posts(self, listings: Listings, count: int, start: int = 0):
+        for i in range(start, start + count):
+            dest = os.path.join(self.root, "posts", f"post-{i}.html")
+            listings.add(dest, f"Post {i}", ["food"], float(i))
+
+    def test_page_size_invalid(self):
+        with self.assertRaises(ValueError):
+            Listings(self.root, page_size=0)
+
+    def test_pages(self):
+        listings = Listings(self.root, page_size=2)
+        self.add_posts(listings, 3)
+        paths = [page.path for page in listings.pages()]
+        self.assertEqual(paths, [
+            os.path.join("posts", "page-1.html"),
+            os.path.join("posts", "page-2.html"),
+            os.path.join("posts", "index.html"),
+            os.path.join("tags", "food", "page-1.html"),
+            os.path.join("tags", "food", "page-2.html"),
+            os.path.join("tags", "food", "index.html"),
+        ])
+
+    def test_tag_collisions(self):
+        listings = Listings(self.root)
+        listings.add(os.path.join(self.root, "tags", "vegan", "faq.html"),
+                     "FAQ", [], 0.0)
+        for i, tag in enumerate(["C++", "C", "日本", "Vegan", "vegan"]):
+            listings.add(os.path.join(self.root, "posts", f"{i}.html"),
+                         f"Post {i}", [tag], float(i))
+        self.assertEqual(listings.tag_dirs(), {
+            "C": os.path.join("tags", "c"),
+            "C++": os.path.join("tags", "c-1"),
+            "Vegan": os.path.join("tags", "vegan-1"),
+            "vegan": os.path.join("tags", "vegan-2"),
+            "日本": os.path.join("tags", "tag"),
+        })
+        paths = [page.path for page in listings.pages()]
+        self.assertEqual(len(paths), len(set(paths)))
+
+    def test_content_collision(self):
+        listings = Listings(self.root)
+        self.add_posts(listings, 1)
+        listings.add(os.path.join(self.root, "posts", "page-1.html"),
+                     "Page one", [], 0.0)
+        with self.assertRaises(ValueError) as error:
+            listings.pages()
+        self.assertIn(os.path.join("posts", "page-1.html"),
+                      str(error.exception))
+
+    def test_pages_oldest_first(self):
+        listings = Listings(self.root, page_size=2)
+        self.add_posts(listings, 3)
+        first, second = listings.pages()[:2]
+        self.assertEqual([e.title for e in first.entries],
+                         ["Post 0", "Post 1"])
+        self.assertEqual(first.older, None)
+        self.assertEqual(first.newer, "/posts/page-2.html")
+        self.assertEqual([e.title for e in second.entries], ["Post 2"])
+        self.assertEqual(second.older, "/posts/page-1.html")
+        self.assertEqual(second.newer, None)
+
+    def test_hand_written_index(self):
+        listings = Listings(self.root)
+        listings.add(os.path.join(self.root, "posts", "index.html"),
+                     "Posts", [], 0.0)
+        self.add_posts(listings, 1)
+        paths = [page.path for page in listings.pages()]
+        self.assertNotIn(os.path.join("posts", "index.html"), paths)
+        self.assertEqual(len(listings.pages()[0].entries), 1)
+
+    def test_to_html_node(self):
+        listings = Listings(self.root, page_size=2)
+        self.add_posts(listings, 3)
+        html = listings.pages()[1].to_html_node().to_html()
+        self.assertEqual(html, (
+            '<div><h1>posts</h1>'
+            '<ul><li><a href="/posts/post-2.html">Post 2</a></li></ul>'
+            '<p><a href="/posts/page-1.html">Older</a></p></div>'
+        ))
+
+    def write_stale(self, listings: Listings) -> list[str]:
+        stale = listings.stale_pages()
+        for page in stale:
+            path = os.path.join(self.root, page.path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write("rendered")
+        return [page.path for page in stale]
+
+    def state_path(self) -> str:
+        return os.path.join(self.root, ".cache", "listings.json")
+
+    def test_stale_pages_incremental(self):
+        listings = Listings(self.root, page_size=2,
+                            state_path=self.state_path())
+        self.add_posts(listings, 3)
+        self.assertEqual(len(self.write_stale(listings)), 6)
+        self.assertEqual(len(load_state(self.state_path(), self.root)), 6)
+        # state left for another output doesn't count for this one
+        self.assertEqual(load_state(self.state_path(), "elsewhere"), {})
+
+        # nothing changed, nothing to render
+        self.assertEqual(self.write_stale(listings), [])
+
+        # a new post only touches the newest page and the index mirroring it
+        self.add_posts(listings, 1, start=3)
+        self.assertEqual(self.write_stale(listings), [
+            os.path.join("posts", "page-2.html"),
+            os.path.join("posts", "index.html"),
+            os.path.join("tags", "food", "page-2.html"),
+            os.path.join("tags", "food", "index.html"),
+        ])
+
+    def test_stale_pages_missing_output(self):
+        listings = Listings(self.root, page_size=2,
+                            state_path=self.state_path())
+        self.add_posts(listings, 1)
+        self.write_stale(listings)
+        os.remove(os.path.join(self.root, "posts", "page-1.html"))
+        self.assertEqual(self.write_stale(listings),
+                         [os.path.join("posts", "page-1.html")])
+
+    def test_stale_pages_removed(self):
+        listings = Listings(self.root, state_path=self.state_path())
+        self.add_posts(listings, 1)
+        self.write_stale(listings)
+        listings = Listings(self.root, state_path=self.state_path())
+        listings.add(os.path.join(self.root, "posts", "post-0.html"),
+                     "Post 0", [], 0.0)
+        self.assertEqual(self.write_stale(listings), [])
+        # the tag's pages went with its last post
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, "tags", "food", "page-1.html")))
+
+    def test_stale_pages_without_state(self):
+        listings = Listings(self.root)
+        self.add_posts(listings, 1)
+        self.write_stale(listings)
+        self.assertEqual(len(self.write_stale(listings)), 4)
+
+    def test_stale_pages_salt(self):
+        listings = Listings(self.root, state_path=self.state_path())
+        self.add_posts(listings, 1)
+        self.write_stale(listings)
+        self.assertEqual(len(listings.stale_pages(salt="new template")), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import log
+from generate import generate_pages
+from outputs import MemoryOutput
+
+
+class TestLogger(unittest.TestCase):
+    def tearDown(self):
+        log.configure()
+
+    def test_levels_and_buffering(self):
+        stream = io.StringIO()
+        log.configure(log.DEBUG, stream=stream)
+        log.debug("copy", "Copying {src}", src="a.css")
+        # debug lines wait for something more important, or a flush
+        self.assertEqual(stream.getvalue(), "")
+        log.info("clear", "Removing {root}", root="public")
+        self.assertEqual(stream.getvalue(),
+                         "Copying a.css\nRemoving public\n")
+
+        stream = io.StringIO()
+        log.configure(log.WARNING, stream=stream)
+        log.debug("copy", "{missing}")
+        log.info("clear", "{missing}")
+        log.error("failed", "{failed} failed", failed=2)
+        self.assertEqual(stream.getvalue(), "2 failed\n")
+        self.assertFalse(log.enabled(log.INFO))
+
+    def test_json(self):
+        stream = io.StringIO()
+        log.configure(log.DEBUG, log.JSON, stream)
+        log.debug("page", "unused {message}", message="hi", line=3)
+        log.flush()
+        event = json.loads(stream.getvalue())
+        self.assertEqual(event["level"], "debug")
+        self.assertEqual(event["event"], "page")
+        self.assertEqual((event["message"], event["line"]), ("hi", 3))
+
+    def test_progress(self):
+        stream = io.StringIO()
+        logger = log.Logger(progress_stream=stream)
+        progress = logger.progress("pages", 3)
+        for _ in range(3):
+            progress.update()
+        # the last update is always drawn
+        self.assertRegex(stream.getvalue(),
+                         r"pages 3/3, \d+/s, ETA 0:00$")
+        progress.finish()
+        self.assertTrue(stream.getvalue().endswith("\r\033[K"))
+
+        progress = log.Logger().progress("pages", 2)
+        progress.update(2)
+        self.assertEqual(progress.done, 2)
+
+    def test_format_duration(self):
+        tests = [(0, "0:00"), (59.6, "1:00"), (754, "12:34"),
+                 (3600 * 5 + 61, "5:01:01")]
+        for seconds, expected in tests:
+            self.assertEqual(log.format_duration(seconds), expected)
+
+    def test_generate_pages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            template = os.path.join(tmp, "template.html")
+            content = os.path.join(tmp, "content")
+            os.makedirs(content)
+            with open(template, 'w') as f:
+                f.write("{{ Content }}")
+            for name in ("a.md", "b.md"):
+                with open(os.path.join(content, name), 'w') as f:
+                    f.write("# Page")
+            public = os.path.join(tmp, "public")
+
+            stream = io.StringIO()
+            log.configure(stream=stream)
+            generate_pages(content, public, template,
+                           output=MemoryOutput(public))
+            self.assertRegex(stream.getvalue(),
+                             r"^Generated 2 pages in [\d.]+s\n$")
+
+            stream = io.StringIO()
+            log.configure(log.DEBUG, log.JSON, stream)
+            generate_pages(content, public, template,
+                           output=MemoryOutput(public))
+            log.flush()
+            events = [json.loads(line)
+                      for line in stream.getvalue().splitlines()]
+            self.assertEqual([event["event"] for event in events],
+                             ["page", "page", "pages"])
+            self.assertEqual(events[0]["dest"],
+                             os.path.join(public, "a.html"))
+
+
+if __name__ == "__main__":
+    unittest.main()
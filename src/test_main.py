@@ -0,0 +1,83 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import log
+import main
+from outputs import DirectoryOutput
+
+
+class TestBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        for rel_path, data in (
+            ("template.html", "<title>{{ Title }}</title>{{ Content }}"),
+            (os.path.join("static", "index.css"), "body { margin: 0; }"),
+            (os.path.join("content", "index.md"), "# Home"),
+            (os.path.join("content", "recipes", "soup.md"), "# Soup"),
+            (os.path.join("content", "recipes", "stew.md"), "# Stew"),
+        ):
+            os.makedirs(os.path.dirname(rel_path) or ".", exist_ok=True)
+            with open(rel_path, 'w') as f:
+                f.write(data)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+        log.configure()
+
+    def build(self, *argv: str) -> list[str]:
+        """Build the site, returning the listing pages it rendered
+        """
+        stream = io.StringIO()
+        log.configure(log.DEBUG, stream=stream)
+        args = main.parse_args(["--no-images", *argv])
+        public = os.path.abspath(args.output)
+        self.assertEqual(main.build_to(args, DirectoryOutput(public)), 0)
+        log.flush()
+        return [line.split()[-1] for line in stream.getvalue().splitlines()
+                if line.startswith("Generating listing")]
+
+    def test_incremental_listings(self):
+        page = os.path.join(os.path.abspath("public"), "recipes",
+                            "page-1.html")
+        self.assertIn(page, self.build("--listings"))
+        with open(page) as f:
+            first = f.read()
+
+        # an unchanged site renders no listings, and keeps the old ones
+        self.assertEqual(self.build("--listings"), [])
+        with open(page) as f:
+            self.assertEqual(f.read(), first)
+        self.assertTrue(os.path.exists(os.path.join("public", "index.css")))
+
+        # a new post re-renders its directory's listing
+        with open(os.path.join("content", "recipes", "pie.md"), 'w') as f:
+            f.write("# Pie")
+        self.assertIn(page, self.build("--listings"))
+        with open(page) as f:
+            self.assertIn("Pie", f.read())
+
+        # as does a build that didn't keep them
+        self.build()
+        self.assertFalse(os.path.exists(page))
+        self.assertIn(page, self.build("--listings"))
+
+    def test_targeted_archive(self):
+        # an archive is replaced whole, so it'd only hold the targeted pages
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit):
+                main.parse_args(["--output", "site.tar.gz", "--pages",
+                                 os.path.join("content", "index.md")])
+        self.assertIn("archive --output", stderr.getvalue())
+        args = main.parse_args(["--pages",
+                                os.path.join("content", "index.md")])
+        self.assertEqual(args.output, "public")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import log
+import metrics
+from astcache import ASTCache
+from generate import generate_pages
+from main import copy
+from outputs import MemoryOutput
+
+
+def setUpModule():
+    log.configure(stream=io.StringIO())
+
+
+def tearDownModule():
+    log.configure()
+
+
+class TestMetrics(unittest.TestCase):
+    def tearDown(self):
+        metrics.configure()
+
+    def test_disabled(self):
+        self.assertFalse(metrics.enabled())
+        metrics.inc("pages_rendered_total")
+        metrics.observe("page_render_seconds", 0.5)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "build.prom")
+            metrics.write(path)
+            self.assertFalse(os.path.exists(path))
+
+    def test_prometheus(self):
+        registry = metrics.configure(True)
+        metrics.inc("pages_rendered_total", 3)
+        metrics.inc("cache_hits_total", 3, "ast")
+        metrics.inc("cache_misses_total", 1, "ast")
+        metrics.inc("cache_misses_total", 2, "image")
+        for seconds in (0.001, 0.003, 20):
+            metrics.observe("page_render_seconds", seconds)
+        text = registry.to_prometheus()
+        lines = text.splitlines()
+        self.assertIn("# TYPE bdssg_pages_rendered_total counter", lines)
+        self.assertIn("bdssg_pages_rendered_total 3", lines)
+        self.assertIn("bdssg_page_errors_total 0", lines)
+        self.assertIn('bdssg_cache_hit_ratio{cache="ast"} 0.75', lines)
+        self.assertIn('bdssg_cache_hit_ratio{cache="image"} 0.0', lines)
+        self.assertIn('bdssg_page_render_seconds_bucket{le="0.001"} 1',
+                      lines)
+        self.assertIn('bdssg_page_render_seconds_bucket{le="0.005"} 2',
+                      lines)
+        self.assertIn('bdssg_page_render_seconds_bucket{le="10.0"} 2',
+                      lines)
+        self.assertIn('bdssg_page_render_seconds_bucket{le="+Inf"} 3',
+                      lines)
+        self.assertIn("bdssg_page_render_seconds_count 3", lines)
+        self.assertTrue(text.endswith("\n"))
+
+        summary = registry.to_dict()
+        self.assertEqual(summary["cache_misses_total"],
+                         {"ast": 1, "image": 2})
+        self.assertEqual(summary["page_render_seconds"]["buckets"]["+Inf"],
+                         3)
+
+    def test_write(self):
+        metrics.configure(True)
+        metrics.set_gauge("build_status", 1)
+        with tempfile.TemporaryDirectory() as tmp:
+            prom_path = os.path.join(tmp, "build.prom")
+            json_path = os.path.join(tmp, "build.json")
+            metrics.write(prom_path, json_path)
+            self.assertEqual(sorted(os.listdir(tmp)),
+                             ["build.json", "build.prom"])
+            with open(prom_path) as f:
+                self.assertIn("bdssg_build_status 1\n", f.read())
+            with open(json_path) as f:
+                self.assertEqual(json.load(f)["build_status"], 1)
+
+    def test_build(self):
+        registry = metrics.configure(True)
+        with tempfile.TemporaryDirectory() as tmp:
+            for rel_path, data in (
+                ("template.html", "<title>{{ Title }}</title>{{ Content }}"),
+                (os.path.join("static", "site.css"), "body { margin: 0; }"),
+                (os.path.join("content", "index.md"),
+                 "# Home\n\n[gone](/gone.html)"),
+                (os.path.join("content", "bad.md"), "no title"),
+            ):
+                path = os.path.join(tmp, rel_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w') as f:
+                    f.write(data)
+            public = os.path.join(tmp, "public")
+            output = metrics.MeteredOutput(MemoryOutput(public))
+            copy(os.path.join(tmp, "static"), public, output=output)
+            ast_cache = ASTCache(os.path.join(tmp, "ast"))
+            for _ in range(2):
+                generate_pages(os.path.join(tmp, "content"), public,
+                               os.path.join(tmp, "template.html"),
+                               output=output, keep_going=True,
+                               ast_cache=ast_cache, check_links=True)
+            summary = registry.to_dict()
+            self.assertEqual(summary["files_copied_total"], 1)
+            self.assertEqual(summary["pages_rendered_total"], 2)
+            self.assertEqual(summary["page_errors_total"], 2)
+            self.assertEqual(summary["broken_links_total"], 2)
+            self.assertEqual(summary["page_render_seconds"]["count"], 4)
+            self.assertEqual(summary["cache_hits_total"], {"ast": 1})
+            self.assertEqual(summary["cache_misses_total"], {"ast": 1})
+            sources = 19 + 2 * (len("# Home\n\n[gone](/gone.html)") +
+                                len("no title"))
+            self.assertEqual(summary["bytes_read_total"], sources)
+            written = sum(len(data) for data in output.output.files.values())
+            self.assertEqual(summary["bytes_written_total"],
+                             written + len(output.output.files["index.html"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
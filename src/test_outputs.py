@@ -0,0 +1,159 @@
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+import log
+from generate import generate_pages
+from main import copy
+from outputs import (
+    ArchiveOutput,
+    DirectoryOutput,
+    MemoryOutput,
+    open_output,
+)
+from walk import plan_pages
+
+
+def setUpModule():
+    log.configure(stream=io.StringIO())
+
+
+def tearDownModule():
+    log.configure()
+
+
+class TestOutputs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.content = os.path.join(self.tmp.name, "content")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        for rel_path, data in (
+            ("template.html", "<title>{{ Title }}</title>{{ Content }}"),
+            (os.path.join("static", "index.css"), "body {}"),
+            (os.path.join("content", "index.md"), "# Home"),
+            (os.path.join("content", "post", "first.md"), "# First"),
+        ):
+            path = os.path.join(self.tmp.name, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(data)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, output, jobs: int = 1):
+        with output:
+            copy(self.static, output.root, output=output)
+            result = generate_pages(self.content, output.root, self.template,
+                                    listings=True, jobs=jobs, output=output)
+        self.assertEqual(result.pages, 2)
+
+    def assertSite(self, files: dict[str, bytes]):
+        self.assertEqual(files["index.html"],
+                         b'<title>Home</title><div><h1 id="home">Home</h1>'
+                         b'</div>')
+        self.assertIn(b"First", files["post/first.html"])
+        self.assertIn(b"/post/first.html", files["post/index.html"])
+        self.assertEqual(files["index.css"], b"body {}")
+
+    def test_open_output(self):
+        path = os.path.join(self.tmp.name, "site")
+        self.assertIsInstance(open_output(path), DirectoryOutput)
+        with open_output(path + ".tar.gz") as output:
+            self.assertIsInstance(output, ArchiveOutput)
+        with self.assertRaises(ValueError):
+            ArchiveOutput(path + ".rar")
+
+    def test_memory(self):
+        output = MemoryOutput(os.path.join(self.tmp.name, "public"))
+        self.build(output)
+        self.assertSite(output.files)
+        self.assertIn("post", output.dirs)
+        self.assertFalse(os.path.exists(output.root))
+
+        # which listings were written is kept track of outside the output
+        state_path = os.path.join(self.tmp.name, "listings.json")
+        generate_pages(self.content, output.root, self.template,
+                       listings=True, output=output,
+                       listing_state=state_path)
+        self.assertTrue(os.path.exists(state_path))
+        self.assertFalse(any(name.endswith(".json")
+                             for name in output.files))
+
+    def test_clear_keep(self):
+        root = os.path.join(self.tmp.name, "public")
+        for name in ("index.html", "post/page-1.html", "post/a.html",
+                     "old/page-1.html"):
+            path = os.path.join(root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(name)
+        keep = frozenset(["post/page-1.html"])
+        DirectoryOutput(root).clear(keep)
+        self.assertEqual(os.listdir(root), ["post"])
+        self.assertEqual(os.listdir(os.path.join(root, "post")),
+                         ["page-1.html"])
+
+        output = MemoryOutput(root)
+        output.write(os.path.join(root, "post", "page-1.html"), "kept")
+        output.write(os.path.join(root, "index.html"), "gone")
+        output.mkdir(os.path.join(root, "post"))
+        output.mkdir(os.path.join(root, "old"))
+        output.clear(keep)
+        self.assertEqual(output.files, {"post/page-1.html": b"kept"})
+        self.assertEqual(output.dirs, {"post"})
+
+    def test_archives(self):
+        for name in ("site.tar.gz", "site.zip"):
+            for jobs in (1, 2):
+                path = os.path.join(self.tmp.name, name)
+                self.build(ArchiveOutput(path), jobs)
+                if name.endswith(".zip"):
+                    with zipfile.ZipFile(path) as archive:
+                        files = {info.filename: archive.read(info)
+                                 for info in archive.infolist()
+                                 if not info.is_dir()}
+                else:
+                    with tarfile.open(path) as archive:
+                        files = {member.name:
+                                 archive.extractfile(member).read()
+                                 for member in archive.getmembers()
+                                 if member.isfile()}
+                self.assertSite(files)
+                self.assertFalse(os.path.exists(path + ".tmp"))
+
+    def test_aborted_archive(self):
+        path = os.path.join(self.tmp.name, "site.tar")
+        self.build(ArchiveOutput(path))
+        before = os.path.getsize(path)
+        with self.assertRaises(RuntimeError):
+            with ArchiveOutput(path) as output:
+                output.write(os.path.join(path, "index.html"), "half")
+                raise RuntimeError("build failed")
+        self.assertEqual(os.path.getsize(path), before)
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+    def test_targeted_build(self):
+        output = MemoryOutput(os.path.join(self.tmp.name, "public"))
+        plan = plan_pages(self.content, output.root, [
+            os.path.join(self.content, "post", "first.md")])
+        result = generate_pages(self.content, output.root, self.template,
+                                plan=plan, output=output)
+        self.assertEqual(result.pages, 1)
+        self.assertEqual(list(output.files), ["post/first.html"])
+        self.assertEqual(output.dirs, {"post"})
+
+    def test_directory(self):
+        public = os.path.join(self.tmp.name, "public")
+        for jobs in (1, 2):
+            self.build(DirectoryOutput(public), jobs)
+            with open(os.path.join(public, "post", "first.html"), 'rb') as f:
+                self.assertIn(b"First", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import concurrent.futures
+import json
+import os
+import tempfile
+import unittest
+import wsgiref.util
+
+from preview import (
+    STATS_PATH,
+    CachedPage,
+    PageCache,
+    Preview,
+)
+
+
+def request(app: Preview, path: str, headers: dict[str, str] | None = None
+            ) -> tuple[str, dict[str, str], bytes]:
+    environ = {"PATH_INFO": path}
+    wsgiref.util.setup_testing_defaults(environ)
+    environ.update(headers or {})
+    response = {}
+
+    def start_response(status, response_headers):
+        response["status"] = status
+        response["headers"] = dict(response_headers)
+
+    body = b"".join(app(environ, start_response))
+    return response["status"], response["headers"], body
+
+
+class TestPageCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = PageCache(max_bytes=10)
+        cache.put("a", CachedPage((), "", b"aaaa"))
+        cache.put("b", CachedPage((), "", b"bbbb"))
+        cache.get("a")
+        cache.put("c", CachedPage((), "", b"cccc"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.size, 8)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        cache.put("huge", CachedPage((), "", b"x" * 11))
+        self.assertIsNone(cache.get("huge"))
+        self.assertEqual(cache.size, 8)
+
+
+class TestPreview(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.static = os.path.join(self.tmp.name, "static")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        for rel_path, data in (
+            ("template.html", "<title>{{ Title }}</title>{{ Content }}"),
+            (os.path.join("content", "index.md"), "# Home"),
+            (os.path.join("content", "post", "index.md"), "# Post"),
+            (os.path.join("content", "bad.md"), "# Bad\n\n**open"),
+            (os.path.join("static", "index.css"), "body {}"),
+        ):
+            path = os.path.join(self.tmp.name, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(data)
+        self.app = Preview(self.content, self.template, self.static)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stats(self) -> dict:
+        return json.loads(request(self.app, STATS_PATH)[2])
+
+    def test_renders_pages_on_request(self):
+        status, headers, body = request(self.app, "/")
+        self.assertEqual(status, "200 OK")
+        self.assertEqual(body, b'<title>Home</title>'
+                               b'<div><h1 id="home">Home</h1></div>')
+        self.assertEqual(headers["Content-Type"], "text/html; charset=utf-8")
+
+        status, _, body = request(self.app, "/post/index.html")
+        self.assertEqual(status, "200 OK")
+        self.assertIn(b'<h1 id="post">Post</h1>', body)
+
+    def test_routing(self):
+        tests = [
+            ("/post", "301 Moved Permanently"),
+            ("/index.css", "200 OK"),
+            ("/missing.html", "404 Not Found"),
+            ("/../template.html", "404 Not Found"),
+            ("/bad.html", "500 Internal Server Error"),
+        ]
+        for path, expected in tests:
+            self.assertEqual(request(self.app, path)[0], expected, path)
+        self.assertEqual(request(self.app, "/post")[1]["Location"], "/post/")
+        self.assertIn(b"bad.md:3:1", request(self.app, "/bad.html")[2])
+
+    def test_cache_hits_and_invalidation(self):
+        request(self.app, "/")
+        request(self.app, "/")
+        self.assertEqual(self.stats()["hits"], 1)
+        self.assertEqual(self.stats()["misses"], 1)
+
+        # a touched but unchanged source is revalidated by hash
+        path = os.path.join(self.content, "index.md")
+        os.utime(path, ns=(0, 0))
+        request(self.app, "/")
+        self.assertEqual(self.stats()["revalidations"], 1)
+        self.assertEqual(self.stats()["misses"], 1)
+
+        with open(path, 'w') as f:
+            f.write("# Home again")
+        _, _, body = request(self.app, "/")
+        self.assertIn(b"Home again", body)
+        self.assertEqual(self.stats()["misses"], 2)
+
+        with open(self.template, 'w') as f:
+            f.write("<h2>{{ Title }}</h2>")
+        _, _, body = request(self.app, "/")
+        self.assertEqual(body, b"<h2>Home again</h2>")
+        self.assertEqual(self.stats()["misses"], 3)
+        self.assertEqual(self.stats()["hit_rate"], 2 / 5)
+
+    def test_templates(self):
+        templates = os.path.join(self.tmp.name, "templates")
+        os.makedirs(os.path.join(templates, "post"))
+        for rel_path, data in (
+            (os.path.join("templates", "post", "template.html"),
+             '<h2>{{ Title }}</h2>{% include "footer.html" %}'),
+            ("footer.html", "<footer>1</footer>"),
+        ):
+            with open(os.path.join(self.tmp.name, rel_path), 'w') as f:
+                f.write(data)
+        app = Preview(self.content, self.template, self.static,
+                      template_dir=templates)
+        self.assertEqual(request(app, "/post/")[2],
+                         b"<h2>Post</h2><footer>1</footer>")
+        self.assertEqual(request(app, "/")[2],
+                         b'<title>Home</title><div><h1 id="home">Home</h1>'
+                         b'</div>')
+
+        # changing an included file renders pages using it again
+        with open(os.path.join(self.tmp.name, "footer.html"), 'w') as f:
+            f.write("<footer>22</footer>")
+        self.assertEqual(request(app, "/post/")[2],
+                         b"<h2>Post</h2><footer>22</footer>")
+
+        # the set is kept while nothing changes, and picks up new templates
+        template_set = app.templates
+        request(app, "/")
+        request(app, "/post/")
+        self.assertIs(app.templates, template_set)
+        with open(os.path.join(templates, "template.html"), 'w') as f:
+            f.write("<h3>{{ Title }}</h3>")
+        self.assertEqual(request(app, "/")[2], b"<h3>Home</h3>")
+        self.assertIsNot(app.templates, template_set)
+
+    def test_etag(self):
+        _, headers, _ = request(self.app, "/")
+        status, _, body = request(self.app, "/", {
+            "HTTP_IF_NONE_MATCH": headers["ETag"]})
+        self.assertEqual(status, "304 Not Modified")
+        self.assertEqual(body, b"")
+
+    def test_concurrent_requests(self):
+        paths = ["/", "/post/"] * 50
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            statuses = [r[0] for r in pool.map(
+                lambda path: request(self.app, path), paths)]
+        self.assertEqual(statuses, ["200 OK"] * len(paths))
+        stats = self.stats()
+        self.assertEqual(stats["hits"] + stats["misses"], len(paths))
+        self.assertEqual(stats["pages"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
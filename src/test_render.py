@@ -0,0 +1,67 @@
+import concurrent.futures
+import unittest
+
+from blocks import BudgetExceeded, MarkdownError, markdown_to_html_node
+from render import POOL_MIN_ITEMS, Renderer, render_many
+
+
+class TestRenderer(unittest.TestCase):
+    def test_render(self):
+        renderer = Renderer(cache_size=2)
+        for markdown in ("# a", "# b", "# a", "# c", "# b"):
+            self.assertEqual(renderer.render(markdown),
+                             markdown_to_html_node(markdown).to_html())
+        # "# a" was used again after "# b", so "# b" was evicted for "# c"
+        # and "# a" for "# b" coming back
+        self.assertEqual(list(renderer.cache), ["# c", "# b"])
+        self.assertEqual((renderer.stats()["hits"],
+                          renderer.stats()["misses"]), (1, 4))
+
+        self.assertEqual(Renderer(minify=True).render("a\n\n\n  b"),
+                         "<div><p>a</p><p>b</p></div>")
+        with self.assertRaises(BudgetExceeded):
+            Renderer(max_seconds=0).render("# slow")
+
+    def test_render_many(self):
+        renderer = Renderer()
+        items = ["# one", "*two*", "# one", "`three`", "*two*"]
+        expected = [markdown_to_html_node(item).to_html() for item in items]
+        self.assertEqual(renderer.render_many(items), expected)
+        self.assertEqual(renderer.stats()["misses"], 3)
+        self.assertEqual(renderer.render_many(iter(items)), expected)
+        self.assertEqual(renderer.stats()["misses"], 3)
+        self.assertEqual(renderer.render_many([]), [])
+
+    def test_errors(self):
+        renderer = Renderer()
+        with self.assertRaises(MarkdownError):
+            renderer.render_many(["ok", "**open", "fine"])
+        results = renderer.render_many(["ok", "**open", "**open"],
+                                       keep_going=True)
+        self.assertEqual(results[0], "<div><p>ok</p></div>")
+        self.assertIsInstance(results[1], MarkdownError)
+        self.assertIs(results[1], results[2])
+        # failures aren't cached
+        self.assertNotIn("**open", renderer.cache)
+
+    def test_executor(self):
+        items = [f"# {i}\n\n**bold** {i % 10}" for i in range(POOL_MIN_ITEMS)]
+        items.append("**open")
+        expected = [markdown_to_html_node(item).to_html()
+                    for item in items[:-1]]
+        for pool in (concurrent.futures.ThreadPoolExecutor(2),
+                     concurrent.futures.ProcessPoolExecutor(2)):
+            with pool:
+                results = Renderer().render_many(items, pool,
+                                                 keep_going=True)
+            self.assertEqual(results[:-1], expected)
+            self.assertIsInstance(results[-1], MarkdownError)
+            self.assertEqual(results[-1].line, 1)
+
+    def test_shared_renderer(self):
+        self.assertEqual(render_many(["# shared"]),
+                         ['<div><h1 id="shared">shared</h1></div>'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import gzip
+import http.client
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from outputs import DirectoryOutput, MemoryOutput
+from serve import (
+    IMMUTABLE_CACHE_CONTROL,
+    PrecompressedOutput,
+    StaticServer,
+    accepted_encodings,
+    etag_matches,
+)
+
+
+class TestHelpers(unittest.TestCase):
+    def test_accepted_encodings(self):
+        tests = [
+            (None, set()),
+            ("", set()),
+            ("gzip, deflate, br", {"gzip", "deflate", "br"}),
+            ("br;q=0, GZIP;q=0.5", {"gzip"}),
+            ("gzip;q=nope", set()),
+        ]
+        for header, expected in tests:
+            self.assertEqual(accepted_encodings(header), expected)
+
+    def test_etag_matches(self):
+        tests = [
+            (None, False),
+            ('"a"', True),
+            ('"b", W/"a"', True),
+            ('*', True),
+            ('"b"', False),
+        ]
+        for header, expected in tests:
+            self.assertEqual(etag_matches(header, '"a"'), expected)
+
+    def test_precompressed_output(self):
+        memory = MemoryOutput("/site")
+        output = PrecompressedOutput(memory)
+        output.write("/site/index.html", "<p>home</p>")
+        output.write("/site/image.png", b"\x89PNG")
+        self.assertEqual(gzip.decompress(memory.files["index.html.gz"]),
+                         b"<p>home</p>")
+        self.assertNotIn("image.png.gz", memory.files)
+        self.assertEqual(output.written, len(memory.files) - 2)
+
+
+class TestStaticServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        root = cls.tmp.name
+        # published the way a --precompress build publishes them
+        output = PrecompressedOutput(DirectoryOutput(root))
+        output.mkdir(os.path.join(root, "docs"))
+        for rel_path, data in (
+            ("index.html", b"<p>home</p>" * 100),
+            (os.path.join("docs", "index.html"), b"<p>docs</p>"),
+            ("index.0123456789.css", b"body {}"),
+            # named like a fingerprinted asset, but not one
+            ("vendor.abcdef0123.css", b"a {}"),
+            ("image.png", b"\x89PNG"),
+            (os.path.join("docs", "image.0123456789ab-480w.png"), b"\x89PNG"),
+            ("asset-manifest.json",
+             json.dumps({"/index.css": "/index.0123456789.css"})),
+        ):
+            output.write(os.path.join(root, rel_path), data)
+        output.close()
+        cls.image_cache = tempfile.TemporaryDirectory()
+        with open(os.path.join(cls.image_cache.name, "index.json"), 'w') as f:
+            json.dump({os.path.join("static", "docs", "image.png"): {
+                "variants": [[480, 240, "image.0123456789ab-480w.png"]]}}, f)
+
+        cls.server = StaticServer(("localhost", 0), root,
+                                  image_cache=cls.image_cache.name)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+        cls.tmp.cleanup()
+        cls.image_cache.cleanup()
+
+    def setUp(self):
+        host, port = self.server.server_address[:2]
+        self.conn = http.client.HTTPConnection(host, port, timeout=5)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def get(self, path: str, method: str = "GET",
+            headers: dict[str, str] | None = None
+            ) -> tuple[http.client.HTTPResponse, bytes]:
+        self.conn.request(method, path, headers=headers or {})
+        response = self.conn.getresponse()
+        return response, response.read()
+
+    def test_precompress(self):
+        self.assertTrue(os.path.exists(
+            os.path.join(self.tmp.name, "index.html.gz")))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.tmp.name, "image.png.gz")))
+
+    def test_get(self):
+        response, body = self.get("/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<p>home</p>" * 100)
+        self.assertEqual(response.getheader("Content-Type"), "text/html")
+        self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+        self.assertIsNotNone(response.getheader("ETag"))
+
+    def test_head(self):
+        response, body = self.get("/", method="HEAD")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"")
+        self.assertEqual(response.getheader("Content-Length"), "1100")
+
+    def test_keep_alive(self):
+        self.get("/")
+        sock = self.conn.sock
+        response, _ = self.get("/docs/")
+        self.assertEqual(response.status, 200)
+        self.assertIs(self.conn.sock, sock)
+
+    def test_not_modified(self):
+        response, _ = self.get("/")
+        tag = response.getheader("ETag")
+        response, body = self.get("/", headers={"If-None-Match": tag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+
+    def test_gzip(self):
+        response, body = self.get("/", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        self.assertEqual(gzip.decompress(body), b"<p>home</p>" * 100)
+        plain, _ = self.get("/")
+        self.assertNotEqual(response.getheader("ETag"),
+                            plain.getheader("ETag"))
+
+    def test_immutable(self):
+        response, body = self.get("/index.0123456789.css")
+        self.assertEqual(body, b"body {}")
+        self.assertEqual(response.getheader("Cache-Control"),
+                         IMMUTABLE_CACHE_CONTROL)
+        response, _ = self.get("/index.0123456789.css",
+                               headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(response.getheader("Cache-Control"),
+                         IMMUTABLE_CACHE_CONTROL)
+        response, _ = self.get("/docs/image.0123456789ab-480w.png")
+        self.assertEqual(response.getheader("Cache-Control"),
+                         IMMUTABLE_CACHE_CONTROL)
+
+    def test_not_immutable(self):
+        # it's what the build published that decides, not how it's named
+        for path in ("/vendor.abcdef0123.css", "/image.png"):
+            response, _ = self.get(path)
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.getheader("Cache-Control"),
+                             "no-cache")
+
+    def test_redirect_directory(self):
+        response, _ = self.get("/docs?x=1")
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/docs/?x=1")
+
+    def test_not_found(self):
+        for path in ("/missing.html", "/../" + os.path.basename(__file__)):
+            response, _ = self.get(path)
+            self.assertEqual(response.status, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
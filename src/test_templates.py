@@ -0,0 +1,160 @@
+import io
+import os
+import pickle
+import tempfile
+import unittest
+
+import log
+from generate import generate_pages
+from outputs import MemoryOutput
+from templates import Template, TemplateError, TemplateSet, load
+
+
+BASE = """<html><title>{% block title %}{{ Title }}{% endblock %}</title>
+{% include "partials/nav.html" %}
+<main>{% block main %}{{ Content }}{% endblock main %}</main></html>"""
+
+
+def setUpModule():
+    log.configure(stream=io.StringIO())
+
+
+def tearDownModule():
+    log.configure()
+
+
+class TestTemplates(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.write("template.html", BASE)
+        self.write(os.path.join("partials", "nav.html"), '<nav href="/">')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path: str, data: str) -> str:
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(data)
+        return path
+
+    def test_render(self):
+        template = Template("<h1>{{ Title }}</h1>{{ Toc }}{{ Content }}"
+                            "{{ Other }}")
+        self.assertEqual(template.chunks, ["<h1>", "Title", "</h1>", "Toc",
+                                           "", "Content", "{{ Other }}"])
+        self.assertEqual(template.render("A & B", "<p>hi</p>"),
+                         "<h1>A &amp; B</h1><p>hi</p>{{ Other }}")
+
+    def test_include_and_extends(self):
+        self.assertEqual(
+            load(os.path.join(self.root, "template.html")).source,
+            '<html><title>{{ Title }}</title>\n<nav href="/">\n'
+            '<main>{{ Content }}</main></html>')
+
+        path = self.write(os.path.join("templates", "recipes",
+                                       "template.html"), """
+ignored
+{% extends "template.html" %}
+{% block main %}<article>{% block body %}{{ Content }}{% endblock %}
+{% include "partials/nav.html" %}</article>{% endblock %}""")
+        self.write("child.html",
+                   '{% extends "templates/recipes/template.html" %}\n'
+                   "{% block body %}<div>{{ Content }}</div>{% endblock %}")
+        self.assertEqual(
+            load(path, self.root).source,
+            '<html><title>{{ Title }}</title>\n<nav href="/">\n'
+            '<main><article>{{ Content }}\n<nav href="/"></article></main>'
+            '</html>')
+        self.assertEqual(
+            load(os.path.join(self.root, "child.html")).source,
+            '<html><title>{{ Title }}</title>\n<nav href="/">\n'
+            '<main><article><div>{{ Content }}</div>\n<nav href="/">'
+            '</article></main></html>')
+
+    def test_errors(self):
+        tests = [
+            ('{% include "missing.html" %}', 1, "can't find template"),
+            ('\n{% include "../template.html" %}', 2, "isn't under"),
+            ('{% include "bad.html" %}', 1, "includes or extends itself"),
+            ("{% block a %}", 1, "block a is never closed"),
+            ("{% endblock %}", 1, "endblock without block"),
+            ("{% block a %}{% endblock b %}", 1, "closes block a"),
+            ("{% block a %}{% endblock %}{% block a %}", 1, "defined twice"),
+            ("{% include nav %}", 1, "needs a quoted template name"),
+            ("{% for page in pages %}", 1, "unknown tag for"),
+        ]
+        for source, line, message in tests:
+            path = self.write("bad.html", source)
+            with self.assertRaises(TemplateError) as error:
+                load(path)
+            self.assertEqual(error.exception.line, line)
+            self.assertIn(message, str(error.exception))
+
+    def test_load_cache(self):
+        path = os.path.join(self.root, "template.html")
+        template = load(path)
+        self.assertIs(load(path), template)
+        self.assertEqual(len(template.dependencies), 2)
+
+        # changing an included file compiles the template again
+        self.write(os.path.join("partials", "nav.html"), "<nav>changed")
+        changed = load(path)
+        self.assertIsNot(changed, template)
+        self.assertIn("<nav>changed", changed.source)
+
+    def test_template_set(self):
+        content = os.path.join(self.root, "content")
+        template_dir = os.path.join(self.root, "templates")
+        self.write(os.path.join("templates", "recipes", "template.html"),
+                   '{% extends "template.html" %}'
+                   '{% block main %}<article>{{ Content }}</article>'
+                   '{% endblock %}')
+        template_set = TemplateSet(os.path.join(self.root, "template.html"),
+                                   content, template_dir, {"/": "/home.html"},
+                                   minify=True)
+        default = template_set.for_page(os.path.join(content, "index.md"))
+        recipes = template_set.for_page(
+            os.path.join(content, "recipes", "vegan", "tofu.md"))
+        self.assertIs(default, template_set.default())
+        self.assertIn("<article>", recipes.source)
+        self.assertIs(template_set.for_page(
+            os.path.join(content, "recipes", "index.md")), recipes)
+        # prepared once for the whole build
+        self.assertIn('href="/home.html"', default.source)
+        self.assertGreater(default.bytes_saved, 0)
+
+        # pickled to workers compiled
+        copied = pickle.loads(pickle.dumps(template_set))
+        self.assertEqual(copied.for_dir(os.path.join(content, "recipes"))
+                         .chunks, recipes.chunks)
+
+    def test_generate_pages(self):
+        content = os.path.join(self.root, "content")
+        for rel_path in ("index.md", os.path.join("recipes", "tofu.md")):
+            self.write(os.path.join("content", rel_path), "# Page")
+        self.write(os.path.join("templates", "recipes", "template.html"),
+                   '{% extends "template.html" %}'
+                   '{% block title %}Recipes: {{ Title }}{% endblock %}')
+        public = os.path.join(self.root, "public")
+        for jobs in (1, 2):
+            output = MemoryOutput(public)
+            generate_pages(content, public,
+                           os.path.join(self.root, "template.html"),
+                           jobs=jobs, output=output,
+                           template_dir=os.path.join(self.root, "templates"))
+            self.assertIn(b"<title>Page</title>", output.files["index.html"])
+            self.assertIn(b"<title>Recipes: Page</title>",
+                          output.files["recipes/tofu.html"])
+
+        self.write("template.html", "{% block main %}")
+        with self.assertRaises(TemplateError):
+            generate_pages(content, public,
+                           os.path.join(self.root, "template.html"),
+                           output=MemoryOutput(public))
+
+
+if __name__ == "__main__":
+    unittest.main()
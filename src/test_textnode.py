@@ -1,13 +1,17 @@
 import enum
+import re
 import unittest
 
 from textnode import (
+    Definitions,
+    FootnoteRef,
     ImageExtractor,
     LinkExtractor,
     TextNode,
     TextType,
     split_nodes_delimiter,
     split_nodes_extractor,
+    split_nodes_references,
     text_to_textnodes,
 )
 import htmlnode as hn
@@ -291,6 +295,46 @@ class TestLinkExtractor(unittest.TestCase):
         self.assertEqual(expected, result)
 
 
+class TestExtractorFindAll(unittest.TestCase):
+    tricky = [
+        "[a](b)",
+        "[a] ](b))",
+        "[[a](b)",
+        "[a\n](b)",
+        "[a](b\n)",
+        "[a](![b](c)",
+        "![a](b) [c](d) ![e](f)",
+        "!![a](b)",
+        "[a](b)[c](d)",
+        "[a](b) [",
+        "[a] b](c)",
+        "[](",
+        "[a](",
+        "]( [a](b)",
+    ]
+
+    def test_find_all_spans(self):
+        text = "x ![a](b) [c](d) y"
+        self.assertEqual(list(LinkExtractor().find_all(text)),
+                         [(10, 16, "c", "d")])
+        self.assertEqual(list(ImageExtractor().find_all(text)),
+                         [(2, 9, "a", "b")])
+
+    def test_find_all_matches_regex(self):
+        for extractor in (ImageExtractor(), LinkExtractor()):
+            for text in self.tricky:
+                expected = [(m.start(), m.end(), m[1], m[2])
+                            for m in re.finditer(extractor.re_mask, text)]
+                self.assertEqual(list(extractor.find_all(text)), expected,
+                                 (extractor, text))
+
+    def test_find_all_adversarial(self):
+        # these would backtrack for a very long time with the regex
+        for text in ("[a](" * 50000, "[" * 200000, "![" * 100000):
+            self.assertEqual(list(LinkExtractor().find_all(text)), [])
+            self.assertEqual(list(ImageExtractor().find_all(text)), [])
+
+
 class TestSplitNodesExtractor(unittest.TestCase):
     def test_split_nodes_images(self):
         text = TextNode((
@@ -438,5 +482,83 @@ class TestTextToTextNodes(unittest.TestCase):
         self.assertEqual(expected, results)
 
 
+class TestDefinitions(unittest.TestCase):
+    def definitions(self) -> Definitions:
+        definitions = Definitions()
+        self.assertTrue(definitions.add_block(
+            '[Docs]: https://example.com/docs "The docs"\n'
+            "[logo]:  <images/logo.png>\n"
+            "[docs]: https://example.com/second",
+            offset=10))
+        self.assertTrue(definitions.add_block(
+            "[^note]: A note\n    that goes on\n[^two]: Two"))
+        return definitions
+
+    def test_add_block(self):
+        definitions = self.definitions()
+        self.assertEqual(definitions.links, {
+            "docs": "https://example.com/docs",
+            "logo": "images/logo.png",
+        })
+        self.assertEqual(definitions.urls, [
+            (18, "https://example.com/docs"),
+            (64, "images/logo.png"),
+            (89, "https://example.com/second"),
+        ])
+        self.assertEqual(definitions.footnotes, {
+            "note": ("A note that goes on", 9),
+            "two": ("Two", 41),
+        })
+
+        for block in ("Just a paragraph", "[docs]: a url\nand then text",
+                      "[docs]: too many words"):
+            self.assertFalse(Definitions().add_block(block), block)
+
+    def test_split_nodes_references(self):
+        definitions = self.definitions()
+        nodes = split_nodes_references([
+            TextNode("See [the  docs][DOCS], [docs][], [Docs] and "
+                     "![a logo][logo][^note][^note] but not [x], [y][docs "
+                     "or [^nope]"),
+            TextNode("[docs]", TextType.Code),
+        ], definitions)
+        url = "https://example.com/docs"
+        self.assertEqual(nodes, [
+            TextNode("See "),
+            TextNode("the  docs", TextType.Link, url),
+            TextNode(", "),
+            TextNode("docs", TextType.Link, url),
+            TextNode(", "),
+            TextNode("Docs", TextType.Link, url),
+            TextNode(" and "),
+            TextNode("a logo", TextType.Image, "images/logo.png"),
+            TextNode("1", TextType.Footnote, "#fn-1"),
+            TextNode("1", TextType.Footnote, "#fn-1"),
+            TextNode(" but not [x], [y][docs or [^nope]"),
+            TextNode("[docs]", TextType.Code),
+        ])
+        self.assertEqual([node.ref_id for node in nodes
+                          if isinstance(node, FootnoteRef)],
+                         ["fnref-1", "fnref-1-2"])
+        self.assertEqual(definitions.cited, ["note"])
+        self.assertEqual(nodes[8].to_html_node().to_html(),
+                         '<sup><a href="#fn-1" id="fnref-1">1</a></sup>')
+
+    def test_split_nodes_references_adversarial(self):
+        definitions = self.definitions()
+        for text in ("[" * 200000, "[a][" * 50000, "![^" * 100000):
+            nodes = split_nodes_references([TextNode(text)], definitions)
+            self.assertEqual(nodes, [TextNode(text)])
+
+    def test_text_to_textnodes(self):
+        self.assertEqual(text_to_textnodes("[docs] and **[missing]**",
+                                           self.definitions()), [
+            TextNode("docs", TextType.Link, "https://example.com/docs"),
+            TextNode(" and "),
+            TextNode("[missing]", TextType.Bold),
+        ])
+        self.assertEqual(text_to_textnodes("[docs]"), [TextNode("[docs]")])
+
+
 if __name__ == "__main__":
     unittest.main()
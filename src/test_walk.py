@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from walk import (
+    ASSET,
+    PAGE,
+    PlanEntry,
+    Tree,
+    page_name,
+    plan_pages,
+    scan,
+    scan_content,
+)
+
+
+class TestScan(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        for rel_path, data in (
+            (os.path.join("content", "index.md"), "# Home"),
+            (os.path.join("content", "b", "deep", "post.md"), "# Deep"),
+            (os.path.join("content", "a", "post.md"), "# A"),
+            (os.path.join("static", "index.css"), "body {}"),
+        ):
+            path = os.path.join(self.tmp.name, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(data)
+        os.makedirs(os.path.join(self.static, "empty"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_page_name(self):
+        self.assertEqual(page_name("stir-fry-day.md"), "stir-fry-day.html")
+
+    def test_scan_content(self):
+        plan = scan_content(self.content, self.public)
+        self.assertEqual(plan.directories(PAGE), [
+            self.public,
+            os.path.join(self.public, "a"),
+            os.path.join(self.public, "b"),
+            os.path.join(self.public, "b", "deep"),
+        ])
+        self.assertEqual([e.dest_path for e in plan.files(PAGE)], [
+            os.path.join(self.public, "index.html"),
+            os.path.join(self.public, "a", "post.html"),
+            os.path.join(self.public, "b", "deep", "post.html"),
+        ])
+        src_path = os.path.join(self.content, "index.md")
+        stat = os.stat(src_path)
+        self.assertEqual(plan.files(PAGE)[0], PlanEntry(
+            PAGE, src_path, os.path.join(self.public, "index.html"),
+            stat.st_size, stat.st_mtime))
+        self.assertEqual(plan.total_size(), len("# Home# Deep# A"))
+
+    def test_plan_pages(self):
+        post = os.path.join(self.content, "b", "deep", "post.md")
+        plan = plan_pages(self.content, self.public,
+                          [post, os.path.relpath(post), post])
+        self.assertEqual(plan.directories(PAGE), [
+            self.public,
+            os.path.join(self.public, "b"),
+            os.path.join(self.public, "b", "deep"),
+        ])
+        stat = os.stat(post)
+        self.assertEqual(plan.files(PAGE), [PlanEntry(
+            PAGE, post, os.path.join(self.public, "b", "deep", "post.html"),
+            stat.st_size, stat.st_mtime)])
+
+        with self.assertRaises(ValueError):
+            plan_pages(self.content, self.public,
+                       [os.path.join(self.static, "index.css")])
+        with self.assertRaises(FileNotFoundError):
+            plan_pages(self.content, self.public,
+                       [os.path.join(self.content, "gone.md")])
+
+    def test_scan_many_trees(self):
+        plan = scan([
+            Tree(ASSET, self.static, self.public),
+            Tree(PAGE, self.content, self.public, page_name),
+        ], workers=2)
+        self.assertEqual(plan.directories(ASSET), [
+            self.public,
+            os.path.join(self.public, "empty"),
+        ])
+        self.assertEqual([e.dest_path for e in plan.files(ASSET)],
+                         [os.path.join(self.public, "index.css")])
+        self.assertEqual(len(plan.files(PAGE)), 3)
+        self.assertEqual(plan.total_size(ASSET), len("body {}"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,40 @@
 import abc
 import enum
 import re
+from typing import Iterator
 
 import htmlnode as hn
 
 
+# `[label]: url`, optionally followed by a title, which isn't used
+LINK_DEFINITION_RE = re.compile(
+    r' {0,3}\[([^\[\]\n]+)\]:[ \t]*<?([^\s<>]+)>?'
+    r'(?:[ \t]+(?:"[^"\n]*"|\'[^\'\n]*\'|\([^)\n]*\)))?[ \t]*$')
+# `[^label]: text`, continued on any indented lines after it
+FOOTNOTE_DEFINITION_RE = re.compile(r' {0,3}\[\^([^\[\]\n]+)\]:[ \t]*(.*)$')
+# `[^label]`, or `[text][label]`, `[text][]` and `[label]`, with a `!` in
+# front for images. No part can hold a bracket, so every match attempt stops
+# at the next one and a scan is linear however many brackets there are.
+REFERENCE_RE = re.compile(r'\[\^([^\[\]\n]+)\]|'
+                          r'(!?)\[([^\[\]\n]*)\](?:\[([^\[\]\n]*)\])?')
+
+
+class UnclosedDelimiterError(ValueError):
+    """Raised when a formatting delimiter is opened but never closed, keeping
+    the delimiter and the text it was found in so it can be located. Blocks
+    whose text isn't in the document as is, like quotes, give the offset
+    into the block the delimiter is at instead.
+    """
+    def __init__(self, delimiter: str, text: str, offset: int | None = None):
+        super().__init__(delimiter, text, offset)
+        self.delimiter = delimiter
+        self.text = text
+        self.offset = offset
+
+    def __str__(self) -> str:
+        return 'unclosed formatting syntax found'
+
+
 class TextType(enum.Enum):
     Text = "text"
     Bold = "bold"
@@ -12,6 +42,7 @@ class TextType(enum.Enum):
     Code = "code"
     Link = "link"
     Image = "image"
+    Footnote = "footnote"
 
 
 class TextNode:
@@ -56,10 +87,156 @@ class TextNode:
         return f"TextNode({self.text}, {self.text_type.value}, {self.url})"
 
 
+class FootnoteRef(TextNode):
+    """A reference to a footnote, shown as the footnote's number linking
+    down to it. ref_id is what the footnote links back up to.
+    """
+    def __init__(self, number: int, ref_id: str):
+        super().__init__(str(number), TextType.Footnote, f"#fn-{number}")
+        self.ref_id = ref_id
+
+    def to_html_node(self) -> hn.HTMLNode:
+        link = hn.LeafNode('a', self.text,
+                           {"href": self.url or "", "id": self.ref_id})
+        return hn.ParentNode('sup', children=[link])
+
+
+def normalize_label(label: str) -> str:
+    # labels match regardless of case and spacing
+    return " ".join(label.split()).casefold()
+
+
+class Definitions:
+    """The link reference definitions (`[label]: url`) and footnotes
+    (`[^label]: text`) of a document, keyed by normalized label. They're
+    gathered in a pass over the document's blocks before any of them are
+    rendered, so a reference, wherever it is, resolves with one lookup.
+
+    Footnotes are numbered in the order they're first referenced, and
+    listed in that order in cited.
+    """
+    def __init__(self):
+        self.links: dict[str, str] = {}
+        # each footnote's text, and where in the document it starts
+        self.footnotes: dict[str, tuple[str, int]] = {}
+        # offsets of link definition URLs in the document, for link checking
+        self.urls: list[tuple[int, str]] = []
+        self.cited: list[str] = []
+        self.numbers: dict[str, int] = {}
+        self.references: dict[str, int] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.links or self.footnotes)
+
+    def add_block(self, block: str, offset: int = 0) -> bool:
+        """Take the definitions from a block that's made of nothing else,
+        returning whether it was one. offset is where the block starts in
+        the document.
+        """
+        if not block.startswith("["):
+            return False
+        links = []
+        footnotes: list[list] = []
+        line_start = 0
+        for line in block.split("\n"):
+            match = FOOTNOTE_DEFINITION_RE.match(line)
+            if match:
+                footnotes.append([match[1], match[2].strip(),
+                                  offset + line_start + match.start(2)])
+            elif footnotes and line[:1] in (" ", "\t"):
+                footnotes[-1][1] += " " + line.strip()
+            else:
+                match = LINK_DEFINITION_RE.match(line)
+                if not match:
+                    return False
+                links.append((match[1], match[2],
+                              offset + line_start + match.start(2)))
+            line_start += len(line) + 1
+
+        # the first definition of a label wins
+        for label, url, url_offset in links:
+            self.links.setdefault(normalize_label(label), url)
+            self.urls.append((url_offset, url))
+        for label, text, footnote_offset in footnotes:
+            self.footnotes.setdefault(normalize_label(label),
+                                      (text, footnote_offset))
+        return True
+
+    def link(self, label: str) -> str | None:
+        return self.links.get(normalize_label(label))
+
+    def cite(self, label: str) -> FootnoteRef | None:
+        """A reference to the footnote called label, numbering it if it's
+        the first, or None if there's no such footnote
+        """
+        key = normalize_label(label)
+        if key not in self.footnotes:
+            return None
+        number = self.numbers.get(key)
+        if number is None:
+            self.cited.append(key)
+            number = self.numbers[key] = len(self.cited)
+        count = self.references[key] = self.references.get(key, 0) + 1
+        ref_id = f"fnref-{number}" if count == 1 else \
+            f"fnref-{number}-{count}"
+        return FootnoteRef(number, ref_id)
+
+
 class Extractor(abc.ABC):
-    @abc.abstractmethod
+    """Finds `[text](url)`-shaped spans. Matching is done by a hand-written
+    scanner equivalent to re_mask, which keeps every lookup moving forward so
+    that even hostile input, like thousands of unbalanced brackets, is
+    handled in linear time.
+    """
+    # the regex that find_all() is equivalent to
+    re_mask: str
+    # what starts a candidate span
+    opener: str
+
+    def accepts(self, text: str, start: int) -> bool:
+        return True
+
+    def find_all(self, text: str) -> Iterator[tuple[int, int, str, str]]:
+        """Yield (start, end, text, url) for every span, left to right
+        """
+        opener = self.opener
+        end = len(text)
+        # the next newline, `](` and `)` found so far; candidates only ever
+        # move forward, so each of these is searched for at most once per
+        # occurrence in the text
+        newline_at = close_at = paren_at = -1
+        pos = 0
+        while True:
+            start = text.find(opener, pos)
+            if start == -1:
+                return
+            pos = start + 1
+            if not self.accepts(text, start):
+                continue
+
+            text_start = start + len(opener)
+            if newline_at < text_start:
+                newline_at = text.find("\n", text_start)
+                newline_at = end if newline_at == -1 else newline_at
+            if close_at < text_start:
+                close_at = text.find("](", text_start)
+                close_at = end if close_at == -1 else close_at
+            if close_at >= newline_at:
+                continue
+
+            url_start = close_at + 2
+            if paren_at < url_start:
+                paren_at = text.find(")", url_start)
+                paren_at = end if paren_at == -1 else paren_at
+            if paren_at >= newline_at:
+                continue
+
+            yield (start, paren_at + 1, text[text_start:close_at],
+                   text[url_start:paren_at])
+            pos = paren_at + 1
+
     def extract(self, text: str) -> list[tuple[str, str]]:
-        pass
+        return [(alt, url) for _, _, alt, url in self.find_all(text)]
 
     @staticmethod
     @abc.abstractmethod
@@ -74,9 +251,7 @@ class Extractor(abc.ABC):
 
 class ImageExtractor(Extractor):
     re_mask = r"!\[(.*?)\]\((.*?)\)"
-
-    def extract(self, text: str) -> list[tuple[str, str]]:
-        return re.findall(self.re_mask, text)
+    opener = "!["
 
     @staticmethod
     def string_from_extract(extract: tuple[str, str]) -> str:
@@ -89,9 +264,11 @@ class ImageExtractor(Extractor):
 
 class LinkExtractor(Extractor):
     re_mask = r"(?<!!)\[(.*?)\]\((.*?)\)"
+    opener = "["
 
-    def extract(self, text: str) -> list[tuple[str, str]]:
-        return re.findall(self.re_mask, text)
+    def accepts(self, text: str, start: int) -> bool:
+        # a `[` right after a `!` belongs to an image
+        return start == 0 or text[start - 1] != "!"
 
     @staticmethod
     def string_from_extract(extract: tuple[str, str]) -> str:
@@ -120,7 +297,7 @@ def split_nodes_delimiter(
 
         parts = node.text.split(delimiter)
         if len(parts) % 2 == 0:
-            raise ValueError('unclosed formatting syntax found')
+            raise UnclosedDelimiterError(delimiter, node.text)
 
         for i in range(len(parts)):
             if parts[i] == "":
@@ -144,36 +321,73 @@ def split_nodes_extractor(
             new_nodes.append(node)
             continue
 
-        extracts = extractor.extract(node.text)
-        if not extracts:
+        # slice around each span rather than re-splitting the leftover text
+        # for every match, which would copy the rest of the text every time
+        text = node.text
+        pos = 0
+        for start, end, alt, url in extractor.find_all(text):
+            if start > pos:
+                new_nodes.append(TextNode(text[pos:start], TextType.Text))
+            new_nodes.append(TextNode(alt, extractor.text_type(), url))
+            pos = end
+
+        if pos == 0:
             new_nodes.append(node)
-            continue
+        elif pos < len(text):
+            new_nodes.append(TextNode(text[pos:], TextType.Text))
+
+    return new_nodes
 
-        leftover = node.text
-        for extract in extracts:
-            split_str = extractor.string_from_extract(extract)
-            new_node = TextNode(extract[0], extractor.text_type(), extract[1])
-            # ensure only one split, in case of duplicates which we'll get to
-            # in subsequent iterations
-            parts = leftover.split(split_str, 1)
-            if parts[0] == "":
-                new_nodes.append(new_node)
-            else:
-                new_nodes.extend([TextNode(parts[0], TextType.Text), new_node])
 
-            leftover = parts[1]
+def split_nodes_references(
+    old_nodes: list[TextNode],
+    definitions: Definitions,
+) -> list[TextNode]:
+    """Splits out reference links and images, and footnote references, that
+    have a definition. Anything else in brackets is left as it is.
+    """
+    new_nodes = []
+    for node in old_nodes:
+        if node.text_type != TextType.Text or "[" not in node.text:
+            new_nodes.append(node)
+            continue
 
-        if leftover:
-            new_nodes.append(TextNode(leftover, TextType.Text))
+        text = node.text
+        pos = 0
+        for match in REFERENCE_RE.finditer(text):
+            footnote, bang, label, ref = match.groups()
+            if footnote is not None:
+                found = definitions.cite(footnote)
+            else:
+                url = definitions.link(ref or label)
+                found = None
+                if url is not None and label:
+                    text_type = TextType.Image if bang else TextType.Link
+                    found = TextNode(label, text_type, url)
+            if found is None:
+                continue
+            if match.start() > pos:
+                new_nodes.append(TextNode(text[pos:match.start()]))
+            new_nodes.append(found)
+            pos = match.end()
 
+        if pos == 0:
+            new_nodes.append(node)
+        elif pos < len(text):
+            new_nodes.append(TextNode(text[pos:]))
     return new_nodes
 
 
-def text_to_textnodes(text: str) -> list[TextNode]:
-    """This is done in a specific order to avoid false-positives"""
+def text_to_textnodes(text: str, definitions: Definitions | None = None
+                      ) -> list[TextNode]:
+    """This is done in a specific order to avoid false-positives. References
+    are resolved against definitions, if there are any.
+    """
     new_nodes = [TextNode(text)]
     for extractor in (ImageExtractor(), LinkExtractor()):
         new_nodes = split_nodes_extractor(new_nodes, extractor)
+    if definitions:
+        new_nodes = split_nodes_references(new_nodes, definitions)
 
     new_nodes = split_nodes_delimiter(new_nodes, "**", TextType.Bold)
     new_nodes = split_nodes_delimiter(new_nodes, "*", TextType.Italic)
@@ -0,0 +1,164 @@
+import concurrent.futures
+import hashlib
+import os
+import pathlib
+from typing import Callable
+
+
+PAGE = "page"
+ASSET = "asset"
+
+
+def file_hash(path: str) -> str:
+    """The sha256 of a file's contents, read a chunk at a time
+    """
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def page_name(basename: str) -> str:
+    """Where a content file ends up: foo.md -> foo.html
+    """
+    return pathlib.Path(basename).stem + ".html"
+
+
+class Tree:
+    """A source directory to mirror into a destination directory, with every
+    file in it treated as kind. rename maps a source file's basename to its
+    destination basename.
+    """
+    def __init__(self, kind: str, src_dir: str, dest_dir: str,
+                 rename: Callable[[str], str] | None = None):
+        self.kind = kind
+        self.src_dir = src_dir
+        self.dest_dir = dest_dir
+        self.rename = rename
+
+
+class PlanEntry:
+    def __init__(self, kind: str, src_path: str, dest_path: str, size: int,
+                 mtime: float, mtime_ns: int | None = None):
+        self.kind = kind
+        self.src_path = src_path
+        self.dest_path = dest_path
+        self.size = size
+        self.mtime = mtime
+        # exact, for caches that compare against a stat taken earlier
+        self.mtime_ns = mtime_ns
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PlanEntry):
+            return NotImplemented
+        return (self.kind, self.src_path, self.dest_path, self.size,
+                self.mtime) == (other.kind, other.src_path, other.dest_path,
+                                other.size, other.mtime)
+
+    def __repr__(self) -> str:
+        return (f"PlanEntry({self.kind}, {self.src_path}, {self.dest_path},"
+                f" {self.size}, {self.mtime})")
+
+
+class BuildPlan:
+    """Every directory and file a build will produce, in walk order, along
+    with where each file comes from and its size and mtime at scan time
+    """
+    def __init__(self):
+        self.dirs: list[tuple[str, str]] = []
+        self.entries: list[PlanEntry] = []
+
+    def directories(self, kind: str) -> list[str]:
+        return [path for dir_kind, path in self.dirs if dir_kind == kind]
+
+    def files(self, kind: str) -> list[PlanEntry]:
+        return [entry for entry in self.entries if entry.kind == kind]
+
+    def total_size(self, kind: str | None = None) -> int:
+        return sum(entry.size for entry in self.entries
+                   if kind is None or entry.kind == kind)
+
+
+def _scan_dir(src_dir: str
+              ) -> tuple[list[str], list[tuple[str, int, float, int]]]:
+    # DirEntry.is_dir() is answered from the directory listing itself on
+    # most platforms, and stat() is cached on the entry, so each file costs
+    # at most one stat call
+    subdirs = []
+    files = []
+    with os.scandir(src_dir) as it:
+        for entry in it:
+            if entry.is_dir():
+                subdirs.append(entry.name)
+            else:
+                stat = entry.stat()
+                files.append((entry.name, stat.st_size, stat.st_mtime,
+                              stat.st_mtime_ns))
+    subdirs.sort()
+    files.sort()
+    return subdirs, files
+
+
+def scan(trees: list[Tree], workers: int | None = None) -> BuildPlan:
+    """Walk every tree with os.scandir, a level at a time, scanning all of
+    the directories found at each level concurrently
+    """
+    plan = BuildPlan()
+    frontier = []
+    for tree in trees:
+        plan.dirs.append((tree.kind, tree.dest_dir))
+        frontier.append((tree, tree.src_dir, tree.dest_dir))
+
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        while frontier:
+            results = pool.map(_scan_dir, [src for _, src, _ in frontier])
+            next_frontier = []
+            for (tree, src_dir, dest_dir), (subdirs, files) in \
+                    zip(frontier, results):
+                for name, size, mtime, mtime_ns in files:
+                    dest_name = tree.rename(name) if tree.rename else name
+                    plan.entries.append(PlanEntry(
+                        tree.kind, os.path.join(src_dir, name),
+                        os.path.join(dest_dir, dest_name), size, mtime,
+                        mtime_ns))
+                for name in subdirs:
+                    sub_dest = os.path.join(dest_dir, name)
+                    plan.dirs.append((tree.kind, sub_dest))
+                    next_frontier.append(
+                        (tree, os.path.join(src_dir, name), sub_dest))
+            frontier = next_frontier
+    return plan
+
+
+def plan_pages(src_dir: str, dest_dir: str, paths: list[str]) -> BuildPlan:
+    """A plan for just the content files at paths, which must all be under
+    src_dir, and the directories they're written to. Each file is looked at
+    with a single stat; nothing else under src_dir is.
+    """
+    src_dir = os.path.abspath(src_dir)
+    plan = BuildPlan()
+    dirs = {dest_dir}
+    for path in dict.fromkeys(os.path.abspath(path) for path in paths):
+        if os.path.commonpath([src_dir, path]) != src_dir:
+            raise ValueError(f"{path} isn't under {src_dir}")
+        rel_dir, name = os.path.split(os.path.relpath(path, src_dir))
+        sub_dest = dest_dir
+        for part in rel_dir.split(os.sep) if rel_dir else ():
+            sub_dest = os.path.join(sub_dest, part)
+            dirs.add(sub_dest)
+        stat = os.stat(path)
+        plan.entries.append(PlanEntry(
+            PAGE, path, os.path.join(sub_dest, page_name(name)),
+            stat.st_size, stat.st_mtime, stat.st_mtime_ns))
+    # parents sort before the directories in them
+    plan.dirs = [(PAGE, path) for path in sorted(dirs)]
+    return plan
+
+
+def scan_content(src_dir: str, dest_dir: str) -> BuildPlan:
+    return scan([Tree(PAGE, src_dir, dest_dir, page_name)])
+
+
+def scan_static(src_dir: str, dest_dir: str) -> BuildPlan:
+    return scan([Tree(ASSET, src_dir, dest_dir)])